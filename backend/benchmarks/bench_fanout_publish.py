@@ -0,0 +1,88 @@
+"""Benchmark publishing many calendars: one request per sheet vs one fan-out request.
+
+Serves synthetic sheets from the fake Google APIs (with simulated network
+latency) and publishes them to several blogs, first by calling
+POST /blogger/publish-from-sheet once per (sheet, blog) mapping the way a
+client loop would, then with a single POST /blogger/publish-from-sheets.
+Run from the backend directory:
+
+    python -m benchmarks.bench_fanout_publish --calendars 8 16 32
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def synthetic_values(prefix, rows):
+    """Build a sheet of rows that are all due."""
+    values = [['Title', 'Content', 'Labels', 'Publish Date']]
+    for i in range(rows):
+        values.append([f'{prefix} post {i}', f'<p>{prefix} body {i}</p>', 'bench',
+                       '2025-01-01T00:00:00Z'])
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calendars', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--blogs', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=20, help='posts per sheet')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds the fake APIs take per request')
+    args = parser.parse_args()
+
+    from benchmarks.fake_google import FakeGoogle, fake_credentials, serve
+
+    fake = FakeGoogle(latency=args.latency)
+    server = serve(fake)
+    api_root = f'http://127.0.0.1:{server.server_address[1]}/'
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(tempfile.mkdtemp(prefix='fanout-bench-'), 'bench.db'),
+        'GOOGLE_API_ROOT': api_root,
+        'BLOGGER_USER_RATE_PER_MINUTE': '1000000',
+        'BLOGGER_BLOG_RATE_PER_MINUTE': '1000000'
+    })
+
+    from src.main import app
+    from src.models.user import User
+    from src.models.user_store import user_store
+
+    user_store.save(User(id='bench', email='bench@example.com', name='bench', profile_pic='',
+                         credentials=fake_credentials(api_root, 'token-bench')))
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = 'bench'
+        session['_fresh'] = True
+
+    print(f'{args.blogs} blogs, {args.rows} posts per sheet, {args.latency * 1000:.0f}ms API latency')
+    print(f"{'calendars':>9} {'posts':>6} {'per-sheet loop':>15} {'fan-out':>9} {'speedup':>8}")
+    for calendars in args.calendars:
+        timings = {}
+        for mode in ('loop', 'fanout'):
+            mappings = []
+            for n in range(calendars):
+                sheet_id = f'{mode}-{calendars}-{n}'
+                fake.add_sheet(sheet_id, synthetic_values(sheet_id, args.rows))
+                mappings.append({'sheetId': sheet_id, 'blogId': f'blog-{n % args.blogs}'})
+
+            before = len(fake.inserted())
+            start = time.perf_counter()
+            if mode == 'loop':
+                for mapping in mappings:
+                    response = client.post('/blogger/publish-from-sheet', json=mapping)
+                    assert response.status_code == 200, response.get_json()
+            else:
+                response = client.post('/blogger/publish-from-sheets', json={'mappings': mappings})
+                assert response.status_code == 200, response.get_json()
+                assert response.get_json()['summary']['errors'] == 0
+            timings[mode] = time.perf_counter() - start
+            assert len(fake.inserted()) - before == calendars * args.rows
+
+        print(f"{calendars:9d} {calendars * args.rows:6d} {timings['loop']:14.2f}s "
+              f"{timings['fanout']:8.2f}s {timings['loop'] / timings['fanout']:7.1f}x")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
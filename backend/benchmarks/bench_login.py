@@ -0,0 +1,92 @@
+"""Benchmark OAuth flow creation and the /auth/login endpoint.
+
+Compares the previous flow setup (write client_secrets.json, read it back with
+Flow.from_client_secrets_file, delete it) with the in-memory client
+configuration used by create_flow. Run from the backend directory:
+
+    python -m benchmarks.bench_login
+"""
+import argparse
+import json
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from google_auth_oauthlib.flow import Flow
+from src.main import app
+from src.routes.auth import CLIENT_CONFIG, SCOPES, create_flow
+
+
+def create_flow_from_file():
+    """The previous create_flow: round-trip the config through a file."""
+    secrets_file = pathlib.Path(tempfile.gettempdir()) / f'client_secrets_{os.getpid()}_{threading.get_ident()}.json'
+    with open(secrets_file, 'w') as f:
+        json.dump(CLIENT_CONFIG, f)
+    flow = Flow.from_client_secrets_file(
+        str(secrets_file),
+        scopes=SCOPES,
+        redirect_uri=CLIENT_CONFIG['web']['redirect_uris'][0]
+    )
+    secrets_file.unlink()
+    return flow
+
+
+def time_calls(func, iterations):
+    """Return per-call latencies in milliseconds."""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name, latencies, elapsed=None):
+    """Print latency percentiles and throughput."""
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    total = elapsed if elapsed is not None else sum(latencies) / 1000
+    print(f'{name:<32} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  {len(latencies) / total:9.0f} req/s')
+
+
+def login_endpoint(flow_factory, iterations, threads):
+    """Time /auth/login with the given flow factory, from several threads."""
+    import src.routes.auth as auth
+    original = auth.create_flow
+    auth.create_flow = flow_factory
+    try:
+        def worker(count):
+            client = app.test_client()
+            return time_calls(lambda: client.get('/auth/login'), count)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(worker, [iterations // threads] * threads))
+        elapsed = time.perf_counter() - start
+    finally:
+        auth.create_flow = original
+    return [latency for result in results for latency in result], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    report('create_flow (file, before)', time_calls(create_flow_from_file, args.iterations))
+    report('create_flow (memory, after)', time_calls(create_flow, args.iterations))
+
+    # The file-based flow is not safe across threads (shared filename), so
+    # each thread writes its own file here; the real endpoint raced on one
+    latencies, elapsed = login_endpoint(create_flow_from_file, args.iterations, args.threads)
+    report('/auth/login (file, before)', latencies, elapsed)
+    latencies, elapsed = login_endpoint(create_flow, args.iterations, args.threads)
+    report('/auth/login (memory, after)', latencies, elapsed)
+
+
+if __name__ == '__main__':
+    main()
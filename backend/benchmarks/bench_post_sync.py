@@ -0,0 +1,111 @@
+"""Benchmark the Blogger writes made after a published sheet is edited.
+
+Publishes a synthetic sheet to the fake Google APIs, edits a share of its
+rows (content, title or labels), deletes a few and appends new ones, then
+brings the blog up to date either with POST /blogger/publish-from-sheet or
+with POST /blogger/sync-from-sheet (revertDeleted). Reports the writes each
+made, the time taken and the duplicate or stale posts left on the blog.
+Run from the backend directory:
+
+    python -m benchmarks.bench_post_sync --rows 1000 --edited 0.05
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+HEADERS = ['Title', 'Content', 'Labels', 'Publish Date']
+
+
+def synthetic_values(rows):
+    """Build a sheet of rows that are all due."""
+    values = [list(HEADERS)]
+    for i in range(rows):
+        values.append([f'Post {i}', f'<p>Body of post {i}</p>' * 20, 'news, tech',
+                       '2025-01-01T00:00:00Z'])
+    return values
+
+
+def edit_values(values, edited, deleted, added, seed=0):
+    """Edit, delete and append rows of a values grid. Returns a new grid."""
+    rng = random.Random(seed)
+    values = [list(row) for row in values]
+    for i in rng.sample(range(1, len(values)), edited):
+        column = rng.choice([0, 1, 1, 2])
+        values[i][column] = values[i][column] + ' (edited)' if column != 2 else 'news'
+    for i in sorted(rng.sample(range(1, len(values)), deleted), reverse=True):
+        del values[i]
+    for i in range(added):
+        values.append([f'New post {i}', f'<p>New body {i}</p>', 'news', '2025-01-01T00:00:00Z'])
+    return values
+
+
+def stale_posts(fake, blog_id, values):
+    """Live posts of a blog that match no sheet row, e.g. duplicates of edited rows."""
+    rows = {(row[0], row[1]) for row in values[1:]}
+    live = [post for post in fake.posts.get(blog_id, {}).values() if post['status'] == 'LIVE']
+    return sum(1 for post in live if (post['title'], post['content']) not in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--edited', type=float, default=0.05, help='share of rows edited')
+    parser.add_argument('--deleted', type=float, default=0.01, help='share of rows deleted')
+    parser.add_argument('--added', type=int, default=10, help='rows appended')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='seconds the fake APIs take per request')
+    args = parser.parse_args()
+
+    from benchmarks.fake_google import FakeGoogle, fake_credentials, serve
+
+    fake = FakeGoogle(latency=args.latency)
+    server = serve(fake)
+    api_root = f'http://127.0.0.1:{server.server_address[1]}/'
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(tempfile.mkdtemp(prefix='sync-bench-'), 'bench.db'),
+        'GOOGLE_API_ROOT': api_root,
+        'BLOGGER_USER_RATE_PER_MINUTE': '1000000',
+        'BLOGGER_BLOG_RATE_PER_MINUTE': '1000000'
+    })
+
+    from src.main import app
+    from src.models.user import User
+    from src.models.user_store import user_store
+
+    user_store.save(User(id='bench', email='bench@example.com', name='bench', profile_pic='',
+                         credentials=fake_credentials(api_root, 'token-bench')))
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = 'bench'
+        session['_fresh'] = True
+
+    edited = int(args.rows * args.edited)
+    deleted = int(args.rows * args.deleted)
+    print(f'{args.rows} rows: {edited} edited, {deleted} deleted, {args.added} added, '
+          f'{args.latency * 1000:.0f}ms API latency')
+    print(f"{'route':<20} {'inserts':>8} {'patches':>8} {'reverts':>8} {'time':>7} {'stale posts':>12}")
+    for route, body in (('publish-from-sheet', {}), ('sync-from-sheet', {'revertDeleted': True})):
+        sheet_id = blog_id = route
+        values = synthetic_values(args.rows)
+        fake.add_sheet(sheet_id, values)
+        response = client.post('/blogger/publish-from-sheet', json={'sheetId': sheet_id, 'blogId': blog_id})
+        assert response.status_code == 200, response.get_json()
+
+        values = edit_values(values, edited, deleted, args.added)
+        fake.update_sheet(sheet_id, values)
+        before = dict(fake.writes)
+        start = time.perf_counter()
+        response = client.post(f'/blogger/{route}', json=dict(body, sheetId=sheet_id, blogId=blog_id))
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.get_json()
+        writes = {key: fake.writes[key] - before[key] for key in before}
+
+        print(f"{route:<20} {writes['insert']:8d} {writes['patch']:8d} {writes['revert']:8d} "
+              f"{elapsed:6.2f}s {stale_posts(fake, blog_id, values):12d}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Benchmark mapping sheet rows to posts.
+
+Compares the previous per-route loop (column index lookups, len() guards and
+a post dict per row) with the compiled RowMapper on a synthetic sheet. Run
+from the backend directory:
+
+    python -m benchmarks.bench_row_mapper
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from src.services.row_mapper import get_row_mapper, parse_publish_date
+
+HEADERS = ['Title', 'Content', 'Labels', 'Publish Date', 'Notes']
+
+
+def synthetic_sheet(rows, seed=0):
+    """Build a values grid with a mix of full, short and untitled rows."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    values = [list(HEADERS)]
+    for i in range(rows):
+        date = (start + timedelta(hours=rng.randrange(24 * 365 * 2))).isoformat()
+        row = [f'Post {i}', f'<p>Body of post {i}</p>', 'news, tech', date, '']
+        kind = rng.random()
+        if kind < 0.1:
+            # Trailing empty cells are omitted by the Sheets API
+            row = row[:2]
+        elif kind < 0.15:
+            row[0] = ''
+        elif kind < 0.2:
+            row[3] = 'next week'
+        values.append(row)
+    return values
+
+
+def map_inline(values):
+    """The previous mapping, as repeated in each route."""
+    headers = values[0]
+    title_idx = headers.index('Title')
+    content_idx = headers.index('Content')
+    publish_date_idx = headers.index('Publish Date')
+    labels_idx = headers.index('Labels') if 'Labels' in headers else None
+
+    posts = []
+    for i, row in enumerate(values[1:], start=2):
+        if len(row) <= title_idx or not row[title_idx]:
+            continue
+        publish_date = None
+        if len(row) > publish_date_idx and row[publish_date_idx]:
+            try:
+                publish_date = parse_publish_date(row[publish_date_idx])
+            except ValueError:
+                pass
+        post = {
+            'row': i,
+            'title': row[title_idx],
+            'content': row[content_idx] if len(row) > content_idx else '',
+            'publishDate': publish_date
+        }
+        if labels_idx is not None and len(row) > labels_idx and row[labels_idx]:
+            post['labels'] = [label.strip() for label in row[labels_idx].split(',')]
+        posts.append(post)
+    return posts
+
+
+def map_compiled(values):
+    """The compiled row mapper."""
+    return list(get_row_mapper(values[0]).map_values(values))
+
+
+def best_of(func, values, repeat):
+    """Return the fastest of several timed runs, in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(values)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    values = synthetic_sheet(args.rows)
+    for name, func in (('inline (before)', map_inline), ('RowMapper (after)', map_compiled)):
+        elapsed = best_of(func, values, args.repeat)
+        print(f'{name:<20} {elapsed * 1000:8.1f} ms  {args.rows / elapsed:10.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
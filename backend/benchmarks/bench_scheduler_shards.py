@@ -0,0 +1,156 @@
+"""Run the sharded scheduler against fake Google APIs on one machine.
+
+Seeds a throwaway SQLite database with users and registered calendars, serves
+their sheets from an in-process fake of the Google APIs, starts several
+`python -m src.scheduler_worker` processes and waits until every row has been
+published. Reports throughput, how shards were spread over the workers, and
+any post created twice. With --kill-after one worker is killed (SIGKILL)
+mid-run, so its shards must be taken over once its leases lapse. Run from the
+backend directory:
+
+    python -m benchmarks.bench_scheduler_shards --workers 3 --kill-after 5
+"""
+import argparse
+import collections
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def configure(args, database_path, api_root):
+    """Environment shared by this process and the workers.
+
+    Must run before any src module is imported, since they read it on import.
+    """
+    os.environ.update({
+        'DATABASE_PATH': database_path,
+        'GOOGLE_API_ROOT': api_root,
+        'SCHEDULER_MODE': 'sharded',
+        'SCHEDULER_SHARDS': str(args.shards),
+        'SCHEDULER_LEASE_SECONDS': str(args.lease),
+        'SCHEDULER_HEARTBEAT_SECONDS': str(args.lease / 3),
+        'SCHEDULER_POLL_SECONDS': '2',
+        'BLOGGER_USER_RATE_PER_MINUTE': '1000000',
+        'BLOGGER_BLOG_RATE_PER_MINUTE': '1000000',
+    })
+
+
+def seed(args, fake, api_root):
+    """Create the users, their sheets and their calendar registrations."""
+    from benchmarks.fake_google import fake_credentials
+    from src.models.user import User
+    from src.models.user_store import user_store
+    from src.services.shard_coordinator import ShardCoordinator
+
+    coordinator = ShardCoordinator()
+    now = datetime.now(timezone.utc)
+    for u in range(args.users):
+        user_id = f'user{u}'
+        user_store.save(User(
+            id=user_id, email=f'{user_id}@example.com', name=user_id, profile_pic='',
+            credentials=fake_credentials(api_root, f'token-{user_id}')
+        ))
+        # Posts come due over the first seconds of the run
+        values = [['Title', 'Content', 'Labels', 'Publish Date']]
+        for r in range(args.rows):
+            publish_at = now + timedelta(seconds=args.spread * r / args.rows)
+            values.append([f'{user_id} post {r}', f'<p>{r}</p>', 'bench',
+                           publish_at.isoformat().replace('+00:00', 'Z')])
+        fake.add_sheet(f'sheet-{user_id}', values)
+        coordinator.save_registration(user_id, f'sheet-{user_id}', f'blog-{user_id}')
+
+
+def start_worker(backend_dir, log):
+    return subprocess.Popen(
+        [sys.executable, '-m', 'src.scheduler_worker'],
+        cwd=backend_dir, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=10, help='posts per user')
+    parser.add_argument('--spread', type=float, default=5.0,
+                        help='seconds over which the posts come due')
+    parser.add_argument('--shards', type=int, default=32)
+    parser.add_argument('--lease', type=float, default=3.0, help='shard lease seconds')
+    parser.add_argument('--kill-after', type=float, default=None,
+                        help='kill one worker this many seconds into the run')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    args = parser.parse_args()
+
+    from benchmarks.fake_google import FakeGoogle, serve
+
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix='scheduler-bench-')
+    fake = FakeGoogle()
+    server = serve(fake)
+    api_root = f'http://127.0.0.1:{server.server_address[1]}/'
+    configure(args, os.path.join(workdir, 'bench.db'), api_root)
+    seed(args, fake, api_root)
+
+    from src.services.shard_coordinator import ShardCoordinator
+    coordinator = ShardCoordinator()
+
+    expected = args.users * args.rows
+    log = open(os.path.join(workdir, 'workers.log'), 'w')
+    print(f'{args.workers} workers, {args.users} calendars, {expected} posts, '
+          f'{args.shards} shards (logs in {workdir})')
+    workers = [start_worker(backend_dir, log) for _ in range(args.workers)]
+
+    start = time.monotonic()
+    killed = None
+    published = 0
+    try:
+        while time.monotonic() - start < args.timeout:
+            elapsed = time.monotonic() - start
+            if args.kill_after is not None and killed is None and elapsed >= args.kill_after:
+                killed = workers[0]
+                killed.send_signal(signal.SIGKILL)
+                print(f'{elapsed:6.1f}s killed worker pid {killed.pid} '
+                      f'with {published}/{expected} posts published')
+            published = len(fake.inserted())
+            if published >= expected:
+                break
+            time.sleep(0.2)
+        elapsed = time.monotonic() - start
+        stats = coordinator.stats()
+    finally:
+        for worker in workers:
+            if worker.poll() is None:
+                worker.send_signal(signal.SIGTERM)
+        for worker in workers:
+            worker.wait(timeout=30)
+        log.close()
+        server.shutdown()
+
+    posts = fake.inserted()
+    copies = collections.Counter((post['blog']['id'], post['title']) for post in posts)
+    duplicates = sum(count - 1 for count in copies.values() if count > 1)
+
+    print(f'{len(posts)}/{expected} posts published in {elapsed:.1f}s '
+          f'({len(posts) / elapsed:.0f} posts/s including the {args.spread:.0f}s due spread), '
+          f'{duplicates} duplicates, {fake.requests} API requests')
+    print('Live workers at the end:')
+    for worker in stats['workers']:
+        print(f"  {worker['workerId']:<28} {worker['shards']:3d} shards")
+    busy = [shard for shard in stats['shards'] if shard['ticks']]
+    print(f'Shards: {len(busy)} with activity, {sum(s["ticks"] for s in busy)} ticks, '
+          f'{sum(s["errors"] for s in busy)} errors')
+    for shard in sorted(busy, key=lambda s: -s['published'])[:5]:
+        print(f"  shard {shard['shard']:3d} owner {str(shard['owner']):<28} "
+              f"{shard['calendars']:3d} calendars {shard['published']:5d} posts "
+              f"{shard['postsPerSecond']:8.1f} posts/busy-s")
+
+    if len(posts) < expected or duplicates:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark the response formats of GET /sheets/<id>/data.
+
+Serves synthetic sheets of growing size from the fake Google APIs and reads
+them through the Flask app in each format, reporting the time to the first
+response byte, the total time, the response size and the peak memory
+allocated while the request ran (tracemalloc). Run from the backend
+directory:
+
+    python -m benchmarks.bench_sheet_formats --rows 10000 50000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+HEADERS = ['Title', 'Content', 'Labels', 'Publish Date', 'Notes']
+
+
+def synthetic_values(rows):
+    """Build a values grid with the header first."""
+    values = [list(HEADERS)]
+    for i in range(rows):
+        values.append([f'Post {i}', f'<p>Body of post {i}, with some text.</p>' * 4,
+                       'news, tech', '2025-06-01T09:00:00Z'])
+    return values
+
+
+def measure(client, url):
+    """Request a URL and read the response a chunk at a time.
+
+    Returns (seconds to first byte, total seconds, bytes, peak bytes).
+    """
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    first_byte = None
+    size = 0
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    total = time.perf_counter() - start
+    response.close()
+    assert response.status_code == 200, response.status_code
+    return first_byte, total, size, tracemalloc.get_traced_memory()[1] - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000, 100000])
+    args = parser.parse_args()
+
+    from benchmarks.fake_google import FakeGoogle, fake_credentials, serve
+
+    fake = FakeGoogle()
+    server = serve(fake)
+    api_root = f'http://127.0.0.1:{server.server_address[1]}/'
+    os.environ.update({
+        'DATABASE_PATH': os.path.join(tempfile.mkdtemp(prefix='sheet-formats-bench-'), 'bench.db'),
+        'GOOGLE_API_ROOT': api_root
+    })
+
+    from src.main import app
+    from src.models.user import User
+    from src.models.user_store import user_store
+
+    user_store.save(User(id='bench', email='bench@example.com', name='bench', profile_pic='',
+                         credentials=fake_credentials(api_root, 'token-bench')))
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = 'bench'
+        session['_fresh'] = True
+
+    tracemalloc.start()
+    print(f"{'rows':>8} {'format':<9} {'first byte':>11} {'total':>8} {'size':>9} {'peak memory':>12}")
+    for rows in args.rows:
+        fake.add_sheet(f'sheet-{rows}', synthetic_values(rows))
+        for data_format in ('objects', 'columnar', 'ndjson'):
+            first_byte, total, size, peak = measure(
+                client, f'/sheets/sheet-{rows}/data?format={data_format}'
+            )
+            print(f'{rows:8d} {data_format:<9} {first_byte * 1000:9.0f}ms {total:7.2f}s '
+                  f'{size / 2**20:7.1f}MB {peak / 2**20:10.1f}MB')
+        del fake.sheets[f'sheet-{rows}']
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,369 @@
+"""In-memory fake of the Google API endpoints used by the backend.
+
+Serves the Drive files.get, Sheets spreadsheets.get / values.get /
+values.batchGet and Blogger posts insert/get/list/patch/update/publish/
+revert
+calls, plus batch HTTP requests of them, so the
+scheduler can be run and load tested on one machine. Sheets are loaded with
+PUT /fake/sheets/<id> ({"values": [...]}) and created posts are listed by
+GET /fake/posts. Point the backend at it with
+GOOGLE_API_ROOT=http://127.0.0.1:<port>/ and give users credentials with a
+far-future expiry so no token refresh is attempted. Run standalone from the
+backend directory:
+
+    python -m benchmarks.fake_google --port 8765
+"""
+import argparse
+import email
+import itertools
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+_CELL = re.compile(r'^([A-Z]*)(\d*)$')
+
+
+def _column_index(letters):
+    """Convert A1 column letters to a 0-based index (A -> 0)."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _parse_range(range_name):
+    """Parse an A1 range into 0-based (first row, last row, first col, last col).
+
+    Missing bounds are None, e.g. '1:1' or 'Sheet1!A2:E'.
+    """
+    if '!' in range_name:
+        range_name = range_name.split('!', 1)[1]
+    start, _, end = range_name.partition(':')
+    end = end or start
+    start_col, start_row = _CELL.match(start).groups()
+    end_col, end_row = _CELL.match(end).groups()
+    return (
+        int(start_row) - 1 if start_row else 0,
+        int(end_row) - 1 if end_row else None,
+        _column_index(start_col) if start_col else 0,
+        _column_index(end_col) if end_col else None
+    )
+
+
+def fake_credentials(api_root, token):
+    """OAuth credentials for a fake user, valid for a day so none are refreshed."""
+    return {
+        'token': token,
+        'refresh_token': 'refresh',
+        'expiry': (datetime.utcnow() + timedelta(days=1)).isoformat(),
+        'token_uri': api_root + 'token',
+        'client_id': 'client',
+        'client_secret': 'secret',
+        'scopes': []
+    }
+
+
+class FakeGoogle:
+    """State of the fake APIs: sheets by id and posts by blog id."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.sheets = {}
+        self.posts = {}
+        self.requests = 0
+        self.writes = {'insert': 0, 'patch': 0, 'update': 0, 'publish': 0, 'revert': 0}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add_sheet(self, sheet_id, values):
+        """Create or replace a sheet (a values grid with the header first)."""
+        with self._lock:
+            self.sheets[sheet_id] = {'values': values, 'version': 1}
+
+    def update_sheet(self, sheet_id, values):
+        """Replace a sheet's values, bumping its Drive version."""
+        with self._lock:
+            sheet = self.sheets[sheet_id]
+            sheet['values'] = values
+            sheet['version'] += 1
+
+    def inserted(self):
+        """Return every post created so far, across blogs."""
+        with self._lock:
+            return [post for posts in self.posts.values() for post in posts.values()]
+
+    # API calls, each returning (status, body)
+
+    def get_file(self, file_id):
+        sheet = self.sheets.get(file_id)
+        if sheet is None:
+            return 404, {'error': {'code': 404, 'message': 'File not found'}}
+        return 200, {'modifiedTime': f"2025-01-01T00:00:{sheet['version'] % 60:02d}Z",
+                     'version': str(sheet['version'])}
+
+    def get_spreadsheet(self, sheet_id):
+        sheet = self.sheets.get(sheet_id)
+        if sheet is None:
+            return 404, {'error': {'code': 404, 'message': 'Spreadsheet not found'}}
+        values = sheet['values']
+        return 200, {
+            'spreadsheetId': sheet_id,
+            'properties': {'title': sheet_id},
+            'sheets': [{'properties': {
+                'title': 'Sheet1',
+                'sheetId': 0,
+                'gridProperties': {
+                    'rowCount': max(len(values), 1),
+                    'columnCount': max((len(row) for row in values), default=1)
+                }
+            }}]
+        }
+
+    def get_values(self, sheet_id, range_name):
+        sheet = self.sheets.get(sheet_id)
+        if sheet is None:
+            return 404, {'error': {'code': 404, 'message': 'Spreadsheet not found'}}
+        first_row, last_row, first_col, last_col = _parse_range(range_name)
+        rows = sheet['values'][first_row:None if last_row is None else last_row + 1]
+        rows = [row[first_col:None if last_col is None else last_col + 1] for row in rows]
+        # Like the real API, trailing empty rows are left out
+        while rows and not rows[-1]:
+            rows.pop()
+        return 200, {'range': range_name, 'majorDimension': 'ROWS', 'values': rows}
+
+    def batch_get_values(self, sheet_id, ranges):
+        value_ranges = []
+        for range_name in ranges:
+            status, body = self.get_values(sheet_id, range_name)
+            if status != 200:
+                return status, body
+            value_ranges.append(body)
+        return 200, {'spreadsheetId': sheet_id, 'valueRanges': value_ranges}
+
+    def insert_post(self, blog_id, body):
+        with self._lock:
+            self.writes['insert'] += 1
+            post_id = str(next(self._ids))
+            post = {
+                'id': post_id,
+                'blog': {'id': blog_id},
+                'title': body.get('title', ''),
+                'content': body.get('content', ''),
+                'labels': body.get('labels', []),
+                'status': 'LIVE',
+                'published': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'updated': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'url': f'https://{blog_id}.blogspot.example/{post_id}.html'
+            }
+            self.posts.setdefault(blog_id, {})[post_id] = post
+            return 200, post
+
+    def get_post(self, blog_id, post_id):
+        post = self.posts.get(blog_id, {}).get(post_id)
+        if post is None:
+            return 404, {'error': {'code': 404, 'message': 'Post not found'}}
+        return 200, post
+
+    def list_posts(self, blog_id, max_results=10, page_token=None):
+        posts = sorted(self.posts.get(blog_id, {}).values(), key=lambda post: int(post['id']))
+        start = int(page_token or 0)
+        page = posts[start:start + max_results]
+        body = {'items': page}
+        if start + max_results < len(posts):
+            body['nextPageToken'] = str(start + max_results)
+        return 200, body
+
+    def patch_post(self, blog_id, post_id, body):
+        with self._lock:
+            self.writes['patch'] += 1
+            post = self.posts.get(blog_id, {}).get(post_id)
+            if post is None:
+                return 404, {'error': {'code': 404, 'message': 'Post not found'}}
+            post.update({key: value for key, value in body.items() if key != 'id'})
+            post['updated'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            return 200, post
+
+    def update_post(self, blog_id, post_id, body):
+        """Replace the title, content and labels of a post."""
+        with self._lock:
+            self.writes['update'] += 1
+            post = self.posts.get(blog_id, {}).get(post_id)
+            if post is None:
+                return 404, {'error': {'code': 404, 'message': 'Post not found'}}
+            post.update({
+                'title': body.get('title', ''),
+                'content': body.get('content', ''),
+                'labels': body.get('labels', []),
+                'updated': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            })
+            return 200, post
+
+    def set_post_status(self, blog_id, post_id, action):
+        """Publish a draft post or revert a post to draft."""
+        with self._lock:
+            self.writes[action] += 1
+            post = self.posts.get(blog_id, {}).get(post_id)
+            if post is None:
+                return 404, {'error': {'code': 404, 'message': 'Post not found'}}
+            post['status'] = 'LIVE' if action == 'publish' else 'DRAFT'
+            return 200, post
+
+
+def make_handler(fake):
+    """Create a request handler class bound to a FakeGoogle instance."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out in separate writes; without this every
+        # keep-alive response stalls on a delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def _batch(self):
+            """Answer a multipart/mixed batch request, one part per call."""
+            length = int(self.headers.get('Content-Length') or 0)
+            message = email.message_from_bytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8')
+                + self.rfile.read(length)
+            )
+            boundary = 'batch_fake_google'
+            parts = []
+            for part in message.get_payload():
+                request_line, _, rest = part.get_payload().partition('\n')
+                _, _, body = rest.replace('\r\n', '\n').partition('\n\n')
+                method, target, _ = request_line.strip().split(' ', 2)
+                status, response = self._dispatch(method, target, json.loads(body) if body.strip() else {})
+                content_id = part['Content-ID'].strip('<>')
+                parts.append(
+                    f'--{boundary}\r\nContent-Type: application/http\r\n'
+                    f'Content-ID: <response-{content_id}>\r\n\r\n'
+                    f'HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n\r\n'
+                    f'{json.dumps(response)}\r\n'
+                )
+            payload = (''.join(parts) + f'--{boundary}--\r\n').encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', f'multipart/mixed; boundary={boundary}')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _route(self, method):
+            with fake._lock:
+                fake.requests += 1
+            if fake.latency:
+                time.sleep(fake.latency)
+
+            # Test controls: load a sheet
+            parts = unquote(urlsplit(self.path).path).strip('/').split('/')
+            if parts[:2] == ['fake', 'sheets'] and len(parts) == 3 and method == 'PUT':
+                if parts[2] in fake.sheets:
+                    fake.update_sheet(parts[2], self._body()['values'])
+                else:
+                    fake.add_sheet(parts[2], self._body()['values'])
+                return 200, {}
+            body = self._body() if method in ('POST', 'PATCH', 'PUT') else {}
+            return self._dispatch(method, self.path, body)
+
+        def _dispatch(self, method, target, body):
+            """Route one API call to the fake, returning (status, body)."""
+            url = urlsplit(target)
+            path = unquote(url.path)
+            query = parse_qs(url.query)
+            parts = path.strip('/').split('/')
+
+            if parts == ['fake', 'posts'] and method == 'GET':
+                return 200, {'posts': fake.inserted(), 'requests': fake.requests}
+
+            if method == 'GET' and parts[:3] == ['drive', 'v3', 'files'] and len(parts) == 4:
+                return fake.get_file(parts[3])
+            if parts[:2] == ['v4', 'spreadsheets'] and method == 'GET':
+                if len(parts) == 4 and parts[3] == 'values:batchGet':
+                    return fake.batch_get_values(parts[2], query.get('ranges', []))
+                if len(parts) == 3:
+                    return fake.get_spreadsheet(parts[2])
+                if len(parts) >= 5 and parts[3] == 'values':
+                    return fake.get_values(parts[2], '/'.join(parts[4:]))
+            if parts[:2] == ['v3', 'blogs'] and len(parts) >= 4 and parts[3] == 'posts':
+                blog_id = parts[2]
+                if len(parts) == 4 and method == 'POST':
+                    return fake.insert_post(blog_id, body)
+                if len(parts) == 4 and method == 'GET':
+                    return fake.list_posts(
+                        blog_id,
+                        int(query.get('maxResults', ['10'])[0]),
+                        query.get('pageToken', [None])[0]
+                    )
+                if len(parts) == 5 and method == 'GET':
+                    return fake.get_post(blog_id, parts[4])
+                if len(parts) == 5 and method == 'PATCH':
+                    return fake.patch_post(blog_id, parts[4], body)
+                if len(parts) == 5 and method == 'PUT':
+                    return fake.update_post(blog_id, parts[4], body)
+                if len(parts) == 6 and method == 'POST' and parts[5] in ('publish', 'revert'):
+                    return fake.set_post_status(blog_id, parts[4], parts[5])
+            return 404, {'error': {'code': 404, 'message': f'No fake for {method} {path}'}}
+
+        def do_GET(self):
+            self._send(*self._route('GET'))
+
+        def do_POST(self):
+            if urlsplit(self.path).path == '/batch':
+                with fake._lock:
+                    fake.requests += 1
+                self._batch()
+                return
+            self._send(*self._route('POST'))
+
+        def do_PATCH(self):
+            self._send(*self._route('PATCH'))
+
+        def do_PUT(self):
+            self._send(*self._route('PUT'))
+
+    return Handler
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many clients connect at once; the default backlog of 5 makes the rest
+    # wait a second for a SYN retransmit
+    request_queue_size = 256
+
+
+def serve(fake, host='127.0.0.1', port=0):
+    """Serve a FakeGoogle in a background thread. Returns the server."""
+    server = FakeServer((host, port), make_handler(fake))
+    threading.Thread(target=server.serve_forever, name='fake-google', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    server = FakeServer((args.host, args.port), make_handler(FakeGoogle()))
+    print(f'Fake Google APIs on http://{args.host}:{args.port}/')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,354 @@
+import asyncio
+import contextlib
+import functools
+import os
+from urllib.parse import quote
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route, request_response
+from src.main import app as flask_app
+from src.routes.auth import get_credentials
+from src.routes.blogger import post_list_options
+from src.services.async_google import (
+    google_client, GoogleApiError, SHEETS_API, DRIVE_API, BLOGGER_API
+)
+from src.services.response_cache import RESPONSE_CACHE_TTL, CachedResponse, response_cache
+from src.services.sheet_reader import SHEET_READ_BLOCK_ROWS, column_letter, quote_sheet_title
+from src.services.sheet_query import is_query
+from src.services.sheet_formats import (
+    SHEET_DATA_FORMATS, SHEET_DATA_MIMETYPES, data_rows, stream_sheet_data
+)
+
+# Number of sheet blocks fetched at the same time for one request
+SHEET_READ_CONCURRENCY = int(os.getenv('SHEET_READ_CONCURRENCY', '4'))
+
+# The Flask app, for requests answered from its sheet snapshot cache
+flask_asgi = WSGIMiddleware(flask_app)
+
+
+def _session_user_id(request):
+    """Read the logged-in user id from the Flask session cookie."""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if not cookie or serializer is None:
+        return None
+    try:
+        session = serializer.loads(
+            cookie,
+            max_age=int(flask_app.permanent_session_lifetime.total_seconds())
+        )
+    except BadSignature:
+        return None
+    return session.get('_user_id')
+
+
+def login_required(handler):
+    """Resolve the session user and an access token for an async handler."""
+    @functools.wraps(handler)
+    async def wrapper(request):
+        user_id = _session_user_id(request)
+        if not user_id:
+            return JSONResponse({'error': 'Unauthorized'}, status_code=401)
+
+        # Credentials may need a token refresh, which is blocking
+        credentials = await run_in_threadpool(get_credentials, user_id)
+        if not credentials:
+            return JSONResponse({'error': 'No valid credentials found'}, status_code=401)
+
+        try:
+            return await handler(request, credentials.token)
+        except GoogleApiError as error:
+            return JSONResponse({'error': f'An error occurred: {error}'}, status_code=500)
+    return wrapper
+
+
+class QueriesToFlask:
+    """ASGI endpoint that hands sheet queries to the Flask app.
+
+    Filtered, projected or paged requests are answered by Flask from the
+    cached snapshot and its indexes, so they are passed on before any
+    session or credentials are resolved here; the rest go to handler.
+    """
+
+    def __init__(self, handler):
+        self.handler = request_response(handler)
+
+    async def __call__(self, scope, receive, send):
+        if is_query(Request(scope).query_params):
+            await flask_asgi(scope, receive, send)
+        else:
+            await self.handler(scope, receive, send)
+
+
+def cached_response(ttl=RESPONSE_CACHE_TTL, tags=None):
+    """Serve an async handler's responses from the shared response cache.
+
+    Entries are keyed, tagged and invalidated exactly like the Flask
+    endpoints' (see src.services.response_cache.cached_response), so both
+    servers share them, and clients that send a matching If-None-Match get
+    an empty 304. Applied outside login_required so a hit needs no
+    credentials.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            user_id = _session_user_id(request)
+            if not user_id:
+                return await handler(request)
+
+            key = (str(user_id), f'{request.url.path}?{request.url.query}')
+            entry = response_cache.get(key)
+            if entry is None:
+                response = await handler(request)
+                # Only successful responses are cached
+                if response.status_code != 200:
+                    return response
+                entry = CachedResponse(
+                    response.body, response.media_type, ttl,
+                    tags(**request.path_params) if tags else ()
+                )
+                response_cache.set(key, entry)
+
+            headers = {'ETag': f'"{entry.etag}"', 'Cache-Control': 'private, no-cache'}
+            if_none_match = request.headers.get('if-none-match', '')
+            etags = {tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')}
+            if entry.etag in etags or '*' in etags:
+                response_cache.record_not_modified()
+                return Response(status_code=304, headers=headers)
+            return Response(entry.body, media_type=entry.mimetype, headers=headers)
+        return wrapper
+    return decorator
+
+
+async def _get_values(token, sheet_id, range_name):
+    """Get the values of an A1 range."""
+    result = await google_client.get(
+        f'{SHEETS_API}/{sheet_id}/values/{quote(range_name, safe="")}', token
+    )
+    return result.get('values', [])
+
+
+async def _read_sheet(token, sheet_id):
+    """Read the whole first tab, fetching its row blocks concurrently."""
+    spreadsheet = await google_client.get(
+        f'{SHEETS_API}/{sheet_id}', token,
+        params={'fields': 'sheets.properties(title,gridProperties(rowCount,columnCount))'}
+    )
+    sheets = spreadsheet.get('sheets', [])
+    if not sheets:
+        return []
+
+    properties = sheets[0]['properties']
+    grid = properties.get('gridProperties', {})
+    row_count = grid.get('rowCount', 0)
+    column_count = grid.get('columnCount', 0)
+    if not row_count or not column_count:
+        return []
+
+    prefix = quote_sheet_title(properties['title']) + '!'
+    last_column = column_letter(column_count)
+    semaphore = asyncio.Semaphore(SHEET_READ_CONCURRENCY)
+
+    async def read_block(start):
+        end = min(start + SHEET_READ_BLOCK_ROWS - 1, row_count)
+        async with semaphore:
+            return start, await _get_values(token, sheet_id, f'{prefix}A{start}:{last_column}{end}')
+
+    blocks = await asyncio.gather(*[
+        read_block(start) for start in range(1, row_count + 1, SHEET_READ_BLOCK_ROWS)
+    ])
+
+    # Stitch the blocks together so list positions match row numbers
+    values = []
+    for start, rows in blocks:
+        for offset, row in enumerate(rows):
+            while len(values) < start + offset - 1:
+                values.append([])
+            values.append(row)
+    while values and not values[-1]:
+        values.pop()
+    return values
+
+
+@cached_response(tags=lambda: ['sheets'])
+@login_required
+async def list_sheets(request, token):
+    """List all Google Sheets accessible to the user."""
+    results = await google_client.get(f'{DRIVE_API}/files', token, params={
+        'q': "mimeType='application/vnd.google-apps.spreadsheet'",
+        'fields': 'files(id, name, webViewLink)'
+    })
+    return JSONResponse({'sheets': results.get('files', [])})
+
+
+@cached_response(tags=lambda sheet_id: [f'sheet:{sheet_id}'])
+@login_required
+async def get_sheet_metadata(request, token):
+    """Get metadata for a specific Google Sheet."""
+    spreadsheet = await google_client.get(
+        f"{SHEETS_API}/{request.path_params['sheet_id']}", token,
+        params={'fields': 'spreadsheetId,properties.title,'
+                          'sheets.properties(title,sheetId,gridProperties(rowCount,columnCount))'}
+    )
+
+    # Extract sheet names, IDs and grid sizes
+    sheets = [{
+        'title': sheet['properties']['title'],
+        'sheetId': sheet['properties']['sheetId'],
+        'rowCount': sheet['properties'].get('gridProperties', {}).get('rowCount', 0),
+        'columnCount': sheet['properties'].get('gridProperties', {}).get('columnCount', 0)
+    } for sheet in spreadsheet.get('sheets', [])]
+
+    return JSONResponse({
+        'spreadsheetId': spreadsheet['spreadsheetId'],
+        'title': spreadsheet['properties']['title'],
+        'sheets': sheets
+    })
+
+
+@login_required
+async def get_sheet_data(request, token):
+    """Get data from a specific Google Sheet."""
+    sheet_id = request.path_params['sheet_id']
+    range_name = request.query_params.get('range')
+    data_format = request.query_params.get('format', 'objects')
+    if data_format not in SHEET_DATA_FORMATS:
+        return JSONResponse({
+            'error': f"format must be one of: {', '.join(SHEET_DATA_FORMATS)}"
+        }, status_code=400)
+    if range_name:
+        values = await _get_values(token, sheet_id, range_name)
+    else:
+        values = await _read_sheet(token, sheet_id)
+    if not values:
+        return JSONResponse({'error': 'No data found'}, status_code=404)
+
+    headers = values[0]
+    rows = data_rows(headers, enumerate(values[1:], start=2))
+
+    if data_format != 'objects':
+        # Serialized a chunk at a time in a worker thread
+        return StreamingResponse(
+            stream_sheet_data(headers, rows, data_format),
+            media_type=SHEET_DATA_MIMETYPES[data_format]
+        )
+
+    # Convert rows to dictionaries using headers as keys
+    data = [dict(zip(headers, row)) for row in rows]
+
+    return JSONResponse({
+        'headers': headers,
+        'data': data
+    })
+
+
+@login_required
+async def validate_sheet(request, token):
+    """Validate if a Google Sheet has the required columns for blog posts."""
+    sheet_id = request.query_params.get('sheet_id')
+    if not sheet_id:
+        return JSONResponse({'error': 'sheet_id parameter is required'}, status_code=400)
+
+    # Check if required columns exist
+    values = await _get_values(token, sheet_id, '1:1')
+    headers = values[0] if values else []
+    required_columns = ['Title', 'Content', 'Labels', 'Publish Date']
+    missing_columns = [col for col in required_columns if col not in headers]
+
+    if missing_columns:
+        return JSONResponse({
+            'valid': False,
+            'missing_columns': missing_columns,
+            'message': f"Missing required columns: {', '.join(missing_columns)}"
+        })
+
+    return JSONResponse({
+        'valid': True,
+        'message': 'Sheet has all required columns'
+    })
+
+
+@cached_response(tags=lambda: ['blogs'])
+@login_required
+async def list_blogs(request, token):
+    """List all blogs owned by the user."""
+    blogs = await google_client.get(f'{BLOGGER_API}/users/self/blogs', token)
+    return JSONResponse({'blogs': blogs.get('items', [])})
+
+
+@cached_response(tags=lambda blog_id: [f'blog:{blog_id}'])
+@login_required
+async def get_blog(request, token):
+    """Get details for a specific blog."""
+    blog = await google_client.get(f"{BLOGGER_API}/blogs/{request.path_params['blog_id']}", token)
+    return JSONResponse({'blog': blog})
+
+
+@login_required
+async def list_posts(request, token):
+    """List a page of posts for a specific blog."""
+    try:
+        options = post_list_options(request.query_params)
+    except ValueError as error:
+        return JSONResponse({'error': str(error)}, status_code=400)
+
+    # Query strings spell booleans in lowercase
+    if 'fetchBodies' in options:
+        options['fetchBodies'] = 'false'
+
+    posts = await google_client.get(
+        f"{BLOGGER_API}/blogs/{request.path_params['blog_id']}/posts", token,
+        params=options
+    )
+    return JSONResponse({
+        'posts': posts.get('items', []),
+        'nextPageToken': posts.get('nextPageToken')
+    })
+
+
+class CORSHeadersMiddleware(BaseHTTPMiddleware):
+    """Add the same CORS headers as the Flask app to async responses."""
+
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        # Responses delegated to Flask already carry them
+        if 'access-control-allow-origin' not in response.headers:
+            frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:3000')
+            response.headers['Access-Control-Allow-Origin'] = frontend_url
+            response.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization'
+            response.headers['Access-Control-Allow-Methods'] = 'GET,PUT,POST,DELETE,OPTIONS'
+            response.headers['Access-Control-Allow-Credentials'] = 'true'
+        return response
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Open the shared Google connection pool for the app's lifetime."""
+    await google_client.start()
+    yield
+    await google_client.close()
+
+
+# Async handlers for the read endpoints that go straight to the Google APIs;
+# everything else (auth, writes, the scheduler endpoints and anything
+# served from the sheet snapshot cache) is served by the Flask app
+app = Starlette(
+    routes=[
+        Route('/sheets/list', list_sheets),
+        Route('/sheets/validate', validate_sheet),
+        Route('/sheets/{sheet_id}/metadata', get_sheet_metadata),
+        Route('/sheets/{sheet_id}/data', QueriesToFlask(get_sheet_data), methods=['GET']),
+        Route('/blogger/blogs', list_blogs),
+        Route('/blogger/blogs/{blog_id}', get_blog),
+        Route('/blogger/blogs/{blog_id}/posts', list_posts, methods=['GET']),
+        Mount('/', app=flask_asgi)
+    ],
+    middleware=[Middleware(CORSHeadersMiddleware)],
+    lifespan=lifespan
+)
@@ -7,7 +7,15 @@ from src.routes.auth import auth_bp
 from src.routes.sheets import sheets_bp
 from src.routes.blogger import blogger_bp
 from src.routes.scheduler import scheduler_bp
+from src.routes.jobs import jobs_bp
 from src.models.user import User
+from src.models.user_store import user_store
+from src.services.google_clients import service_cache
+from src.services.publish_executor import publish_executor
+from src.services.response_cache import response_cache
+from src.services.due_index import due_indexes
+from src.services.scheduler_engine import scheduler_engine
+from src.services.job_queue import job_queue
 
 # Create Flask app
 app = Flask(__name__)
@@ -22,19 +30,25 @@ app.config['PERMANENT_SESSION_LIFETIME'] = 3600  # 1 hour
 login_manager = LoginManager()
 login_manager.init_app(app)
 
-# In-memory user storage (replace with database in production)
-users = {}
-
 @login_manager.user_loader
 def load_user(user_id):
     """Load user from storage."""
-    return users.get(user_id)
+    return user_store.get(user_id)
 
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(sheets_bp, url_prefix='/sheets')
 app.register_blueprint(blogger_bp, url_prefix='/blogger')
 app.register_blueprint(scheduler_bp, url_prefix='/scheduler')
+app.register_blueprint(jobs_bp, url_prefix='/jobs')
+
+# Resume publishing persisted calendars and queued jobs once the app
+# serves requests
+@app.before_request
+def start_scheduler():
+    """Start the background scheduler and job consumers if they are not running yet."""
+    scheduler_engine.start()
+    job_queue.start()
 
 # CORS handling for development
 @app.after_request
@@ -57,7 +71,8 @@ def index():
             'auth': '/auth',
             'sheets': '/sheets',
             'blogger': '/blogger',
-            'scheduler': '/scheduler'
+            'scheduler': '/scheduler',
+            'jobs': '/jobs'
         }
     })
 
@@ -66,9 +81,18 @@ def status():
     """API status endpoint."""
     return jsonify({
         'status': 'ok',
-        'authenticated': current_user.is_authenticated
+        'authenticated': current_user.is_authenticated,
+        'serviceCache': service_cache.stats(),
+        'publishExecutor': publish_executor.stats(),
+        'responseCache': response_cache.stats(),
+        'dueIndex': due_indexes.stats()
     })
 
 if __name__ == '__main__':
-    # Run the app
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if os.getenv('ASYNC_SERVER', 'false').lower() == 'true':
+        # Serve the async (ASGI) variant of the app
+        import uvicorn
+        uvicorn.run('src.asgi:app', host='0.0.0.0', port=5000)
+    else:
+        # Run the app
+        app.run(host='0.0.0.0', port=5000, debug=True)
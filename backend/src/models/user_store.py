@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from src.models.user import User
+from src.services.database import get_connection, ensure_schema
+
+# Storage backend for users: 'sqlite' (default) or 'memory'
+USER_STORE = os.getenv('USER_STORE', 'sqlite')
+
+# Seconds a user loaded from the backend is served from memory
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '60'))
+
+# Most users kept in memory at once; the least recently used are evicted
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1000'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    name TEXT,
+    profile_pic TEXT,
+    created_at TEXT,
+    last_login TEXT,
+    credentials TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_users_email ON users (email);
+'''
+
+
+class UserStore:
+    """Interface of user storage backends."""
+
+    def get(self, user_id):
+        """Get a user by id, or None if unknown."""
+        raise NotImplementedError
+
+    def get_by_email(self, email):
+        """Get a user by email, or None if unknown."""
+        raise NotImplementedError
+
+    def save(self, user):
+        """Create or update a user."""
+        raise NotImplementedError
+
+    def delete(self, user_id):
+        """Delete a user."""
+        raise NotImplementedError
+
+
+class MemoryUserStore(UserStore):
+    """Process-local user storage, lost on restart."""
+
+    def __init__(self):
+        self._users = {}
+
+    def get(self, user_id):
+        return self._users.get(str(user_id))
+
+    def get_by_email(self, email):
+        for user in self._users.values():
+            if user.email == email:
+                return user
+        return None
+
+    def save(self, user):
+        self._users[str(user.id)] = user
+
+    def delete(self, user_id):
+        self._users.pop(str(user_id), None)
+
+
+class SQLiteUserStore(UserStore):
+    """User storage in the shared SQLite database, indexed by id and email."""
+
+    def _connection(self):
+        ensure_schema('users', SCHEMA)
+        return get_connection()
+
+    def _from_row(self, row):
+        """Create a user object from a database row."""
+        if row is None:
+            return None
+        data = dict(row)
+        credentials = json.loads(data.pop('credentials')) if data.get('credentials') else None
+        return User.from_dict(data, credentials=credentials)
+
+    def get(self, user_id):
+        row = self._connection().execute(
+            'SELECT * FROM users WHERE id = ?', (str(user_id),)
+        ).fetchone()
+        return self._from_row(row)
+
+    def get_by_email(self, email):
+        row = self._connection().execute(
+            'SELECT * FROM users WHERE email = ?', (email,)
+        ).fetchone()
+        return self._from_row(row)
+
+    def save(self, user):
+        data = user.to_dict()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO users '
+                '(id, email, name, profile_pic, created_at, last_login, credentials) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (str(data['id']), data['email'], data['name'], data['profile_pic'],
+                 data['created_at'], data['last_login'],
+                 json.dumps(user.credentials) if user.credentials else None)
+            )
+
+    def delete(self, user_id):
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM users WHERE id = ?', (str(user_id),))
+
+
+class CachedUserStore(UserStore):
+    """Read-through in-process cache in front of another store.
+
+    Keeps load_user off the database on the hot path. Entries expire after a
+    short TTL so changes saved by other worker processes are picked up, and
+    at most max_size users are kept, least recently used evicted first.
+    """
+
+    def __init__(self, backend, ttl=USER_CACHE_TTL, max_size=USER_CACHE_SIZE):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_size = max_size
+        self._users = OrderedDict()  # user_id -> (user, loaded_at), oldest use first
+        self._lock = threading.Lock()
+
+    def _store(self, user_id, user, loaded_at):
+        """Cache a user, evicting the least recently used. Caller holds the lock."""
+        self._users[user_id] = (user, loaded_at)
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_size:
+            self._users.popitem(last=False)
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached is not None and now - cached[1] < self.ttl:
+                self._users.move_to_end(user_id)
+                return cached[0]
+
+        user = self.backend.get(user_id)
+        with self._lock:
+            if user is None:
+                self._users.pop(user_id, None)
+            else:
+                self._store(user_id, user, now)
+        return user
+
+    def get_by_email(self, email):
+        return self.backend.get_by_email(email)
+
+    def save(self, user):
+        self.backend.save(user)
+        with self._lock:
+            self._store(str(user.id), user, time.monotonic())
+
+    def delete(self, user_id):
+        self.backend.delete(user_id)
+        with self._lock:
+            self._users.pop(str(user_id), None)
+
+
+def create_user_store(kind=USER_STORE):
+    """Create the configured user store."""
+    if kind == 'memory':
+        return MemoryUserStore()
+    if kind == 'sqlite':
+        return CachedUserStore(SQLiteUserStore())
+    raise ValueError(f"Unknown user store '{kind}'")
+
+
+# Process-wide user store
+user_store = create_user_store()
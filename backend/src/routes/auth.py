@@ -1,14 +1,20 @@
 from flask import Blueprint, redirect, url_for, session, request, jsonify, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 import os
-import json
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from google.auth.transport.requests import Request
-import pathlib
 import secrets
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from src.models.user import User
+from src.models.user_store import user_store
+from src.services.google_clients import build_service, service_cache
+
+logger = logging.getLogger(__name__)
 
 # Create blueprint for authentication routes
 auth_bp = Blueprint('auth', __name__)
@@ -18,16 +24,27 @@ SCOPES = [
     'https://www.googleapis.com/auth/userinfo.email',
     'https://www.googleapis.com/auth/userinfo.profile',
     'https://www.googleapis.com/auth/blogger',
-    'https://www.googleapis.com/auth/spreadsheets.readonly'
+    'https://www.googleapis.com/auth/spreadsheets.readonly',
+    'https://www.googleapis.com/auth/drive.metadata.readonly'
 ]
 
-# In-memory user storage (replace with database in production)
-users = {}
+# Refresh tokens in the background this many seconds before they expire
+TOKEN_REFRESH_MARGIN = int(os.getenv('TOKEN_REFRESH_MARGIN', '600'))
 
-def create_flow():
-    """Create and configure OAuth flow."""
+# Most users whose live credentials are kept in memory
+CREDENTIALS_CACHE_SIZE = int(os.getenv('CREDENTIALS_CACHE_SIZE', '1000'))
+
+# LRU of live credentials objects by user id, each with the lock
+# serializing its refreshes
+_credentials_cache = OrderedDict()
+_background_refreshes = set()
+_credentials_lock = threading.Lock()
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='token-refresh')
+
+def load_client_config():
+    """Build the OAuth client configuration from the environment."""
     # In production, these would be environment variables
-    client_secrets = {
+    return {
         "web": {
             "client_id": os.getenv("GOOGLE_CLIENT_ID", "YOUR_CLIENT_ID"),
             "project_id": os.getenv("GOOGLE_PROJECT_ID", "YOUR_PROJECT_ID"),
@@ -38,23 +55,17 @@ def create_flow():
             "redirect_uris": [os.getenv("OAUTH_REDIRECT_URI", "http://localhost:5000/auth/callback")]
         }
     }
-    
-    # Create a temporary client_secrets.json file
-    secrets_file = pathlib.Path("client_secrets.json")
-    with open(secrets_file, "w") as f:
-        json.dump(client_secrets, f)
-    
-    # Create flow instance
-    flow = Flow.from_client_secrets_file(
-        str(secrets_file),
+
+# OAuth client configuration, built once at startup
+CLIENT_CONFIG = load_client_config()
+
+def create_flow():
+    """Create and configure OAuth flow from the in-memory client configuration."""
+    return Flow.from_client_config(
+        CLIENT_CONFIG,
         scopes=SCOPES,
-        redirect_uri=client_secrets["web"]["redirect_uris"][0]
+        redirect_uri=CLIENT_CONFIG["web"]["redirect_uris"][0]
     )
-    
-    # Clean up temporary file
-    secrets_file.unlink()
-    
-    return flow
 
 @auth_bp.route('/login')
 def login():
@@ -92,7 +103,7 @@ def callback():
     credentials = flow.credentials
     
     # Get user info from Google
-    user_info_service = build('oauth2', 'v2', credentials=credentials)
+    user_info_service = build_service('oauth2', 'v2', credentials=credentials)
     user_info = user_info_service.userinfo().get().execute()
     
     # Create or update user
@@ -105,8 +116,17 @@ def callback():
         credentials=credentials_to_dict(credentials)
     )
     
-    # Store user (in memory for now, would be database in production)
-    users[user_id] = user
+    # Keep the original sign-up time of returning users
+    existing_user = user_store.get(user_id)
+    if existing_user:
+        user.created_at = existing_user.created_at
+        # Google only returns a refresh token on first consent
+        if not user.credentials['refresh_token'] and existing_user.credentials:
+            user.credentials['refresh_token'] = existing_user.credentials.get('refresh_token')
+    
+    # Store user
+    user_store.save(user)
+    forget_credentials(user_id)
     
     # Log in the user
     login_user(user)
@@ -119,6 +139,8 @@ def callback():
 @login_required
 def logout():
     """Log out the current user."""
+    service_cache.evict_user(current_user.id)
+    forget_credentials(current_user.id)
     logout_user()
     return jsonify({'message': 'Successfully logged out'})
 
@@ -136,29 +158,95 @@ def credentials_to_dict(credentials):
         'token_uri': credentials.token_uri,
         'client_id': credentials.client_id,
         'client_secret': credentials.client_secret,
-        'scopes': credentials.scopes
+        'scopes': credentials.scopes,
+        'expiry': credentials.expiry.isoformat() if credentials.expiry else None
     }
 
+def credentials_from_dict(data):
+    """Create a credentials object from stored dictionary data."""
+    expiry = data.get('expiry')
+    return Credentials(
+        token=data['token'],
+        refresh_token=data['refresh_token'],
+        token_uri=data['token_uri'],
+        client_id=data['client_id'],
+        client_secret=data['client_secret'],
+        scopes=data['scopes'],
+        # google-auth compares expiry against naive UTC datetimes
+        expiry=datetime.fromisoformat(expiry) if expiry else None
+    )
+
+def _expires_soon(credentials):
+    """Whether a token expires within the proactive refresh margin."""
+    if credentials.expiry is None:
+        return False
+    return credentials.expiry - datetime.utcnow() < timedelta(seconds=TOKEN_REFRESH_MARGIN)
+
+def _refresh_credentials(user_id, credentials, lock, force):
+    """Refresh a user's token once, however many callers are waiting on it.
+
+    The first caller refreshes under the user's lock; callers queued behind it
+    find the token already fresh and return without another round trip. A
+    missing token counts as expired.
+    """
+    with lock:
+        if credentials.valid and not (force and _expires_soon(credentials)):
+            return
+        credentials.refresh(Request())
+        
+        # Update stored credentials
+        user = user_store.get(user_id)
+        if user:
+            user.credentials = credentials_to_dict(credentials)
+            user_store.save(user)
+        # Point cached API services at the refreshed token
+        service_cache.rebind(user_id, credentials)
+
+def _refresh_in_background(user_id, credentials, lock):
+    """Refresh a token that is about to expire without blocking the caller."""
+    with _credentials_lock:
+        if user_id in _background_refreshes:
+            return
+        _background_refreshes.add(user_id)
+    
+    def refresh():
+        try:
+            _refresh_credentials(user_id, credentials, lock, force=True)
+        except Exception:
+            # The next request refreshes synchronously once the token expires
+            logger.exception('Background token refresh failed for user %s', user_id)
+        finally:
+            with _credentials_lock:
+                _background_refreshes.discard(user_id)
+    
+    _refresh_executor.submit(refresh)
+
+def forget_credentials(user_id):
+    """Drop a user's cached credentials object."""
+    with _credentials_lock:
+        _credentials_cache.pop(user_id, None)
+
 def get_credentials(user_id):
     """Get credentials for a user and refresh if necessary."""
-    user = users.get(user_id)
+    user = user_store.get(user_id)
     if not user or not user.credentials:
         return None
     
-    credentials = Credentials(
-        token=user.credentials['token'],
-        refresh_token=user.credentials['refresh_token'],
-        token_uri=user.credentials['token_uri'],
-        client_id=user.credentials['client_id'],
-        client_secret=user.credentials['client_secret'],
-        scopes=user.credentials['scopes']
-    )
-    
-    # Refresh token if expired
-    if credentials.expired:
-        credentials.refresh(Request())
-        # Update stored credentials
-        user.credentials = credentials_to_dict(credentials)
-        users[user_id] = user
+    # Reuse the live credentials object of the user
+    with _credentials_lock:
+        entry = _credentials_cache.get(user_id)
+        if entry is None:
+            entry = _credentials_cache[user_id] = (credentials_from_dict(user.credentials), threading.Lock())
+            while len(_credentials_cache) > CREDENTIALS_CACHE_SIZE:
+                _credentials_cache.popitem(last=False)
+        _credentials_cache.move_to_end(user_id)
+    credentials, lock = entry
+    
+    if not credentials.valid:
+        # Refresh token if expired or missing
+        _refresh_credentials(user_id, credentials, lock, force=False)
+    elif _expires_soon(credentials):
+        # Refresh ahead of expiry so requests never wait on the token endpoint
+        _refresh_in_background(user_id, credentials, lock)
     
     return credentials
@@ -1,17 +1,48 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from flask_login import login_required, current_user
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from google.oauth2.credentials import Credentials
-import os
+import json
+import functools
 from datetime import datetime
 from src.routes.auth import get_credentials
+from src.services.google_clients import get_blogger_service
+from src.services.sheet_cache import get_sheet_snapshot
+from src.services.publish_ledger import publish_ledger
+from src.services.batch_publisher import fits_in_request, insert_posts_batched
+from src.services.response_cache import cached_response, response_cache
+from src.services.publish_executor import publish_executor
+from src.services.row_mapper import get_row_mapper
+from src.services.publishing import PublishError, plan_sheet_publish, publish_planned, read_snapshots
+from src.services.publish_planner import PLAN_SOURCES, plan_publish
+from src.services.post_sync import apply_sync, plan_sync
+from src.services.job_queue import job_queue
 
 # Create blueprint for Blogger routes
 blogger_bp = Blueprint('blogger', __name__)
 
+# Page sizes for listing posts
+DEFAULT_POSTS_PAGE_SIZE = 10
+MAX_POSTS_PAGE_SIZE = 500
+
+# Most (sheet, blog) mappings published by one multi-sheet request
+MAX_PUBLISH_MAPPINGS = 100
+
+# Most posts patched by one bulk update request
+MAX_BULK_UPDATES = 100
+
+# Post fields returned after an update (the content HTML only if it changed)
+POST_UPDATE_FIELDS = 'id,title,url,labels,updated,status'
+
+# Post fields returned in summary mode (everything but the content HTML)
+POST_SUMMARY_FIELDS = 'nextPageToken,items(id,title,published,updated,url,labels,status,author/displayName)'
+
+def invalidate_blog_responses(blog_id):
+    """Drop the current user's cached blog responses after a post changed."""
+    response_cache.invalidate(current_user.id, 'blogs', f'blog:{blog_id}')
+
 @blogger_bp.route('/blogs')
 @login_required
+@cached_response(tags=lambda: ['blogs'])
 def list_blogs():
     """List all blogs owned by the user."""
     try:
@@ -20,8 +51,8 @@ def list_blogs():
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Blogger API service
-        blogger_service = build('blogger', 'v3', credentials=credentials)
+        # Get the Blogger API service
+        blogger_service = get_blogger_service(current_user.id, credentials)
         
         # Get the list of blogs
         blogs = blogger_service.blogs().listByUser(userId='self').execute()
@@ -33,6 +64,7 @@ def list_blogs():
 
 @blogger_bp.route('/blogs/<blog_id>')
 @login_required
+@cached_response(tags=lambda blog_id: [f'blog:{blog_id}'])
 def get_blog(blog_id):
     """Get details for a specific blog."""
     try:
@@ -41,8 +73,8 @@ def get_blog(blog_id):
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Blogger API service
-        blogger_service = build('blogger', 'v3', credentials=credentials)
+        # Get the Blogger API service
+        blogger_service = get_blogger_service(current_user.id, credentials)
         
         # Get blog details
         blog = blogger_service.blogs().get(blogId=blog_id).execute()
@@ -52,30 +84,110 @@ def get_blog(blog_id):
     except HttpError as error:
         return jsonify({'error': f'An error occurred: {error}'}), 500
 
+def post_list_options(args, summary_default=False):
+    """Build posts().list parameters from request query arguments.
+
+    Raises ValueError for invalid arguments.
+    """
+    try:
+        max_results = int(args.get('maxResults', DEFAULT_POSTS_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('maxResults must be an integer')
+    if not 1 <= max_results <= MAX_POSTS_PAGE_SIZE:
+        raise ValueError(f'maxResults must be between 1 and {MAX_POSTS_PAGE_SIZE}')
+    
+    options = {'maxResults': max_results}
+    if args.get('pageToken'):
+        options['pageToken'] = args['pageToken']
+    if args.get('status'):
+        options['status'] = args['status']
+    
+    # Summary mode leaves out the post content HTML
+    summary = args.get('summary', str(summary_default)).lower() == 'true'
+    if summary:
+        options['fetchBodies'] = False
+        options['fields'] = POST_SUMMARY_FIELDS
+    return options
+
 @blogger_bp.route('/blogs/<blog_id>/posts')
 @login_required
 def list_posts(blog_id):
-    """List posts for a specific blog."""
+    """List a page of posts for a specific blog."""
     try:
+        # Get query parameters
+        try:
+            options = post_list_options(request.args)
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+        
         # Get user credentials
         credentials = get_credentials(current_user.id)
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Blogger API service
-        blogger_service = build('blogger', 'v3', credentials=credentials)
+        # Get the Blogger API service
+        blogger_service = get_blogger_service(current_user.id, credentials)
         
         # Get posts
         posts = blogger_service.posts().list(
             blogId=blog_id,
-            maxResults=10  # Adjust as needed
+            **options
         ).execute()
         
-        return jsonify({'posts': posts.get('items', [])})
+        return jsonify({
+            'posts': posts.get('items', []),
+            'nextPageToken': posts.get('nextPageToken')
+        })
     
     except HttpError as error:
         return jsonify({'error': f'An error occurred: {error}'}), 500
 
+@blogger_bp.route('/blogs/<blog_id>/posts/export')
+@login_required
+def export_posts(blog_id):
+    """Stream every post of a blog as newline-delimited JSON.
+
+    Pages are fetched one at a time as the response is written, so memory
+    stays bounded however many posts the blog has.
+    """
+    # Get query parameters (summaries by default, pages as large as allowed)
+    args = request.args.to_dict()
+    args.setdefault('maxResults', str(MAX_POSTS_PAGE_SIZE))
+    try:
+        options = post_list_options(args, summary_default=True)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    # Get user credentials
+    credentials = get_credentials(current_user.id)
+    if not credentials:
+        return jsonify({'error': 'No valid credentials found'}), 401
+    
+    # Get the Blogger API service
+    blogger_service = get_blogger_service(current_user.id, credentials)
+    
+    def generate():
+        page_options = dict(options)
+        while True:
+            try:
+                page = blogger_service.posts().list(
+                    blogId=blog_id,
+                    **page_options
+                ).execute()
+            except HttpError as error:
+                # Headers are already sent, so report the error in-band
+                yield json.dumps({'error': f'An error occurred: {error}'}) + '\n'
+                return
+            
+            for post in page.get('items', []):
+                yield json.dumps(post) + '\n'
+            
+            if not page.get('nextPageToken'):
+                return
+            page_options['pageToken'] = page['nextPageToken']
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @blogger_bp.route('/blogs/<blog_id>/posts', methods=['POST'])
 @login_required
 def create_post(blog_id):
@@ -99,8 +211,8 @@ def create_post(blog_id):
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Blogger API service
-        blogger_service = build('blogger', 'v3', credentials=credentials)
+        # Get the Blogger API service
+        blogger_service = get_blogger_service(current_user.id, credentials)
         
         # Prepare post body
         post_body = {
@@ -133,6 +245,7 @@ def create_post(blog_id):
             body=post_body,
             isDraft=post_data.get('isDraft', False)
         ).execute()
+        invalidate_blog_responses(blog_id)
         
         return jsonify({
             'success': True,
@@ -142,6 +255,48 @@ def create_post(blog_id):
     except HttpError as error:
         return jsonify({'error': f'An error occurred: {error}'}), 500
 
+def build_patch_body(post_data):
+    """Build a posts().patch body holding only the fields being changed."""
+    patch_body = {}
+    if 'title' in post_data:
+        patch_body['title'] = post_data['title']
+    if 'content' in post_data:
+        patch_body['content'] = post_data['content']
+    if 'labels' in post_data:
+        # Convert comma-separated string to list if needed
+        labels = post_data['labels']
+        if isinstance(labels, str):
+            labels = [label.strip() for label in labels.split(',') if label.strip()]
+        patch_body['labels'] = labels
+    return patch_body
+
+def patch_post_request(blogger_service, blog_id, post_id, patch_body):
+    """Build a request that only sends and returns what changed.
+
+    A posts().patch is not guaranteed to clear labels, so when all of them
+    are removed the post is read and replaced with posts().update instead.
+    """
+    posts = blogger_service.posts()
+    fetch_body = 'content' in patch_body
+    fields = POST_UPDATE_FIELDS + (',content' if fetch_body else '')
+    if 'labels' in patch_body and not patch_body['labels']:
+        existing_post = posts.get(blogId=blog_id, postId=post_id).execute()
+        existing_post.update(patch_body)
+        return posts.update(
+            blogId=blog_id,
+            postId=post_id,
+            body=existing_post,
+            fetchBody=fetch_body,
+            fields=fields
+        )
+    return posts.patch(
+        blogId=blog_id,
+        postId=post_id,
+        body=patch_body,
+        fetchBody=fetch_body,
+        fields=fields
+    )
+
 @blogger_bp.route('/blogs/<blog_id>/posts/<post_id>', methods=['PUT'])
 @login_required
 def update_post(blog_id, post_id):
@@ -152,38 +307,23 @@ def update_post(blog_id, post_id):
         if not post_data:
             return jsonify({'error': 'No post data provided'}), 400
         
+        patch_body = build_patch_body(post_data)
+        if not patch_body:
+            return jsonify({'error': 'No fields to update'}), 400
+        
         # Get user credentials
         credentials = get_credentials(current_user.id)
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Blogger API service
-        blogger_service = build('blogger', 'v3', credentials=credentials)
-        
-        # Get existing post
-        existing_post = blogger_service.posts().get(
-            blogId=blog_id,
-            postId=post_id
-        ).execute()
-        
-        # Update post fields
-        if 'title' in post_data:
-            existing_post['title'] = post_data['title']
-        if 'content' in post_data:
-            existing_post['content'] = post_data['content']
-        if 'labels' in post_data:
-            # Convert comma-separated string to list if needed
-            labels = post_data['labels']
-            if isinstance(labels, str):
-                labels = [label.strip() for label in labels.split(',')]
-            existing_post['labels'] = labels
+        # Get the Blogger API service
+        blogger_service = get_blogger_service(current_user.id, credentials)
         
-        # Update the post
-        updated_post = blogger_service.posts().update(
-            blogId=blog_id,
-            postId=post_id,
-            body=existing_post
+        # Send only the changed fields
+        updated_post = patch_post_request(
+            blogger_service, blog_id, post_id, patch_body
         ).execute()
+        invalidate_blog_responses(blog_id)
         
         return jsonify({
             'success': True,
@@ -193,6 +333,67 @@ def update_post(blog_id, post_id):
     except HttpError as error:
         return jsonify({'error': f'An error occurred: {error}'}), 500
 
+@blogger_bp.route('/blogs/<blog_id>/posts/bulk-update', methods=['POST'])
+@login_required
+def bulk_update_posts(blog_id):
+    """Apply title/label/content changes to many posts concurrently."""
+    # Get request data
+    data = request.json
+    if not data or not isinstance(data.get('updates'), list) or not data['updates']:
+        return jsonify({'error': 'updates must be a non-empty list'}), 400
+    if len(data['updates']) > MAX_BULK_UPDATES:
+        return jsonify({
+            'error': f'At most {MAX_BULK_UPDATES} posts can be updated at once'
+        }), 400
+    
+    # Validate every update before sending any of them
+    patches = []
+    for update in data['updates']:
+        if not isinstance(update, dict) or not update.get('postId'):
+            return jsonify({'error': 'Every update needs a postId'}), 400
+        patch_body = build_patch_body(update)
+        if not patch_body:
+            return jsonify({'error': f"No fields to update for post {update['postId']}"}), 400
+        patches.append((update['postId'], patch_body))
+    
+    # Get user credentials
+    credentials = get_credentials(current_user.id)
+    if not credentials:
+        return jsonify({'error': 'No valid credentials found'}), 401
+    
+    # Get the Blogger API service
+    blogger_service = get_blogger_service(current_user.id, credentials)
+    
+    # Patch the posts concurrently within the user's write quotas
+    outcomes = publish_executor.execute(current_user.id, blog_id, [
+        (index, functools.partial(
+            patch_post_request, blogger_service, blog_id, post_id, patch_body
+        ))
+        for index, (post_id, patch_body) in enumerate(patches)
+    ])
+    invalidate_blog_responses(blog_id)
+    
+    results = []
+    for index, (post_id, _) in enumerate(patches):
+        post, error = outcomes[index]
+        if error is not None:
+            results.append({
+                'postId': post_id,
+                'status': 'error',
+                'message': str(error)
+            })
+        else:
+            results.append({
+                'postId': post_id,
+                'status': 'success',
+                'post': post
+            })
+    
+    return jsonify({
+        'success': True,
+        'results': results
+    })
+
 @blogger_bp.route('/blogs/<blog_id>/posts/<post_id>', methods=['DELETE'])
 @login_required
 def delete_post(blog_id, post_id):
@@ -203,14 +404,15 @@ def delete_post(blog_id, post_id):
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Blogger API service
-        blogger_service = build('blogger', 'v3', credentials=credentials)
+        # Get the Blogger API service
+        blogger_service = get_blogger_service(current_user.id, credentials)
         
         # Delete the post
         blogger_service.posts().delete(
             blogId=blog_id,
             postId=post_id
         ).execute()
+        invalidate_blog_responses(blog_id)
         
         return jsonify({
             'success': True,
@@ -241,102 +443,275 @@ def publish_from_sheet():
         sheet_id = data['sheetId']
         blog_id = data['blogId']
         
+        source = data.get('compareWith', 'ledger')
+        if data.get('dryRun') and source not in PLAN_SOURCES:
+            return jsonify({'error': f"compareWith must be one of: {', '.join(PLAN_SOURCES)}"}), 400
+        
         # Get user credentials
         credentials = get_credentials(current_user.id)
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the services
-        sheets_service = build('sheets', 'v4', credentials=credentials)
-        blogger_service = build('blogger', 'v3', credentials=credentials)
+        # Get the Blogger API service
+        blogger_service = get_blogger_service(current_user.id, credentials)
         
-        # Get sheet data
-        result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=sheet_id,
-            range='A1:Z1000'  # Adjust range as needed
-        ).execute()
+        # Get sheet data (re-read only when the sheet changed)
+        snapshot = get_sheet_snapshot(current_user.id, credentials, sheet_id)
         
-        values = result.get('values', [])
+        # Dry run: plan the publish without writing to the blog
+        if data.get('dryRun'):
+            try:
+                plan = plan_publish(current_user.id, blogger_service, sheet_id, blog_id,
+                                    snapshot, mode='publish', source=source)
+            except PublishError as error:
+                return jsonify({'error': str(error)}), 400
+            return jsonify({
+                'success': True,
+                'dryRun': True,
+                'plan': plan
+            })
+        values = snapshot.values
         if not values:
             return jsonify({'error': 'No data found in sheet'}), 404
         
-        # Get headers and data
-        headers = values[0]
+        # Get headers and their compiled row mapper
+        mapper = get_row_mapper(values[0])
         
         # Check required columns
-        required_columns = ['Title', 'Content']
-        for column in required_columns:
-            if column not in headers:
-                return jsonify({
-                    'error': f"Required column '{column}' not found in sheet"
-                }), 400
-        
-        # Get column indices
-        title_idx = headers.index('Title')
-        content_idx = headers.index('Content')
-        labels_idx = headers.index('Labels') if 'Labels' in headers else None
-        publish_date_idx = headers.index('Publish Date') if 'Publish Date' in headers else None
-        
-        # Process rows and create posts
-        results = []
-        now = datetime.now()
-        
-        for i, row in enumerate(values[1:], start=2):  # Start from 2 to account for 1-indexed rows and header
-            # Skip empty rows
-            if len(row) <= title_idx or not row[title_idx]:
+        missing_columns = mapper.missing(['Title', 'Content'])
+        if missing_columns:
+            return jsonify({
+                'error': f"Required column '{missing_columns[0]}' not found in sheet"
+            }), 400
+        
+        # Decide which rows to publish and which to skip
+        results, pending = plan_sheet_publish(sheet_id, blog_id, snapshot, mapper)
+        
+        # Publish in the background through the durable job queue; so are
+        # publishes too large to pace within the blog's quota in this request
+        if data.get('background') or not fits_in_request(current_user.id, {blog_id: len(pending)}):
+            job_id = job_queue.create(current_user.id, sheet_id, blog_id, results, pending)
+            return jsonify({
+                'success': True,
+                'jobId': job_id,
+                'status': 'queued' if pending else 'completed',
+                'statusUrl': f'/jobs/{job_id}',
+                'streamUrl': f'/jobs/{job_id}/stream'
+            }), 202
+        
+        # Create the posts in batch HTTP requests
+        outcomes = insert_posts_batched(
+            current_user.id, blogger_service, blog_id,
+            [(i, post_body) for i, post_body, _, _ in pending]
+        )
+        
+        if pending:
+            invalidate_blog_responses(blog_id)
+        
+        for i, post_body, digest, result in pending:
+            post, error = outcomes.get(i, (None, 'No response received'))
+            if error is not None:
+                result.update({
+                    'status': 'error',
+                    'message': str(error)
+                })
                 continue
-                
-            # Skip rows with future publish dates
-            if publish_date_idx is not None and len(row) > publish_date_idx and row[publish_date_idx]:
-                try:
-                    publish_date = datetime.fromisoformat(row[publish_date_idx].replace('Z', '+00:00'))
-                    if publish_date > now:
-                        results.append({
-                            'row': i,
-                            'title': row[title_idx],
-                            'status': 'skipped',
-                            'message': 'Future publish date'
-                        })
-                        continue
-                except ValueError:
-                    # If date parsing fails, proceed with publishing
-                    pass
             
-            # Prepare post data
-            post_body = {
-                'title': row[title_idx],
-                'content': row[content_idx] if len(row) > content_idx else ''
-            }
+            publish_ledger.record(sheet_id, blog_id, digest, post, row=i)
+            result.update({
+                'status': 'success',
+                'postId': post['id'],
+                'url': post.get('url', '')
+            })
+        
+        return jsonify({
+            'success': True,
+            'results': results
+        })
+    
+    except HttpError as error:
+        return jsonify({'error': f'An error occurred: {error}'}), 500
+
+@blogger_bp.route('/publish-from-sheets', methods=['POST'])
+@login_required
+def publish_from_sheets():
+    """Publish posts from many Google Sheets to their Blogger blogs at once."""
+    try:
+        # Get request data
+        data = request.json
+        if not data or not isinstance(data.get('mappings'), list) or not data['mappings']:
+            return jsonify({'error': 'mappings must be a non-empty list'}), 400
+        if len(data['mappings']) > MAX_PUBLISH_MAPPINGS:
+            return jsonify({
+                'error': f'At most {MAX_PUBLISH_MAPPINGS} mappings can be published at once'
+            }), 400
+        
+        # Validate every mapping; repeated ones are published once
+        mappings = []
+        for mapping in data['mappings']:
+            if not isinstance(mapping, dict) or not mapping.get('sheetId') or not mapping.get('blogId'):
+                return jsonify({'error': 'Every mapping needs a sheetId and a blogId'}), 400
+            mappings.append((mapping['sheetId'], mapping['blogId']))
+        mappings = list(dict.fromkeys(mappings))
+        
+        # Get user credentials
+        credentials = get_credentials(current_user.id)
+        if not credentials:
+            return jsonify({'error': 'No valid credentials found'}), 401
+        
+        # Get the Blogger API service
+        blogger_service = get_blogger_service(current_user.id, credentials)
+        
+        # Read every sheet concurrently (re-read only when it changed)
+        snapshots = read_snapshots(
+            current_user.id, credentials, [sheet_id for sheet_id, _ in mappings]
+        )
+        
+        # Plan each mapping; a sheet that cannot be used fails only its mappings
+        breakdown = []
+        plans = []
+        for sheet_id, blog_id in mappings:
+            entry = {'sheetId': sheet_id, 'blogId': blog_id}
+            breakdown.append(entry)
             
-            # Add labels if available
-            if labels_idx is not None and len(row) > labels_idx and row[labels_idx]:
-                post_body['labels'] = [label.strip() for label in row[labels_idx].split(',')]
+            snapshot, error = snapshots[sheet_id]
+            if error is not None:
+                entry.update({'status': 'error', 'message': f'An error occurred: {error}'})
+                continue
+            if not snapshot.values:
+                entry.update({'status': 'error', 'message': 'No data found in sheet'})
+                continue
             
-            try:
-                # Create the post
-                post = blogger_service.posts().insert(
-                    blogId=blog_id,
-                    body=post_body
-                ).execute()
-                
-                results.append({
-                    'row': i,
-                    'title': row[title_idx],
-                    'status': 'success',
-                    'postId': post['id'],
-                    'url': post.get('url', '')
-                })
-            except Exception as e:
-                results.append({
-                    'row': i,
-                    'title': row[title_idx],
+            # Get headers and their compiled row mapper
+            mapper = get_row_mapper(snapshot.values[0])
+            
+            # Check required columns
+            missing_columns = mapper.missing(['Title', 'Content'])
+            if missing_columns:
+                entry.update({
                     'status': 'error',
-                    'message': str(e)
+                    'message': f"Required column '{missing_columns[0]}' not found in sheet"
                 })
+                continue
+            
+            results, pending = plan_sheet_publish(sheet_id, blog_id, snapshot, mapper)
+            entry.update({'status': 'ok', 'results': results})
+            plans.append((sheet_id, blog_id, pending, results, entry))
+        
+        # Publish in the background through the durable job queue, one job
+        # per mapping; so are publishes too large to pace within the request
+        counts = {}
+        for _, blog_id, pending, _, _ in plans:
+            counts[blog_id] = counts.get(blog_id, 0) + len(pending)
+        if data.get('background') or not fits_in_request(current_user.id, counts):
+            for sheet_id, blog_id, pending, results, entry in plans:
+                job_id = job_queue.create(current_user.id, sheet_id, blog_id, results, pending)
+                del entry['results']
+                entry.update({
+                    'jobId': job_id,
+                    'statusUrl': f'/jobs/{job_id}',
+                    'streamUrl': f'/jobs/{job_id}/stream'
+                })
+            return jsonify({
+                'success': True,
+                'results': breakdown
+            }), 202
+        
+        # Create the posts of all sheets, merged per blog and paced by each
+        # blog's write quota
+        for blog_id in publish_planned(
+            current_user.id, blogger_service,
+            [(sheet_id, blog_id, pending) for sheet_id, blog_id, pending, _, _ in plans]
+        ):
+            invalidate_blog_responses(blog_id)
+        
+        # Count the outcomes per mapping and overall
+        summary = {'mappings': len(breakdown), 'failedMappings': 0,
+                   'published': 0, 'skipped': 0, 'errors': 0}
+        for entry in breakdown:
+            if entry['status'] == 'error':
+                summary['failedMappings'] += 1
+                continue
+            statuses = [result['status'] for result in entry['results']]
+            counts = {
+                'published': statuses.count('success'),
+                'skipped': statuses.count('skipped'),
+                'errors': statuses.count('error')
+            }
+            entry.update(counts)
+            for key, count in counts.items():
+                summary[key] += count
         
         return jsonify({
             'success': True,
-            'results': results
+            'summary': summary,
+            'results': breakdown
+        })
+    
+    except HttpError as error:
+        return jsonify({'error': f'An error occurred: {error}'}), 500
+
+@blogger_bp.route('/sync-from-sheet', methods=['POST'])
+@login_required
+def sync_from_sheet():
+    """Bring a blog's posts in line with the current rows of a Google Sheet.
+
+    New rows are published, edited rows patch only the fields that changed
+    on their existing post, and with revertDeleted the posts of rows that
+    were removed are reverted to draft.
+    """
+    try:
+        # Get request data
+        data = request.json
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        # Validate required fields
+        required_fields = ['sheetId', 'blogId']
+        missing_fields = [field for field in required_fields if field not in data]
+        if missing_fields:
+            return jsonify({
+                'error': f"Missing required fields: {', '.join(missing_fields)}"
+            }), 400
+        
+        sheet_id = data['sheetId']
+        blog_id = data['blogId']
+        
+        # Get user credentials
+        credentials = get_credentials(current_user.id)
+        if not credentials:
+            return jsonify({'error': 'No valid credentials found'}), 401
+        
+        # Get the Blogger API service
+        blogger_service = get_blogger_service(current_user.id, credentials)
+        
+        # Get sheet data (re-read only when the sheet changed)
+        snapshot = get_sheet_snapshot(current_user.id, credentials, sheet_id)
+        
+        # Compare the sheet with the posts synced from it
+        try:
+            plan = plan_sync(blogger_service, sheet_id, blog_id, snapshot,
+                             revert_deleted=bool(data.get('revertDeleted')))
+        except PublishError as error:
+            return jsonify({'error': str(error)}), 400
+        
+        # Dry run: report the writes without making them
+        if data.get('dryRun'):
+            return jsonify({
+                'success': True,
+                'dryRun': True,
+                'summary': plan.summary(),
+                'results': plan.results
+            })
+        
+        apply_sync(current_user.id, blogger_service, plan)
+        if plan.writes():
+            invalidate_blog_responses(blog_id)
+        
+        return jsonify({
+            'success': True,
+            'summary': plan.summary(),
+            'results': plan.results
         })
     
     except HttpError as error:
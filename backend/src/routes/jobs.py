@@ -0,0 +1,102 @@
+from flask import Blueprint, Response, jsonify, stream_with_context
+from flask_login import login_required, current_user
+import os
+import json
+import time
+from src.services.job_queue import job_queue
+
+# Create blueprint for publish job routes
+jobs_bp = Blueprint('jobs', __name__)
+
+# Seconds between progress checks of a streamed job
+JOB_STREAM_POLL_SECONDS = float(os.getenv('JOB_STREAM_POLL_SECONDS', '1'))
+
+# Seconds between keep-alive comments on an idle stream
+JOB_STREAM_KEEPALIVE_SECONDS = 15
+
+# Rows are re-read this long after they finished, so rows committed while a
+# check was running are not missed
+JOB_STREAM_OVERLAP_SECONDS = 5
+
+def get_user_job(job_id, since=None):
+    """Get a job of the current user, or None if unknown or someone else's."""
+    job = job_queue.get(job_id, since=since)
+    if not job or job['userId'] != str(current_user.id):
+        return None
+    del job['userId']
+    return job
+
+def sse_event(event, data):
+    """Format one server-sent event."""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+@jobs_bp.route('/<job_id>')
+@login_required
+def get_job(job_id):
+    """Get the progress and row results of a publish job."""
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify(job)
+
+@jobs_bp.route('/<job_id>/stream')
+@login_required
+def stream_job(job_id):
+    """Stream the progress of a publish job as server-sent events.
+
+    A 'progress' event carries the task counts and the results of the rows
+    finished since the previous event; a final 'done' event is sent once
+    the job completed or failed.
+    """
+    job = get_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def generate():
+        sent_rows = set()
+        last_counts = None
+        last_sent = time.monotonic()
+        since = None
+        while True:
+            checked_at = time.time()
+            current = job_queue.get(job_id, since=since)
+            if current is None:
+                # Pruned while streaming
+                yield sse_event('error', {'error': 'Job not found'})
+                return
+
+            results = [result for result in current['results'] if result['row'] not in sent_rows]
+            sent_rows.update(result['row'] for result in results)
+            counts = (current['status'], current['queued'], current['inFlight'],
+                      current['done'], current['failed'])
+
+            if results or counts != last_counts:
+                del current['userId']
+                current['results'] = results
+                yield sse_event('progress', current)
+                last_counts = counts
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= JOB_STREAM_KEEPALIVE_SECONDS:
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+
+            if current['status'] in ('completed', 'failed'):
+                yield sse_event('done', {
+                    'jobId': job_id,
+                    'status': current['status'],
+                    'error': current['error'],
+                    'total': current['total'],
+                    'done': current['done'],
+                    'failed': current['failed']
+                })
+                return
+
+            since = checked_at - JOB_STREAM_OVERLAP_SECONDS
+            time.sleep(JOB_STREAM_POLL_SECONDS)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
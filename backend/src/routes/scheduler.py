@@ -1,14 +1,46 @@
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import os
-from datetime import datetime
 from src.routes.auth import get_credentials
+from src.services.google_clients import get_sheets_service, get_blogger_service
+from src.services.scheduler_engine import scheduler_engine
+from src.services.shard_coordinator import shard_coordinator
+from src.services.publish_ledger import publish_ledger, row_hash
+from src.services.sheet_cache import get_sheet_snapshot
+from src.services.publishing import PublishError, find_pending_posts
+from src.services.publish_planner import PLAN_SOURCES, plan_publish
+from src.services.response_cache import response_cache
+from src.services.sheets_access import read_rows
+from src.services.row_mapper import get_row_mapper
+from src.services.batch_publisher import fits_in_request, insert_posts_batched
+from src.services.job_queue import job_queue
 
 # Create blueprint for scheduler routes
 scheduler_bp = Blueprint('scheduler', __name__)
 
+# Largest page of pending posts returned at once
+MAX_PENDING_PAGE_SIZE = 1000
+
+# Most rows accepted by one publish-rows request
+MAX_PUBLISH_ROWS = 500
+
+def pending_page_options(args):
+    """Read the offset and limit of a pending-posts page from query arguments.
+
+    limit is None (every pending post) when not given. Raises ValueError for
+    invalid arguments.
+    """
+    try:
+        offset = int(args.get('offset', 0))
+        limit = int(args['limit']) if args.get('limit') else None
+    except ValueError:
+        raise ValueError('offset and limit must be integers')
+    if offset < 0:
+        raise ValueError('offset must not be negative')
+    if limit is not None and not 1 <= limit <= MAX_PENDING_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PENDING_PAGE_SIZE}')
+    return offset, limit
+
 @scheduler_bp.route('/pending-posts')
 @login_required
 def get_pending_posts():
@@ -18,79 +50,34 @@ def get_pending_posts():
         sheet_id = request.args.get('sheet_id')
         if not sheet_id:
             return jsonify({'error': 'sheet_id parameter is required'}), 400
+        try:
+            offset, limit = pending_page_options(request.args)
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
         
         # Get user credentials
         credentials = get_credentials(current_user.id)
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Sheets API service
-        sheets_service = build('sheets', 'v4', credentials=credentials)
-        
-        # Get sheet data
-        result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=sheet_id,
-            range='A1:Z1000'  # Adjust range as needed
-        ).execute()
-        
-        values = result.get('values', [])
+        # Get sheet data (re-read only when the sheet changed)
+        snapshot = get_sheet_snapshot(current_user.id, credentials, sheet_id)
+        values = snapshot.values
         if not values:
             return jsonify({'error': 'No data found in sheet'}), 404
         
-        # Get headers and data
-        headers = values[0]
-        
-        # Check required columns
-        required_columns = ['Title', 'Content', 'Publish Date']
-        missing_columns = [col for col in required_columns if col not in headers]
-        if missing_columns:
-            return jsonify({
-                'error': f"Missing required columns: {', '.join(missing_columns)}"
-            }), 400
-        
-        # Get column indices
-        title_idx = headers.index('Title')
-        content_idx = headers.index('Content')
-        publish_date_idx = headers.index('Publish Date')
-        labels_idx = headers.index('Labels') if 'Labels' in headers else None
-        
-        # Get current time
-        now = datetime.now()
-        
         # Find pending posts (with future publish dates)
-        pending_posts = []
-        
-        for i, row in enumerate(values[1:], start=2):  # Start from 2 to account for 1-indexed rows and header
-            # Skip empty rows or rows without dates
-            if (len(row) <= title_idx or not row[title_idx] or 
-                len(row) <= publish_date_idx or not row[publish_date_idx]):
-                continue
-            
-            try:
-                # Parse the publish date
-                publish_date = datetime.fromisoformat(row[publish_date_idx].replace('Z', '+00:00'))
-                
-                # Check if it's in the future
-                if publish_date > now:
-                    post = {
-                        'row': i,
-                        'title': row[title_idx],
-                        'content': row[content_idx] if len(row) > content_idx else '',
-                        'publishDate': row[publish_date_idx],
-                        'formattedDate': publish_date.strftime('%Y-%m-%d %H:%M:%S')
-                    }
-                    
-                    # Add labels if available
-                    if labels_idx is not None and len(row) > labels_idx and row[labels_idx]:
-                        post['labels'] = row[labels_idx]
-                    
-                    pending_posts.append(post)
-            except ValueError:
-                # Skip rows with invalid date formats
-                continue
+        try:
+            pending_posts, total = find_pending_posts(
+                values, snapshot.publish_schedule(), offset=offset, limit=limit
+            )
+        except PublishError as error:
+            return jsonify({'error': str(error)}), 400
         
         return jsonify({
-            'pendingPosts': pending_posts
+            'pendingPosts': pending_posts,
+            'total': total,
+            'offset': offset
         })
     
     except HttpError as error:
@@ -116,55 +103,51 @@ def publish_now():
         
         sheet_id = data['sheetId']
         blog_id = data['blogId']
-        row = data['row']
+        try:
+            row = int(data['row'])
+        except (TypeError, ValueError):
+            return jsonify({'error': 'row must be a row number'}), 400
+        if row < 2:
+            return jsonify({'error': 'row must be a data row number (2 or greater)'}), 400
         
         # Get user credentials
         credentials = get_credentials(current_user.id)
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the services
-        sheets_service = build('sheets', 'v4', credentials=credentials)
-        blogger_service = build('blogger', 'v3', credentials=credentials)
+        # Get the services
+        sheets_service = get_sheets_service(current_user.id, credentials)
+        blogger_service = get_blogger_service(current_user.id, credentials)
         
-        # Get the specific row from the sheet
-        range_name = f'A{row}:Z{row}'
-        result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=sheet_id,
-            range=range_name
-        ).execute()
-        
-        row_values = result.get('values', [[]])
-        if not row_values or not row_values[0]:
+        # Get the header row and the specific row in one call
+        headers, rows = read_rows(sheets_service, sheet_id, [row])
+        row_data = rows.get(row)
+        if not row_data:
             return jsonify({'error': 'Row not found or empty'}), 404
         
-        # Get the header row to map columns
-        headers_result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=sheet_id,
-            range='A1:Z1'
-        ).execute()
-        
-        headers = headers_result.get('values', [[]])[0]
-        
-        # Get column indices
-        title_idx = headers.index('Title') if 'Title' in headers else None
-        content_idx = headers.index('Content') if 'Content' in headers else None
-        labels_idx = headers.index('Labels') if 'Labels' in headers else None
-        
-        if title_idx is None or content_idx is None:
+        # Check required columns
+        mapper = get_row_mapper(headers)
+        if mapper.missing(['Title', 'Content']):
             return jsonify({'error': 'Required columns not found in sheet'}), 400
         
-        row_data = row_values[0]
-        
         # Prepare post data
-        post_body = {
-            'title': row_data[title_idx] if len(row_data) > title_idx else 'Untitled',
-            'content': row_data[content_idx] if len(row_data) > content_idx else ''
-        }
-        
-        # Add labels if available
-        if labels_idx is not None and len(row_data) > labels_idx and row_data[labels_idx]:
-            post_body['labels'] = [label.strip() for label in row_data[labels_idx].split(',')]
+        record = mapper.map_row(row, row_data)
+        post_body = record.post_body()
+        post_body['title'] = record.title or 'Untitled'
+        
+        # Return the existing post if this row was already published
+        digest = row_hash(post_body)
+        published = publish_ledger.lookup(sheet_id, blog_id, digest)
+        if published:
+            return jsonify({
+                'success': True,
+                'alreadyPublished': True,
+                'post': {
+                    'id': published['postId'],
+                    'title': post_body['title'],
+                    'url': published['url']
+                }
+            })
         
         # Create the post
         post = blogger_service.posts().insert(
@@ -172,8 +155,9 @@ def publish_now():
             body=post_body
         ).execute()
         
-        # Update the sheet to mark as published (optional)
-        # This would require adding a "Status" column to the sheet
+        # Record the post so later checks don't publish the row again
+        publish_ledger.record(sheet_id, blog_id, digest, post, row=row)
+        response_cache.invalidate(current_user.id, 'blogs', f'blog:{blog_id}')
         
         return jsonify({
             'success': True,
@@ -183,10 +167,10 @@ def publish_now():
     except HttpError as error:
         return jsonify({'error': f'An error occurred: {error}'}), 500
 
-@scheduler_bp.route('/check-posts', methods=['POST'])
+@scheduler_bp.route('/publish-rows', methods=['POST'])
 @login_required
-def check_posts():
-    """Check for posts that are due for publication based on current time."""
+def publish_rows():
+    """Publish several sheet rows right away, reading them in a single call."""
     try:
         # Get request data
         data = request.json
@@ -194,7 +178,7 @@ def check_posts():
             return jsonify({'error': 'No data provided'}), 400
         
         # Validate required fields
-        required_fields = ['sheetId', 'blogId']
+        required_fields = ['sheetId', 'blogId', 'rows']
         missing_fields = [field for field in required_fields if field not in data]
         if missing_fields:
             return jsonify({
@@ -203,100 +187,204 @@ def check_posts():
         
         sheet_id = data['sheetId']
         blog_id = data['blogId']
+        rows_given = data['rows']
+        if not isinstance(rows_given, list) or not all(
+                isinstance(row, int) and not isinstance(row, bool) for row in rows_given):
+            return jsonify({'error': 'rows must be a list of row numbers'}), 400
+        if len(rows_given) > MAX_PUBLISH_ROWS:
+            return jsonify({
+                'error': f'At most {MAX_PUBLISH_ROWS} rows can be published at once'
+            }), 400
+        row_numbers = sorted(set(rows_given))
+        if not row_numbers or row_numbers[0] < 2:
+            return jsonify({'error': 'rows must be data row numbers (2 or greater)'}), 400
         
         # Get user credentials
         credentials = get_credentials(current_user.id)
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the services
-        sheets_service = build('sheets', 'v4', credentials=credentials)
-        blogger_service = build('blogger', 'v3', credentials=credentials)
-        
-        # Get sheet data
-        result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=sheet_id,
-            range='A1:Z1000'  # Adjust range as needed
-        ).execute()
-        
-        values = result.get('values', [])
-        if not values:
-            return jsonify({'error': 'No data found in sheet'}), 404
+        # Get the services
+        sheets_service = get_sheets_service(current_user.id, credentials)
+        blogger_service = get_blogger_service(current_user.id, credentials)
         
-        # Get headers and data
-        headers = values[0]
+        # Get the header row and every requested row in one call
+        headers, rows = read_rows(sheets_service, sheet_id, row_numbers)
         
         # Check required columns
-        required_columns = ['Title', 'Content', 'Publish Date']
-        missing_columns = [col for col in required_columns if col not in headers]
-        if missing_columns:
-            return jsonify({
-                'error': f"Missing required columns: {', '.join(missing_columns)}"
-            }), 400
-        
-        # Get column indices
-        title_idx = headers.index('Title')
-        content_idx = headers.index('Content')
-        publish_date_idx = headers.index('Publish Date')
-        labels_idx = headers.index('Labels') if 'Labels' in headers else None
-        
-        # Get current time
-        now = datetime.now()
-        
-        # Find posts due for publication
-        published_posts = []
+        mapper = get_row_mapper(headers)
+        if mapper.missing(['Title', 'Content']):
+            return jsonify({'error': 'Required columns not found in sheet'}), 400
         
-        for i, row in enumerate(values[1:], start=2):  # Start from 2 to account for 1-indexed rows and header
-            # Skip empty rows or rows without dates
-            if (len(row) <= title_idx or not row[title_idx] or 
-                len(row) <= publish_date_idx or not row[publish_date_idx]):
+        results = []
+        pending = []
+        for row in row_numbers:
+            row_data = rows.get(row)
+            if not row_data:
+                results.append({
+                    'row': row,
+                    'status': 'error',
+                    'message': 'Row not found or empty'
+                })
                 continue
             
-            try:
-                # Parse the publish date
-                publish_date = datetime.fromisoformat(row[publish_date_idx].replace('Z', '+00:00'))
-                
-                # Check if it's due for publication (past or current date)
-                if publish_date <= now:
-                    # Prepare post data
-                    post_body = {
-                        'title': row[title_idx],
-                        'content': row[content_idx] if len(row) > content_idx else ''
-                    }
-                    
-                    # Add labels if available
-                    if labels_idx is not None and len(row) > labels_idx and row[labels_idx]:
-                        post_body['labels'] = [label.strip() for label in row[labels_idx].split(',')]
-                    
-                    try:
-                        # Create the post
-                        post = blogger_service.posts().insert(
-                            blogId=blog_id,
-                            body=post_body
-                        ).execute()
-                        
-                        published_posts.append({
-                            'row': i,
-                            'title': row[title_idx],
-                            'status': 'success',
-                            'postId': post['id'],
-                            'url': post.get('url', '')
-                        })
-                    except Exception as e:
-                        published_posts.append({
-                            'row': i,
-                            'title': row[title_idx],
-                            'status': 'error',
-                            'message': str(e)
-                        })
-            except ValueError:
-                # Skip rows with invalid date formats
+            record = mapper.map_row(row, row_data)
+            post_body = record.post_body()
+            post_body['title'] = record.title or 'Untitled'
+            result = {'row': row, 'title': post_body['title']}
+            results.append(result)
+            
+            # Skip rows that were already published
+            digest = row_hash(post_body)
+            published = publish_ledger.lookup(sheet_id, blog_id, digest)
+            if published:
+                result.update({
+                    'status': 'skipped',
+                    'message': 'Already published',
+                    'postId': published['postId'],
+                    'url': published['url']
+                })
                 continue
+            
+            pending.append((row, post_body, digest, result))
+        
+        # Publishes too large to pace within the blog's quota in this request
+        # go through the durable job queue
+        if not fits_in_request(current_user.id, {blog_id: len(pending)}):
+            job_id = job_queue.create(current_user.id, sheet_id, blog_id, results, pending)
+            return jsonify({
+                'success': True,
+                'jobId': job_id,
+                'status': 'queued',
+                'statusUrl': f'/jobs/{job_id}',
+                'streamUrl': f'/jobs/{job_id}/stream'
+            }), 202
+        
+        # Create the posts in batch HTTP requests
+        outcomes = insert_posts_batched(
+            current_user.id, blogger_service, blog_id,
+            [(row, post_body) for row, post_body, _, _ in pending]
+        )
+        if pending:
+            response_cache.invalidate(current_user.id, 'blogs', f'blog:{blog_id}')
+        
+        for row, post_body, digest, result in pending:
+            post, error = outcomes.get(row, (None, 'No response received'))
+            if error is not None:
+                result.update({
+                    'status': 'error',
+                    'message': str(error)
+                })
+                continue
+            
+            publish_ledger.record(sheet_id, blog_id, digest, post, row=row)
+            result.update({
+                'status': 'success',
+                'postId': post['id'],
+                'url': post.get('url', '')
+            })
         
         return jsonify({
             'success': True,
-            'publishedPosts': published_posts
+            'results': results
         })
     
     except HttpError as error:
         return jsonify({'error': f'An error occurred: {error}'}), 500
+
+@scheduler_bp.route('/check-posts', methods=['POST'])
+@login_required
+def check_posts():
+    """Queue a check for posts that are due for publication.
+
+    The sheet is registered with the background scheduler, which keeps
+    publishing its posts as they become due. Returns a job id that can be
+    polled with /jobs/<job_id>.
+    """
+    # Get request data
+    data = request.json
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    # Validate required fields
+    required_fields = ['sheetId', 'blogId']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return jsonify({
+            'error': f"Missing required fields: {', '.join(missing_fields)}"
+        }), 400
+    
+    # Make sure the background publisher will be able to act for the user
+    credentials = get_credentials(current_user.id)
+    if not credentials:
+        return jsonify({'error': 'No valid credentials found'}), 401
+    
+    # Dry run: plan what the scheduler would publish now, without writing
+    # to the blog or registering the sheet
+    if data.get('dryRun'):
+        source = data.get('compareWith', 'ledger')
+        if source not in PLAN_SOURCES:
+            return jsonify({'error': f"compareWith must be one of: {', '.join(PLAN_SOURCES)}"}), 400
+        try:
+            blogger_service = get_blogger_service(current_user.id, credentials)
+            snapshot = get_sheet_snapshot(current_user.id, credentials, data['sheetId'])
+            plan = plan_publish(current_user.id, blogger_service, data['sheetId'], data['blogId'],
+                                snapshot, mode='schedule', source=source)
+        except PublishError as error:
+            return jsonify({'error': str(error)}), 400
+        except HttpError as error:
+            return jsonify({'error': f'An error occurred: {error}'}), 500
+        return jsonify({
+            'success': True,
+            'dryRun': True,
+            'plan': plan
+        })
+    
+    job_id = scheduler_engine.enqueue(current_user.id, data['sheetId'], data['blogId'])
+    
+    return jsonify({
+        'success': True,
+        'jobId': job_id,
+        'status': 'queued',
+        'statusUrl': f'/jobs/{job_id}',
+        'streamUrl': f'/jobs/{job_id}/stream'
+    }), 202
+
+@scheduler_bp.route('/registrations')
+@login_required
+def list_registrations():
+    """List the sheets the background scheduler is publishing for the user."""
+    return jsonify({
+        'registrations': scheduler_engine.registrations(current_user.id)
+    })
+
+@scheduler_bp.route('/registrations', methods=['DELETE'])
+@login_required
+def delete_registration():
+    """Stop publishing a sheet in the background."""
+    # Get request data
+    data = request.json
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    # Validate required fields
+    required_fields = ['sheetId', 'blogId']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return jsonify({
+            'error': f"Missing required fields: {', '.join(missing_fields)}"
+        }), 400
+    
+    if not scheduler_engine.unregister(current_user.id, data['sheetId'], data['blogId']):
+        return jsonify({'error': 'Sheet is not registered'}), 404
+    
+    return jsonify({
+        'success': True,
+        'message': 'Sheet unregistered successfully'
+    })
+
+@scheduler_bp.route('/shards')
+@login_required
+def list_shards():
+    """Get the scheduler workers, shard owners and per-shard throughput."""
+    return jsonify(shard_coordinator.stats())
@@ -1,16 +1,25 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from flask_login import login_required, current_user
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
 import os
 from src.routes.auth import get_credentials
+from src.services.google_clients import get_sheets_service, get_drive_service
+from src.services.sheet_reader import iter_sheet_rows
+from src.services.response_cache import cached_response
+from src.services.sheets_access import read_headers
+from src.services.sheet_cache import get_sheet_snapshot
+from src.services.sheet_query import QueryError, parse_query, run_query
+from src.services.sheet_formats import (
+    SHEET_DATA_FORMATS, SHEET_DATA_MIMETYPES, data_rows, stream_sheet_data
+)
 
 # Create blueprint for Google Sheets routes
 sheets_bp = Blueprint('sheets', __name__)
 
 @sheets_bp.route('/list')
 @login_required
+@cached_response(tags=lambda: ['sheets'])
 def list_sheets():
     """List all Google Sheets accessible to the user."""
     try:
@@ -19,8 +28,8 @@ def list_sheets():
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Drive API service
-        drive_service = build('drive', 'v3', credentials=credentials)
+        # Get the Drive API service
+        drive_service = get_drive_service(current_user.id, credentials)
         
         # Search for Google Sheets files
         results = drive_service.files().list(
@@ -36,6 +45,7 @@ def list_sheets():
 
 @sheets_bp.route('/<sheet_id>/metadata')
 @login_required
+@cached_response(tags=lambda sheet_id: [f'sheet:{sheet_id}'])
 def get_sheet_metadata(sheet_id):
     """Get metadata for a specific Google Sheet."""
     try:
@@ -44,18 +54,20 @@ def get_sheet_metadata(sheet_id):
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Sheets API service
-        sheets_service = build('sheets', 'v4', credentials=credentials)
+        # Get the Sheets API service
+        sheets_service = get_sheets_service(current_user.id, credentials)
         
         # Get spreadsheet metadata
         spreadsheet = sheets_service.spreadsheets().get(
             spreadsheetId=sheet_id
         ).execute()
         
-        # Extract sheet names and IDs
+        # Extract sheet names, IDs and grid sizes
         sheets = [{
             'title': sheet['properties']['title'],
-            'sheetId': sheet['properties']['sheetId']
+            'sheetId': sheet['properties']['sheetId'],
+            'rowCount': sheet['properties'].get('gridProperties', {}).get('rowCount', 0),
+            'columnCount': sheet['properties'].get('gridProperties', {}).get('columnCount', 0)
         } for sheet in spreadsheet.get('sheets', [])]
         
         return jsonify({
@@ -70,38 +82,62 @@ def get_sheet_metadata(sheet_id):
 @sheets_bp.route('/<sheet_id>/data')
 @login_required
 def get_sheet_data(sheet_id):
-    """Get data from a specific Google Sheet."""
+    """Get data from a specific Google Sheet.
+
+    The columnar and ndjson formats are streamed as the rows are read, so
+    memory use and time to first byte stay flat however large the sheet is.
+    """
     try:
         # Get query parameters
-        range_name = request.args.get('range', 'A1:Z1000')  # Default range
+        range_name = request.args.get('range')  # Defaults to the whole first tab
+        data_format = request.args.get('format', 'objects')
+        if data_format not in SHEET_DATA_FORMATS:
+            return jsonify({
+                'error': f"format must be one of: {', '.join(SHEET_DATA_FORMATS)}"
+            }), 400
+        
+        try:
+            query = parse_query(request.args)
+        except QueryError as error:
+            return jsonify({'error': str(error)}), 400
         
         # Get user credentials
         credentials = get_credentials(current_user.id)
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Sheets API service
-        sheets_service = build('sheets', 'v4', credentials=credentials)
+        # Filtered, projected or paged queries run over the cached snapshot
+        if query is not None:
+            return query_sheet_data(credentials, sheet_id, range_name, query, data_format)
         
-        # Get spreadsheet data
-        result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=sheet_id,
-            range=range_name
-        ).execute()
+        # Get the Sheets API service
+        sheets_service = get_sheets_service(current_user.id, credentials)
         
-        # Get header row and data rows
-        values = result.get('values', [])
-        if not values:
+        # Get spreadsheet data
+        if range_name:
+            result = sheets_service.spreadsheets().values().get(
+                spreadsheetId=sheet_id,
+                range=range_name
+            ).execute()
+            rows = enumerate(result.get('values', []), start=1)
+        else:
+            # Stream the whole tab in blocks sized from the sheet's grid
+            rows = iter_sheet_rows(sheets_service, sheet_id)
+        
+        # Read the headers (and the first block of rows) before responding
+        first = next(rows, None)
+        if first is None:
             return jsonify({'error': 'No data found'}), 404
+        headers = first[1]
         
-        headers = values[0]
-        data = []
+        if data_format != 'objects':
+            return Response(
+                stream_with_context(stream_sheet_data(headers, data_rows(headers, rows), data_format)),
+                mimetype=SHEET_DATA_MIMETYPES[data_format]
+            )
         
         # Convert rows to dictionaries using headers as keys
-        for row in values[1:]:
-            # Pad row with empty strings if it's shorter than headers
-            padded_row = row + [''] * (len(headers) - len(row))
-            data.append(dict(zip(headers, padded_row)))
+        data = [dict(zip(headers, row)) for row in data_rows(headers, rows)]
         
         return jsonify({
             'headers': headers,
@@ -111,6 +147,37 @@ def get_sheet_data(sheet_id):
     except HttpError as error:
         return jsonify({'error': f'An error occurred: {error}'}), 500
 
+def query_sheet_data(credentials, sheet_id, range_name, query, data_format):
+    """Answer a sheet data query from the sheet's cached snapshot and indexes.
+
+    The values are only re-read when the sheet changed, and filters are
+    index lookups. Every query still makes one Drive files.get call to check
+    the sheet's revision, which dominates its cost.
+    """
+    # Get sheet data (re-read only when the sheet changed)
+    snapshot = get_sheet_snapshot(current_user.id, credentials, sheet_id, range_name)
+    if not snapshot.values:
+        return jsonify({'error': 'No data found'}), 404
+    
+    try:
+        headers, rows, total = run_query(snapshot.query_index(), snapshot.values, query)
+    except QueryError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    if data_format == 'ndjson':
+        return Response(
+            stream_with_context(stream_sheet_data(headers, rows, data_format)),
+            mimetype=SHEET_DATA_MIMETYPES[data_format]
+        )
+    
+    page = {'headers': headers}
+    if data_format == 'columnar':
+        page['rows'] = rows
+    else:
+        page['data'] = [dict(zip(headers, row)) for row in rows]
+    page.update({'total': total, 'offset': query['offset']})
+    return jsonify(page)
+
 @sheets_bp.route('/validate')
 @login_required
 def validate_sheet():
@@ -126,17 +193,13 @@ def validate_sheet():
         if not credentials:
             return jsonify({'error': 'No valid credentials found'}), 401
         
-        # Build the Sheets API service
-        sheets_service = build('sheets', 'v4', credentials=credentials)
+        # Get the Sheets API service
+        sheets_service = get_sheets_service(current_user.id, credentials)
         
-        # Get the first row (headers)
-        result = sheets_service.spreadsheets().values().get(
-            spreadsheetId=sheet_id,
-            range='A1:Z1'
-        ).execute()
+        # Get the first row (headers), however many columns it has
+        headers = read_headers(sheets_service, sheet_id)
         
         # Check if required columns exist
-        headers = result.get('values', [[]])[0]
         required_columns = ['Title', 'Content', 'Labels', 'Publish Date']
         missing_columns = [col for col in required_columns if col not in headers]
         
@@ -0,0 +1,61 @@
+"""Scheduler worker process.
+
+Publishes the due posts of the calendars in the shards it leases. Run any
+number of them next to the web app (with SCHEDULER_MODE=sharded there), all
+sharing one DATABASE_PATH:
+
+    python -m src.scheduler_worker
+"""
+import logging
+import os
+import signal
+import threading
+from src.services.scheduler_engine import scheduler_engine
+from src.services.shard_coordinator import shard_coordinator
+
+logger = logging.getLogger('src.scheduler_worker')
+
+# Seconds between heartbeats; well under the lease so leases never lapse
+SCHEDULER_HEARTBEAT_SECONDS = float(os.getenv(
+    'SCHEDULER_HEARTBEAT_SECONDS', str(shard_coordinator.lease_seconds / 3)
+))
+
+
+def run(stop_event):
+    """Heartbeat and rebalance shards until stop_event is set."""
+    owned = set()
+    scheduler_engine.set_owned_shards(owned)
+    scheduler_engine.start()
+    logger.info('Scheduler worker %s started', shard_coordinator.worker_id)
+    try:
+        while not stop_event.is_set():
+            try:
+                shards = shard_coordinator.rebalance()
+                if shards != owned:
+                    logger.info(
+                        'Worker %s now owns %d shards (+%d -%d)',
+                        shard_coordinator.worker_id, len(shards),
+                        len(shards - owned), len(owned - shards)
+                    )
+                    owned = shards
+                # Also picks up calendars registered through the web app
+                scheduler_engine.set_owned_shards(owned)
+            except Exception:
+                logger.exception('Shard rebalance failed')
+            stop_event.wait(SCHEDULER_HEARTBEAT_SECONDS)
+    finally:
+        scheduler_engine.stop()
+        shard_coordinator.leave()
+        logger.info('Scheduler worker %s stopped', shard_coordinator.worker_id)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+    run(stop_event)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import json
+import os
+import httpx
+from googleapiclient import discovery_cache
+from src.services.google_clients import GOOGLE_API_ROOT
+
+# Connection pool shared by every async request to Google APIs
+GOOGLE_HTTP_MAX_CONNECTIONS = int(os.getenv('GOOGLE_HTTP_MAX_CONNECTIONS', '200'))
+GOOGLE_HTTP_MAX_KEEPALIVE = int(os.getenv('GOOGLE_HTTP_MAX_KEEPALIVE', '100'))
+GOOGLE_HTTP_TIMEOUT = float(os.getenv('GOOGLE_HTTP_TIMEOUT', '30'))
+
+
+def api_url(api, version, path=''):
+    """Base URL of a Google API, as used by the discovery-built services.
+
+    Taken from the discovery document bundled with google-api-python-client,
+    with its root replaced by GOOGLE_API_ROOT when that is set.
+    """
+    document = json.loads(discovery_cache.get_static_doc(api, version))
+    return (GOOGLE_API_ROOT or document['rootUrl']) + document['servicePath'] + path
+
+
+SHEETS_API = api_url('sheets', 'v4', 'v4/spreadsheets')
+DRIVE_API = api_url('drive', 'v3').rstrip('/')
+BLOGGER_API = api_url('blogger', 'v3', 'v3')
+
+
+class GoogleApiError(Exception):
+    """Raised when a Google REST call returns an error status."""
+
+    def __init__(self, status, message):
+        super().__init__(f'<HttpError {status}: {message}>')
+        self.status = status
+        self.message = message
+
+
+class AsyncGoogleClient:
+    """Minimal async client for the Google REST endpoints the app uses.
+
+    All calls share one keep-alive connection pool, so concurrent dashboard
+    requests reuse warm TLS connections instead of blocking a thread each.
+    """
+
+    def __init__(self):
+        self._client = None
+
+    async def start(self):
+        """Open the shared connection pool."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=GOOGLE_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=GOOGLE_HTTP_MAX_KEEPALIVE
+                ),
+                timeout=GOOGLE_HTTP_TIMEOUT
+            )
+
+    async def close(self):
+        """Close the shared connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, url, token, params=None):
+        """GET a Google REST resource and return the decoded JSON body."""
+        await self.start()
+        response = await self._client.get(
+            url,
+            params=params,
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('error', {}).get('message', response.text)
+            except ValueError:
+                message = response.text
+            raise GoogleApiError(response.status_code, message)
+        return response.json()
+
+
+# Process-wide async Google client
+google_client = AsyncGoogleClient()
@@ -0,0 +1,165 @@
+import os
+import time
+from datetime import datetime, timezone
+from googleapiclient.errors import HttpError
+from src.services.publish_executor import (
+    PUBLISH_MAX_RETRIES, backoff_delay, is_server_error, is_throttled, publish_executor
+)
+
+# Number of inserts sent per batch HTTP request (Google allows up to 1000,
+# but Blogger processes large batches slowly, so keep them modest)
+BLOGGER_BATCH_SIZE = min(int(os.getenv('BLOGGER_BATCH_SIZE', '50')), 1000)
+
+# Longest quota wait a publish may spend inside a web request; larger
+# publishes are queued as background jobs so the request returns well
+# within the server's worker timeout
+SYNC_PUBLISH_MAX_SECONDS = float(os.getenv('SYNC_PUBLISH_MAX_SECONDS', '20'))
+
+# Slack for clock skew when looking on the blog for posts created by
+# inserts that failed with a server error
+INSERT_LOOKUP_SKEW_SECONDS = 60
+
+
+def fits_in_request(user_id, counts):
+    """Whether inserts can be paced within a synchronous request.
+
+    counts maps each blog id to the number of posts to insert into it. The
+    blogs are published in parallel but share the user's quota, so both the
+    per-blog and the per-user waits must stay within SYNC_PUBLISH_MAX_SECONDS.
+    """
+    total = sum(counts.values())
+    if publish_executor.estimate_seconds(user_id, None, total) > SYNC_PUBLISH_MAX_SECONDS:
+        return False
+    return all(
+        publish_executor.estimate_seconds(user_id, blog_id, count) <= SYNC_PUBLISH_MAX_SECONDS
+        for blog_id, count in counts.items()
+    )
+
+
+def insert_posts_batched(user_id, blogger_service, blog_id, items, batch_size=BLOGGER_BATCH_SIZE):
+    """Insert posts through batch HTTP requests.
+
+    items is a list of (key, post body) pairs, where keys are integers such
+    as sheet row numbers. Batches are paced by the user's and blog's write
+    quotas, and inserts that come back throttled are retried individually
+    with backoff. Returns a dict mapping each key to a (post, error) pair,
+    where exactly one is set.
+    """
+    started = time.time()
+    outcomes = {}
+
+    def callback(request_id, response, exception):
+        # Request ids are the keys of the items, e.g. sheet row numbers
+        outcomes[int(request_id)] = (response, exception)
+
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        publish_executor.throttle(user_id, blog_id, len(chunk))
+
+        batch = blogger_service.new_batch_http_request(callback=callback)
+        for row, post_body in chunk:
+            batch.add(
+                blogger_service.posts().insert(blogId=blog_id, body=post_body),
+                request_id=str(row)
+            )
+        try:
+            batch.execute()
+        except Exception as e:
+            # The whole batch failed to go through; fail its rows
+            for row, _ in chunk:
+                outcomes.setdefault(row, (None, e))
+
+    # Throttled inserts were rejected, so they are retried one by one with
+    # backoff
+    retry_rows = {row for row, (_, error) in outcomes.items() if is_throttled(error)}
+    if retry_rows:
+        publish_executor.backoff(user_id, blog_id)
+        outcomes.update(publish_executor.publish(
+            user_id, blogger_service, blog_id,
+            [(row, post_body) for row, post_body in items if row in retry_rows]
+        ))
+
+    recover_failed_inserts(user_id, blogger_service, blog_id, items, outcomes, started)
+    return outcomes
+
+
+def insert_posts(user_id, blogger_service, blog_id, items):
+    """Insert posts concurrently, one request each.
+
+    Takes and returns the same items and outcomes as insert_posts_batched.
+    """
+    started = time.time()
+    outcomes = publish_executor.publish(user_id, blogger_service, blog_id, items)
+    recover_failed_inserts(user_id, blogger_service, blog_id, items, outcomes, started)
+    return outcomes
+
+
+def recover_failed_inserts(user_id, blogger_service, blog_id, items, outcomes, started):
+    """Settle inserts that failed with a server error, without duplicating posts.
+
+    A 5xx from posts.insert can arrive after the post was created, so the
+    blog is searched for posts created since `started` with the same title
+    before anything is sent again. Rows found there take that post; the rest
+    are re-inserted, up to PUBLISH_MAX_RETRIES times with backoff. Updates
+    outcomes in place.
+    """
+    bodies = dict(items)
+    claimed = {post['id'] for post, _ in outcomes.values() if post}
+    attempt = 0
+    while True:
+        failed = [row for row, (_, error) in outcomes.items() if is_server_error(error)]
+        if not failed:
+            return
+
+        try:
+            created = find_created_posts(blogger_service, blog_id, started, claimed)
+        except HttpError:
+            # Without the blog's posts a re-insert could duplicate them
+            return
+        for row in failed:
+            matches = created.get(bodies[row].get('title'))
+            if matches:
+                post = matches.pop(0)
+                claimed.add(post['id'])
+                outcomes[row] = (post, None)
+
+        failed = [row for row in failed if outcomes[row][1] is not None]
+        if not failed or attempt >= PUBLISH_MAX_RETRIES:
+            return
+        publish_executor.backoff(user_id, blog_id)
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+        outcomes.update(publish_executor.publish(
+            user_id, blogger_service, blog_id,
+            [(row, bodies[row]) for row in failed]
+        ))
+
+
+def find_created_posts(blogger_service, blog_id, since, exclude_ids=()):
+    """List the posts created on a blog since an epoch time, by title.
+
+    Only post summaries are fetched. Posts whose id is in exclude_ids are
+    left out. Returns a dict mapping each title to its posts, oldest first.
+    """
+    start_date = datetime.fromtimestamp(since - INSERT_LOOKUP_SKEW_SECONDS, tz=timezone.utc)
+    options = {
+        'blogId': blog_id,
+        'startDate': start_date.isoformat(),
+        'fetchBodies': False,
+        'maxResults': 500,
+        'fields': 'nextPageToken,items(id,title,url,published,updated,labels,status)'
+    }
+    created = {}
+    while True:
+        page = blogger_service.posts().list(**options).execute()
+        for post in page.get('items', []):
+            if post['id'] not in exclude_ids:
+                created.setdefault(post.get('title'), []).append(post)
+        if not page.get('nextPageToken'):
+            break
+        options['pageToken'] = page['nextPageToken']
+
+    # Pages are newest first
+    for posts in created.values():
+        posts.reverse()
+    return created
@@ -0,0 +1,71 @@
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+
+# Location of the local SQLite database
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'blog_automation.db')
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_applied_schemas = set()
+
+
+def get_connection():
+    """Get the calling thread's SQLite connection.
+
+    Connections run in WAL mode so readers never block the writer and several
+    processes can share the same database file.
+    """
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        connection = sqlite3.connect(DATABASE_PATH, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        _local.connection = connection
+    return connection
+
+
+def ensure_schema(name, script):
+    """Apply a schema script once per process."""
+    if name in _applied_schemas:
+        return
+    with _schema_lock:
+        if name not in _applied_schemas:
+            connection = get_connection()
+            connection.executescript(script)
+            connection.commit()
+            _applied_schemas.add(name)
+
+
+@contextlib.contextmanager
+def keep_alive(renew, interval, name='lease'):
+    """Call renew every interval seconds while the block runs.
+
+    Used to extend a lease stored in the database (a lock expiry or a
+    visibility timeout) while the work it guards takes longer than the lease.
+    renew runs on its own thread and returns False once the lease was lost,
+    which stops the renewals.
+    """
+    stopped = threading.Event()
+
+    def run():
+        while not stopped.wait(interval):
+            try:
+                if not renew():
+                    logger.warning('Lost %s before the work it guards finished', name)
+                    return
+            except Exception:
+                logger.exception('Renewing %s failed', name)
+
+    thread = threading.Thread(target=run, name=f'{name}-renewal', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
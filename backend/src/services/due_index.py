@@ -0,0 +1,222 @@
+import json
+import threading
+from src.services.database import get_connection, ensure_schema
+from src.services.publish_schedule import publish_epoch
+from src.services.row_mapper import get_row_mapper
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scheduler_due_calendars (
+    user_id TEXT NOT NULL,
+    sheet_id TEXT NOT NULL,
+    blog_id TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    PRIMARY KEY (user_id, sheet_id, blog_id)
+);
+CREATE TABLE IF NOT EXISTS scheduler_due_rows (
+    user_id TEXT NOT NULL,
+    sheet_id TEXT NOT NULL,
+    blog_id TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    epoch REAL NOT NULL,
+    row_hash TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (user_id, sheet_id, blog_id, row)
+);
+CREATE INDEX IF NOT EXISTS idx_scheduler_due_rows_epoch
+    ON scheduler_due_rows (user_id, sheet_id, blog_id, state, epoch);
+'''
+
+# Row states: waiting for their publish time, or handed out by pop_due
+QUEUED = 'queued'
+POPPED = 'popped'
+
+
+class DueIndex:
+    """Due times of the rows of one calendar, kept in the SQLite database.
+
+    Every titled row with a valid publish date has an entry of (publish
+    epoch, row hash, state), ordered by an index on the epoch, so a tick pops
+    the rows that have come due instead of rescanning the sheet. Rows handed
+    out by pop_due stay as popped entries until their content changes, which
+    queues them again. Being in the database, the index survives restarts
+    and is shared by every process; the scheduler's calendar lock keeps two
+    processes from working on the same calendar at once.
+    """
+
+    def __init__(self, user_id, sheet_id, blog_id):
+        self.key = (str(user_id), sheet_id, blog_id)
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        ensure_schema('due_index', SCHEMA)
+        return get_connection()
+
+    def sync(self, snapshot):
+        """Bring the index up to date with a sheet snapshot.
+
+        Only rows whose hash differs from their entry are parsed and written.
+        """
+        with self._lock:
+            if snapshot is self._snapshot:
+                return
+            connection = self._connection()
+            headers = json.dumps(snapshot.headers, ensure_ascii=False)
+            with connection:
+                stored = connection.execute(
+                    'SELECT headers FROM scheduler_due_calendars '
+                    'WHERE user_id = ? AND sheet_id = ? AND blog_id = ?',
+                    self.key
+                ).fetchone()
+                if stored is None or stored['headers'] != headers:
+                    # Column positions moved, so every row is read again
+                    connection.execute(
+                        'DELETE FROM scheduler_due_rows WHERE user_id = ? AND sheet_id = ? AND blog_id = ?',
+                        self.key
+                    )
+                    connection.execute(
+                        'INSERT OR REPLACE INTO scheduler_due_calendars '
+                        '(user_id, sheet_id, blog_id, headers) VALUES (?, ?, ?, ?)',
+                        self.key + (headers,)
+                    )
+                    entries = {}
+                else:
+                    entries = {
+                        r['row']: r['row_hash'] for r in connection.execute(
+                            'SELECT row, row_hash FROM scheduler_due_rows '
+                            'WHERE user_id = ? AND sheet_id = ? AND blog_id = ?',
+                            self.key
+                        )
+                    }
+
+                mapper = get_row_mapper(snapshot.headers)
+                upserts = []
+                deletes = []
+                for i, row, digest in snapshot.rows():
+                    if entries.pop(i, None) == digest:
+                        continue
+                    if (mapper.title_idx is None or mapper.publish_date_idx is None or
+                            len(row) <= max(mapper.title_idx, mapper.publish_date_idx) or
+                            not row[mapper.title_idx] or not row[mapper.publish_date_idx]):
+                        deletes.append(i)
+                        continue
+                    epoch = publish_epoch(row[mapper.publish_date_idx])
+                    if epoch is None:
+                        deletes.append(i)
+                        continue
+                    upserts.append(self.key + (i, epoch, digest, QUEUED))
+                # Entries left over belong to rows deleted from the sheet
+                deletes.extend(entries)
+
+                connection.executemany(
+                    'DELETE FROM scheduler_due_rows '
+                    'WHERE user_id = ? AND sheet_id = ? AND blog_id = ? AND row = ?',
+                    [self.key + (i,) for i in deletes]
+                )
+                connection.executemany(
+                    'INSERT OR REPLACE INTO scheduler_due_rows '
+                    '(user_id, sheet_id, blog_id, row, epoch, row_hash, state) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    upserts
+                )
+            self._snapshot = snapshot
+
+    def pop_due(self, now):
+        """Mark the rows due at now as popped and return them, earliest first."""
+        connection = self._connection()
+        with self._lock, connection:
+            due = [r['row'] for r in connection.execute(
+                'SELECT row FROM scheduler_due_rows '
+                'WHERE user_id = ? AND sheet_id = ? AND blog_id = ? AND state = ? AND epoch <= ? '
+                'ORDER BY epoch, row',
+                self.key + (QUEUED, now)
+            )]
+            connection.executemany(
+                'UPDATE scheduler_due_rows SET state = ? '
+                'WHERE user_id = ? AND sheet_id = ? AND blog_id = ? AND row = ?',
+                [(POPPED,) + self.key + (i,) for i in due]
+            )
+        return due
+
+    def requeue(self, rows):
+        """Queue popped rows again, e.g. after a failed publish."""
+        connection = self._connection()
+        with self._lock, connection:
+            connection.executemany(
+                'UPDATE scheduler_due_rows SET state = ? '
+                'WHERE user_id = ? AND sheet_id = ? AND blog_id = ? AND row = ? AND state = ?',
+                [(QUEUED,) + self.key + (i, POPPED) for i in rows]
+            )
+
+    def next_due(self):
+        """Epoch time of the earliest queued row, or None."""
+        return self._connection().execute(
+            'SELECT MIN(epoch) AS epoch FROM scheduler_due_rows '
+            'WHERE user_id = ? AND sheet_id = ? AND blog_id = ? AND state = ?',
+            self.key + (QUEUED,)
+        ).fetchone()['epoch']
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) AS count FROM scheduler_due_rows '
+            'WHERE user_id = ? AND sheet_id = ? AND blog_id = ? AND state = ?',
+            self.key + (QUEUED,)
+        ).fetchone()['count']
+
+
+class DueIndexRegistry:
+    """Due indexes of the calendars tracked by the scheduler."""
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, sheet_id, blog_id):
+        """Get the index of a calendar."""
+        key = (str(user_id), sheet_id, blog_id)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = DueIndex(*key)
+            return index
+
+    def forget(self, user_id, sheet_id, blog_id):
+        """Drop the index of a calendar that is no longer tracked by this process.
+
+        The stored entries are kept for whichever process tracks it next.
+        """
+        with self._lock:
+            self._indexes.pop((str(user_id), sheet_id, blog_id), None)
+
+    def delete(self, user_id, sheet_id, blog_id):
+        """Drop the stored entries of an unregistered calendar."""
+        self.forget(user_id, sheet_id, blog_id)
+        key = (str(user_id), sheet_id, blog_id)
+        ensure_schema('due_index', SCHEMA)
+        connection = get_connection()
+        with connection:
+            connection.execute(
+                'DELETE FROM scheduler_due_rows WHERE user_id = ? AND sheet_id = ? AND blog_id = ?', key
+            )
+            connection.execute(
+                'DELETE FROM scheduler_due_calendars WHERE user_id = ? AND sheet_id = ? AND blog_id = ?', key
+            )
+
+    def stats(self):
+        """Return the number of indexed calendars and queued rows."""
+        ensure_schema('due_index', SCHEMA)
+        connection = get_connection()
+        calendars = connection.execute(
+            'SELECT COUNT(*) AS count FROM scheduler_due_calendars'
+        ).fetchone()['count']
+        queued = connection.execute(
+            'SELECT COUNT(*) AS count FROM scheduler_due_rows WHERE state = ?', (QUEUED,)
+        ).fetchone()['count']
+        return {
+            'calendars': calendars,
+            'queuedRows': queued
+        }
+
+
+# Process-wide due indexes
+due_indexes = DueIndexRegistry()
@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import google_auth_httplib2
+import httplib2
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document, fix_method_name
+from googleapiclient.http import HttpRequest
+
+# Maximum number of (user, api, version) services kept alive
+SERVICE_CACHE_SIZE = int(os.getenv('SERVICE_CACHE_SIZE', '256'))
+
+# Services unused for this many seconds are evicted
+SERVICE_CACHE_IDLE_SECONDS = int(os.getenv('SERVICE_CACHE_IDLE_SECONDS', '1800'))
+
+# Base URL replacing every Google API host, e.g. a local fake server in tests
+GOOGLE_API_ROOT = os.getenv('GOOGLE_API_ROOT')
+
+
+class _ServiceEntry:
+    """A built API service together with the credentials it is bound to."""
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self.service = None
+        self.last_used = time.monotonic()
+        self._local = threading.local()
+
+    def http(self):
+        """Return an authorized HTTP object owned by the calling thread.
+
+        httplib2 connections are not thread-safe, so every thread gets its own
+        transport while sharing the (expensive) resource tree of the service.
+        """
+        authed_http = getattr(self._local, 'http', None)
+        if authed_http is None:
+            authed_http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=httplib2.Http()
+            )
+            self._local.http = authed_http
+        elif authed_http.credentials is not self.credentials:
+            authed_http.credentials = self.credentials
+        return authed_http
+
+    def request_builder(self, http, *args, **kwargs):
+        """Build requests against the calling thread's transport."""
+        return HttpRequest(self.http(), *args, **kwargs)
+
+
+class ServiceCache:
+    """Bounded LRU cache of built Google API services keyed by user and API."""
+
+    def __init__(self, max_size=SERVICE_CACHE_SIZE, idle_seconds=SERVICE_CACHE_IDLE_SECONDS):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id, api, version, credentials):
+        """Return a cached service for the user, building it on a miss."""
+        key = (str(user_id), api, version)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is None:
+            entry = self._build(key, credentials)
+
+        # Always bind the latest credentials (they may have been refreshed)
+        entry.credentials = credentials
+        entry.last_used = now
+        return entry.service
+
+    def _build(self, key, credentials):
+        """Build and cache a service.
+
+        Concurrent misses on the same key (e.g. a fan-out reading many
+        sheets at once) wait for a single build instead of each parsing the
+        discovery document.
+        """
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None:
+                entry = _ServiceEntry(credentials)
+                entry.service = memoize_resources(build_service(
+                    key[1], key[2],
+                    http=entry.http(),
+                    requestBuilder=entry.request_builder
+                ))
+            with self._lock:
+                self._build_locks.pop(key, None)
+                entry = self._entries.setdefault(key, entry)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return entry
+
+    def rebind(self, user_id, credentials):
+        """Point every cached service of a user at new credentials."""
+        user_id = str(user_id)
+        with self._lock:
+            for key, entry in self._entries.items():
+                if key[0] == user_id:
+                    entry.credentials = credentials
+
+    def evict_user(self, user_id):
+        """Drop every cached service of a user."""
+        user_id = str(user_id)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+                self.evictions += 1
+
+    def _evict_idle(self, now):
+        """Drop entries that have not been used within the idle timeout."""
+        # Entries are kept in LRU order, so idle ones are at the front
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.last_used < self.idle_seconds:
+                break
+            del self._entries[key]
+            self.evictions += 1
+
+    def stats(self):
+        """Return cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxSize': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRatio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Process-wide service cache
+service_cache = ServiceCache()
+
+
+def build_service(api, version, **kwargs):
+    """Build a Google API service from the discovery documents bundled with
+    google-api-python-client, without fetching discovery over the network."""
+    if GOOGLE_API_ROOT:
+        document = json.loads(discovery_cache.get_static_doc(api, version))
+        document['rootUrl'] = document['mtlsRootUrl'] = GOOGLE_API_ROOT
+        return build_from_document(document, **kwargs)
+    return build(
+        api, version,
+        static_discovery=True,
+        cache_discovery=False,
+        **kwargs
+    )
+
+
+def memoize_resources(resource):
+    """Build each nested resource of a service once, on first use.
+
+    googleapiclient builds a new resource object, generating docstrings for
+    all of its methods, on every call such as service.posts(). That costs
+    milliseconds of CPU per API call and holds the GIL, so it serializes
+    otherwise concurrent requests. Resources are stateless (requests use the
+    calling thread's transport), so one instance is shared by every thread.
+    """
+    for name in resource._resourceDesc.get('resources', {}):
+        method_name = fix_method_name(name)
+        setattr(resource, method_name, _build_once(getattr(resource, method_name)))
+    return resource
+
+
+def _build_once(build_nested):
+    """Wrap a nested resource method so it builds its resource only once."""
+    lock = threading.Lock()
+    built = []
+
+    def nested():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(memoize_resources(build_nested()))
+        return built[0]
+    return nested
+
+
+def get_service(api, version, user_id, credentials):
+    """Get a cached Google API service for a user."""
+    return service_cache.get(user_id, api, version, credentials)
+
+
+def get_sheets_service(user_id, credentials):
+    """Get the Sheets API service for a user."""
+    return get_service('sheets', 'v4', user_id, credentials)
+
+
+def get_blogger_service(user_id, credentials):
+    """Get the Blogger API service for a user."""
+    return get_service('blogger', 'v3', user_id, credentials)
+
+
+def get_drive_service(user_id, credentials):
+    """Get the Drive API service for a user."""
+    return get_service('drive', 'v3', user_id, credentials)
+
+
+def get_oauth2_service(user_id, credentials):
+    """Get the OAuth2 API service for a user."""
+    return get_service('oauth2', 'v2', user_id, credentials)
@@ -0,0 +1,526 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from src.routes.auth import get_credentials
+from src.services.database import get_connection, ensure_schema, keep_alive
+from src.services.google_clients import get_blogger_service
+from src.services.publish_ledger import publish_ledger
+from src.services.batch_publisher import insert_posts_batched
+from src.services.response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Number of consumer threads publishing queued rows in each process
+JOB_CONSUMERS = int(os.getenv('JOB_CONSUMERS', '2'))
+
+# Rows a consumer claims at once; they are inserted in one batch request
+JOB_CLAIM_SIZE = int(os.getenv('JOB_CLAIM_SIZE', '10'))
+
+# Seconds a claimed row stays invisible to other consumers. A row whose
+# consumer died (crash, deploy) is picked up again once this lapses
+JOB_VISIBILITY_SECONDS = float(os.getenv('JOB_VISIBILITY_SECONDS', '300'))
+
+# Claims of a row before it is failed for good
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+
+# Seconds idle consumers wait before looking for work queued by other
+# processes or left behind by dead consumers
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '2'))
+
+# Seconds finished jobs are kept for the status endpoints
+JOB_RETENTION_SECONDS = float(os.getenv('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
+
+# Seconds after which a scheduler check that never finished (its process
+# died) is reported as failed
+JOB_CHECK_TIMEOUT_SECONDS = float(os.getenv('JOB_CHECK_TIMEOUT_SECONDS', '3600'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS publish_jobs (
+    job_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    sheet_id TEXT NOT NULL,
+    blog_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    kind TEXT NOT NULL DEFAULT 'publish',
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS publish_tasks (
+    job_id TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    title TEXT,
+    post_body TEXT,
+    digest TEXT,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    visible_at REAL NOT NULL,
+    owner TEXT,
+    result TEXT,
+    finished_at REAL,
+    PRIMARY KEY (job_id, row)
+);
+CREATE INDEX IF NOT EXISTS idx_publish_tasks_visible
+    ON publish_tasks (visible_at) WHERE state IN ('queued', 'in_flight');
+'''
+
+# Columns added to publish_jobs after it was first created
+JOB_COLUMNS = (
+    ('kind', "TEXT NOT NULL DEFAULT 'publish'"),
+    ('error', 'TEXT')
+)
+
+# Job kinds: sheet publishes run by the consumers, and scheduler checks run
+# by the scheduler engine
+PUBLISH = 'publish'
+CHECK = 'check'
+
+# Task states; skipped rows are stored as done with a 'skipped' result
+QUEUED = 'queued'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _isoformat(epoch):
+    """Format an epoch timestamp for API responses."""
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class JobQueue:
+    """Durable queue of publish jobs in SQLite.
+
+    A job holds one task per sheet row. Consumers claim the queued rows of a
+    job in small batches, which hides them from other consumers for
+    JOB_VISIBILITY_SECONDS, renewed while the batch runs. A consumer that
+    dies mid-batch leaves its rows in flight until that lapses, after which any consumer (in this process or
+    another one sharing the database) resumes them. Rows are checked against
+    the publish ledger before every insert, so a resumed row that was already
+    published is not created twice.
+
+    Scheduler checks are recorded here as well, so every background job is
+    polled through the same API. They have no queued rows: the scheduler
+    engine runs them and stores their row results when they finish.
+    """
+
+    def __init__(self, consumers=JOB_CONSUMERS, claim_size=JOB_CLAIM_SIZE,
+                 visibility_seconds=JOB_VISIBILITY_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        self.consumers = consumers
+        self.claim_size = claim_size
+        self.visibility_seconds = visibility_seconds
+        self.max_attempts = max_attempts
+        self.consumer_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopped = False
+        self._migrated = False
+        self._migrate_lock = threading.Lock()
+
+    def _connection(self):
+        ensure_schema('job_queue', SCHEMA)
+        connection = get_connection()
+        if not self._migrated:
+            # Databases created before a column existed get it added; the
+            # write lock keeps other processes from adding it at the same time
+            with self._migrate_lock:
+                if not self._migrated:
+                    connection.execute('BEGIN IMMEDIATE')
+                    with connection:
+                        columns = {row['name'] for row in
+                                   connection.execute('PRAGMA table_info(publish_jobs)')}
+                        for name, definition in JOB_COLUMNS:
+                            if name not in columns:
+                                connection.execute(
+                                    f'ALTER TABLE publish_jobs ADD COLUMN {name} {definition}'
+                                )
+                    self._migrated = True
+        return connection
+
+    # Producers
+
+    def create(self, user_id, sheet_id, blog_id, results, pending):
+        """Queue a publish job. Returns the job id.
+
+        results are the per-row results of the sheet, as planned by
+        plan_sheet_publish; rows already settled there are stored as done,
+        and the pending (row, post body, digest, result) rows are queued.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        pending_rows = {row for row, _, _, _ in pending}
+        tasks = [
+            (job_id, row, result['title'], json.dumps(post_body), digest, QUEUED, now, None, None)
+            for row, post_body, digest, result in pending
+        ]
+        tasks.extend(
+            (job_id, result['row'], result.get('title'), None, None, DONE, now, json.dumps(result), now)
+            for result in results if result['row'] not in pending_rows
+        )
+
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                'INSERT INTO publish_jobs (job_id, user_id, sheet_id, blog_id, status, created_at, finished_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, str(user_id), sheet_id, blog_id,
+                 QUEUED if pending else 'completed', now, None if pending else now)
+            )
+            connection.executemany(
+                'INSERT INTO publish_tasks '
+                '(job_id, row, title, post_body, digest, state, visible_at, result, finished_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                tasks
+            )
+            self._prune(connection, now)
+
+        if pending:
+            self.start()
+            with self._cond:
+                self._cond.notify_all()
+        return job_id
+
+    def create_check(self, user_id, sheet_id, blog_id):
+        """Record a queued scheduler check of a calendar. Returns the job id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                'INSERT INTO publish_jobs (job_id, user_id, sheet_id, blog_id, status, created_at, kind) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, str(user_id), sheet_id, blog_id, QUEUED, now, CHECK)
+            )
+            self._prune(connection, now)
+        return job_id
+
+    def start_check(self, job_id):
+        """Mark a scheduler check as running."""
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "UPDATE publish_jobs SET status = 'running' WHERE job_id = ? AND status = 'queued'",
+                (job_id,)
+            )
+
+    def finish_check(self, job_id, results, error=None):
+        """Store the row results of a scheduler check and finish it.
+
+        With an error the check is marked failed.
+        """
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO publish_tasks '
+                '(job_id, row, title, state, visible_at, result, finished_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(job_id, result['row'], result.get('title'),
+                  FAILED if result['status'] == 'error' else DONE,
+                  now, json.dumps(result), now) for result in results]
+            )
+            connection.execute(
+                'UPDATE publish_jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?',
+                ('failed' if error is not None else 'completed', error, now, job_id)
+            )
+
+    def _prune(self, connection, now):
+        """Delete jobs that finished longer ago than the retention period.
+
+        Scheduler checks that never finished are deleted once they are that
+        old.
+        """
+        cutoff = now - JOB_RETENTION_SECONDS
+        expired = (
+            "finished_at < ? OR (kind = 'check' AND finished_at IS NULL AND created_at < ?)"
+        )
+        connection.execute(
+            'DELETE FROM publish_tasks WHERE job_id IN '
+            f'(SELECT job_id FROM publish_jobs WHERE {expired})',
+            (cutoff, cutoff)
+        )
+        connection.execute(f'DELETE FROM publish_jobs WHERE {expired}', (cutoff, cutoff))
+
+    # Status
+
+    def get(self, job_id, since=None):
+        """Return a job's state, task counts and finished row results.
+
+        With since, only the results of rows finished at or after that epoch
+        time are included. Returns None for unknown jobs.
+        """
+        connection = self._connection()
+        job = connection.execute(
+            'SELECT job_id, user_id, sheet_id, blog_id, status, created_at, finished_at, kind, error '
+            'FROM publish_jobs WHERE job_id = ?',
+            (job_id,)
+        ).fetchone()
+        if job is None:
+            return None
+
+        counts = {QUEUED: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+        for row in connection.execute(
+            'SELECT state, COUNT(*) AS count FROM publish_tasks WHERE job_id = ? GROUP BY state',
+            (job_id,)
+        ):
+            counts[row['state']] = row['count']
+
+        query = 'SELECT result FROM publish_tasks WHERE job_id = ? AND result IS NOT NULL'
+        params = [job_id]
+        if since is not None:
+            query += ' AND finished_at >= ?'
+            params.append(since)
+        rows = connection.execute(query + ' ORDER BY row', params).fetchall()
+
+        status, error = job['status'], job['error']
+        if (job['kind'] == CHECK and status in (QUEUED, 'running')
+                and job['created_at'] < time.time() - JOB_CHECK_TIMEOUT_SECONDS):
+            status, error = 'failed', 'Check did not finish'
+
+        return {
+            'jobId': job['job_id'],
+            'userId': job['user_id'],
+            'kind': job['kind'],
+            'sheetId': job['sheet_id'],
+            'blogId': job['blog_id'],
+            'status': status,
+            'error': error,
+            'createdAt': _isoformat(job['created_at']),
+            'finishedAt': _isoformat(job['finished_at']),
+            'total': sum(counts.values()),
+            'queued': counts[QUEUED],
+            'inFlight': counts[IN_FLIGHT],
+            'done': counts[DONE],
+            'failed': counts[FAILED],
+            'results': [json.loads(row['result']) for row in rows]
+        }
+
+    # Consumers
+
+    def start(self):
+        """Start the consumer threads if they are not running yet.
+
+        Rows left in flight by a previous run are resumed once their
+        visibility timeout lapses.
+        """
+        with self._cond:
+            if self._threads or self._stopped:
+                return
+            self._threads = [
+                threading.Thread(target=self._consume, name=f'job-consumer-{n}', daemon=True)
+                for n in range(self.consumers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop the consumers after their current batch."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def claim(self):
+        """Claim the next visible rows of one job.
+
+        Returns (job, tasks) with the job's user, sheet and blog ids and the
+        claimed (row, title, post body, digest) tasks, or None when there is
+        nothing to do. Rows claimed too often are failed instead.
+        """
+        now = time.time()
+        connection = self._connection()
+        # Take the write lock up front so two consumers never claim a row twice
+        connection.execute('BEGIN IMMEDIATE')
+        with connection:
+            head = connection.execute(
+                'SELECT job_id FROM publish_tasks '
+                "WHERE state IN ('queued', 'in_flight') AND visible_at <= ? "
+                'ORDER BY visible_at LIMIT 1',
+                (now,)
+            ).fetchone()
+            if head is None:
+                return None
+            job_id = head['job_id']
+
+            rows = connection.execute(
+                'SELECT row, title, post_body, digest, attempts FROM publish_tasks '
+                "WHERE job_id = ? AND state IN ('queued', 'in_flight') AND visible_at <= ? "
+                'ORDER BY row LIMIT ?',
+                (job_id, now, self.claim_size)
+            ).fetchall()
+            exhausted = [row for row in rows if row['attempts'] >= self.max_attempts]
+            claimed = [row for row in rows if row['attempts'] < self.max_attempts]
+
+            connection.executemany(
+                'UPDATE publish_tasks SET state = ?, owner = NULL, result = ?, finished_at = ? '
+                'WHERE job_id = ? AND row = ?',
+                [(FAILED, json.dumps({
+                    'row': row['row'],
+                    'title': row['title'],
+                    'status': 'error',
+                    'message': f'Gave up after {row["attempts"]} attempts'
+                }), now, job_id, row['row']) for row in exhausted]
+            )
+            connection.executemany(
+                'UPDATE publish_tasks SET state = ?, owner = ?, visible_at = ?, attempts = attempts + 1 '
+                'WHERE job_id = ? AND row = ?',
+                [(IN_FLIGHT, self.consumer_id, now + self.visibility_seconds, job_id, row['row'])
+                 for row in claimed]
+            )
+            connection.execute(
+                "UPDATE publish_jobs SET status = 'running' WHERE job_id = ? AND status = 'queued'",
+                (job_id,)
+            )
+            job = connection.execute(
+                'SELECT job_id, user_id, sheet_id, blog_id FROM publish_jobs WHERE job_id = ?',
+                (job_id,)
+            ).fetchone()
+            if exhausted:
+                self._finish_if_done(connection, job_id, now)
+
+        return dict(job), [
+            (row['row'], row['title'], json.loads(row['post_body']), row['digest'])
+            for row in claimed
+        ]
+
+    def complete(self, job_id, outcomes):
+        """Store the results of claimed rows and finish the job when none are left.
+
+        outcomes is a list of (row, state, result) tuples.
+        """
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                'UPDATE publish_tasks SET state = ?, result = ?, finished_at = ?, owner = NULL '
+                'WHERE job_id = ? AND row = ? AND state = ?',
+                [(state, json.dumps(result), now, job_id, row, IN_FLIGHT)
+                 for row, state, result in outcomes]
+            )
+            self._finish_if_done(connection, job_id, now)
+
+    def extend(self, job_id, rows):
+        """Keep claimed rows hidden from other consumers for another visibility timeout.
+
+        Returns False once none of them are held by this consumer any more.
+        """
+        connection = self._connection()
+        with connection:
+            cursor = connection.executemany(
+                'UPDATE publish_tasks SET visible_at = ? '
+                'WHERE job_id = ? AND row = ? AND state = ? AND owner = ?',
+                [(time.time() + self.visibility_seconds, job_id, row, IN_FLIGHT, self.consumer_id)
+                 for row in rows]
+            )
+        return cursor.rowcount > 0
+
+    def release(self, job_id, rows, delay=JOB_POLL_SECONDS):
+        """Put claimed rows back in the queue, e.g. after an unexpected error."""
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                'UPDATE publish_tasks SET state = ?, owner = NULL, visible_at = ? '
+                'WHERE job_id = ? AND row = ? AND state = ?',
+                [(QUEUED, time.time() + delay, job_id, row, IN_FLIGHT) for row in rows]
+            )
+
+    def _finish_if_done(self, connection, job_id, now):
+        """Mark a job completed once none of its rows are queued or in flight."""
+        connection.execute(
+            "UPDATE publish_jobs SET status = 'completed', finished_at = ? "
+            "WHERE job_id = ? AND status != 'completed' AND NOT EXISTS ("
+            "SELECT 1 FROM publish_tasks WHERE job_id = ? AND state IN ('queued', 'in_flight'))",
+            (now, job_id, job_id)
+        )
+
+    def _consume(self):
+        """Claim and publish rows until stopped."""
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+            try:
+                claimed = self.claim()
+            except Exception:
+                logger.exception('Claiming publish tasks failed')
+                claimed = None
+
+            if claimed is None:
+                with self._cond:
+                    if not self._stopped:
+                        self._cond.wait(JOB_POLL_SECONDS)
+                continue
+
+            job, tasks = claimed
+            rows = [row for row, _, _, _ in tasks]
+            try:
+                # Rate limits can stretch a batch past the visibility timeout
+                with keep_alive(lambda: self.extend(job['job_id'], rows), self.visibility_seconds / 3,
+                                name='claimed rows'):
+                    outcomes = self._publish(job, tasks)
+                self.complete(job['job_id'], outcomes)
+            except Exception:
+                logger.exception('Publishing tasks of job %s failed', job['job_id'])
+                self.release(job['job_id'], rows)
+
+    def _publish(self, job, tasks):
+        """Create the posts of claimed rows. Returns their (row, state, result) outcomes."""
+        user_id, sheet_id, blog_id = job['user_id'], job['sheet_id'], job['blog_id']
+
+        # Get user credentials
+        credentials = get_credentials(user_id)
+        if not credentials:
+            return [(row, FAILED, {
+                'row': row, 'title': title, 'status': 'error',
+                'message': 'No valid credentials found'
+            }) for row, title, _, _ in tasks]
+
+        # Get the Blogger API service
+        blogger_service = get_blogger_service(user_id, credentials)
+
+        outcomes = []
+        pending = []
+        for row, title, post_body, digest in tasks:
+            # Rows resumed after a crash may have been published already
+            published = publish_ledger.lookup(sheet_id, blog_id, digest)
+            if published:
+                outcomes.append((row, DONE, {
+                    'row': row, 'title': title, 'status': 'success',
+                    'postId': published['postId'], 'url': published['url']
+                }))
+                continue
+            pending.append((row, title, post_body, digest))
+
+        # Create the posts in a batch HTTP request
+        inserted = insert_posts_batched(
+            user_id, blogger_service, blog_id,
+            [(row, post_body) for row, _, post_body, _ in pending]
+        )
+        if pending:
+            response_cache.invalidate(user_id, 'blogs', f'blog:{blog_id}')
+
+        for row, title, post_body, digest in pending:
+            post, error = inserted.get(row, (None, 'No response received'))
+            if error is not None:
+                outcomes.append((row, FAILED, {
+                    'row': row, 'title': title, 'status': 'error', 'message': str(error)
+                }))
+                continue
+
+            publish_ledger.record(sheet_id, blog_id, digest, post, row=row)
+            outcomes.append((row, DONE, {
+                'row': row, 'title': title, 'status': 'success',
+                'postId': post['id'], 'url': post.get('url', '')
+            }))
+        return outcomes
+
+
+# Process-wide job queue
+job_queue = JobQueue()
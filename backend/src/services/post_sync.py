@@ -0,0 +1,423 @@
+import functools
+import hashlib
+import json
+from datetime import datetime, timezone
+from googleapiclient.errors import HttpError
+from src.services.batch_publisher import BLOGGER_BATCH_SIZE, insert_posts_batched
+from src.services.database import get_connection, ensure_schema
+from src.services.publish_executor import publish_executor
+from src.services.publish_ledger import publish_ledger, row_hash
+from src.services.publishing import PublishError
+from src.services.row_mapper import get_row_mapper
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS post_sync (
+    sheet_id TEXT NOT NULL,
+    blog_id TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    row INTEGER,
+    row_hash TEXT NOT NULL,
+    field_hashes TEXT,
+    status TEXT NOT NULL,
+    url TEXT,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (sheet_id, blog_id, post_id)
+);
+'''
+
+# Post fields kept in sync with their sheet row
+SYNC_FIELDS = ('title', 'content', 'labels')
+
+# Post fields returned by the sync's writes
+SYNC_RESPONSE_FIELDS = 'id,url,status'
+
+# Post fields read to hash adopted posts
+SYNC_READ_FIELDS = 'id,title,content,labels'
+
+
+def field_hashes(post_body):
+    """Hash each synced field of a post body, so changed fields can be told apart."""
+    return {
+        field: hashlib.sha256(json.dumps(
+            post_body.get(field, [] if field == 'labels' else ''),
+            ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')).hexdigest()[:32]
+        for field in SYNC_FIELDS
+    }
+
+
+class SyncState:
+    """Persistent mapping of the posts of a (sheet, blog) pair to sheet rows.
+
+    Each post keeps the row it was last synced from, the row hash and the
+    hash of every synced field, and whether it is live or was reverted to
+    draft because its row went away.
+    """
+
+    def load(self, sheet_id, blog_id):
+        """Return the tracked posts of a (sheet, blog) pair by post id.
+
+        Posts published through the publish ledger (publish_from_sheet, the
+        scheduler) that the sync has not seen yet are adopted; their field
+        hashes are unknown, so an edit of their row patches every field.
+        """
+        ensure_schema('post_sync', SCHEMA)
+        rows = get_connection().execute(
+            'SELECT post_id, row, row_hash, field_hashes, status, url FROM post_sync '
+            'WHERE sheet_id = ? AND blog_id = ?',
+            (sheet_id, blog_id)
+        ).fetchall()
+        entries = {
+            r['post_id']: {
+                'postId': r['post_id'],
+                'row': r['row'],
+                'digest': r['row_hash'],
+                'fields': json.loads(r['field_hashes']) if r['field_hashes'] else None,
+                'status': r['status'],
+                'url': r['url']
+            }
+            for r in rows
+        }
+
+        # Ledger entries are ordered by publish time, so the latest row hash
+        # of a post wins
+        adopted = {}
+        by_hash, _ = publish_ledger.published(sheet_id, blog_id)
+        for digest, entry in by_hash.items():
+            if entry['postId'] not in entries:
+                adopted[entry['postId']] = {
+                    'postId': entry['postId'],
+                    'row': entry['row'],
+                    'digest': digest,
+                    'fields': None,
+                    'status': 'live',
+                    'url': entry['url']
+                }
+        entries.update(adopted)
+        return entries
+
+    def save(self, sheet_id, blog_id, entries):
+        """Store tracked posts after a sync."""
+        if not entries:
+            return
+        ensure_schema('post_sync', SCHEMA)
+        synced_at = datetime.now(timezone.utc).isoformat()
+        connection = get_connection()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO post_sync '
+                '(sheet_id, blog_id, post_id, row, row_hash, field_hashes, status, url, synced_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (sheet_id, blog_id, entry['postId'], entry['row'], entry['digest'],
+                     json.dumps(entry['fields']) if entry['fields'] else None,
+                     entry['status'], entry['url'], synced_at)
+                    for entry in entries
+                ]
+            )
+
+
+# Process-wide sync state
+sync_state = SyncState()
+
+
+def fetch_posts(blogger_service, blog_id, post_ids, batch_size=BLOGGER_BATCH_SIZE):
+    """Read the synced fields of some posts through batch HTTP requests.
+
+    Returns the posts found by id; posts deleted from the blog are left out.
+    Raises HttpError for any other failure.
+    """
+    posts = {}
+    errors = []
+
+    def callback(request_id, response, exception):
+        if exception is None:
+            posts[response['id']] = response
+        elif not (isinstance(exception, HttpError) and exception.resp.status == 404):
+            errors.append(exception)
+
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), batch_size):
+        batch = blogger_service.new_batch_http_request(callback=callback)
+        for post_id in post_ids[start:start + batch_size]:
+            batch.add(blogger_service.posts().get(
+                blogId=blog_id, postId=post_id, fields=SYNC_READ_FIELDS
+            ))
+        batch.execute()
+        if errors:
+            raise errors[0]
+    return posts
+
+
+class SyncPlan:
+    """The writes that bring a blog in line with a sheet.
+
+    results holds one dict per titled row, plus one per tracked post whose
+    row went away, and is filled in as the writes complete.
+    """
+
+    def __init__(self, sheet_id, blog_id):
+        self.sheet_id = sheet_id
+        self.blog_id = blog_id
+        self.results = []
+        self.inserts = []   # (row, post body, digest, fields, result)
+        self.patches = []   # (entry, row, method, body, digest, fields, result)
+        self.restores = []  # (entry, result)
+        self.reverts = []   # (entry, result)
+        self.relinked = []  # (entry, row, fields) of unchanged posts to re-record
+
+    def writes(self):
+        """Number of Blogger writes the plan makes."""
+        return len(self.inserts) + len(self.patches) + len(self.restores) + len(self.reverts)
+
+    def summary(self):
+        """Count the results by action and outcome."""
+        summary = {action: 0 for action in
+                   ('insert', 'update', 'restore', 'revert', 'unchanged', 'orphaned', 'skip')}
+        summary['errors'] = 0
+        for result in self.results:
+            summary[result['action']] += 1
+            if result.get('status') == 'error':
+                summary['errors'] += 1
+        summary['writes'] = self.writes()
+        return summary
+
+
+def plan_sync(blogger_service, sheet_id, blog_id, snapshot, revert_deleted=False, now=None):
+    """Compare a sheet with the posts synced from it and plan the writes.
+
+    Rows are matched to tracked posts by row hash first, so rows that only
+    moved cost no writes. The rest are edits matched by an unchanged title
+    or content, or else by row number, and patched with only the fields
+    that differ. Rows with no post are inserted unless their publish date
+    is in the future. Live posts whose row went away are reverted to draft
+    when revert_deleted is set, and reported as orphaned otherwise; a
+    reverted post whose row comes back is published again. Only reads are
+    made: adopted posts, whose field hashes are not known yet, are fetched
+    by id when rows need matching to them. Raises PublishError when the
+    sheet can't be used.
+    """
+    values = snapshot.values
+    if not values:
+        raise PublishError('No data found in sheet')
+
+    # Get headers and their compiled row mapper
+    mapper = get_row_mapper(values[0])
+
+    # Check required columns
+    missing_columns = mapper.missing(['Title', 'Content'])
+    if missing_columns:
+        raise PublishError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    entries = sync_state.load(sheet_id, blog_id)
+    by_digest = {}
+    by_row = {}
+    for entry in entries.values():
+        by_digest.setdefault(entry['digest'], []).append(entry)
+        if entry['row'] is not None:
+            by_row.setdefault(entry['row'], []).append(entry)
+
+    plan = SyncPlan(sheet_id, blog_id)
+    claimed = set()
+
+    def claim(candidates, row):
+        """Take the best unclaimed entry: same row first, then live posts."""
+        free = [entry for entry in candidates if entry['postId'] not in claimed]
+        if not free:
+            return None
+        free.sort(key=lambda entry: (entry['row'] != row, entry['status'] != 'live'))
+        claimed.add(free[0]['postId'])
+        return free[0]
+
+    # Unchanged rows, wherever they are now
+    unmatched = []
+    for record in mapper.map_values(values):
+        post_body = record.post_body()
+        digest = row_hash(post_body)
+        result = {'row': record.row, 'title': record.title}
+        plan.results.append(result)
+
+        entry = claim(by_digest.get(digest, []), record.row)
+        if entry is None:
+            unmatched.append((record, post_body, digest, field_hashes(post_body), result))
+            continue
+        result.update({'postId': entry['postId'], 'url': entry['url']})
+        if entry['status'] != 'live':
+            result['action'] = 'restore'
+            plan.restores.append((entry, result))
+        else:
+            result['action'] = 'unchanged'
+
+        # Rows that moved, and adopted posts, are re-recorded without a write
+        if entry['row'] != record.row or entry['fields'] is None:
+            plan.relinked.append((entry, record.row, field_hashes(post_body)))
+
+    # Field hashes of adopted posts that edited rows may belong to, read
+    # from the blog
+    adopted = {
+        entry['postId']: entry for entry in entries.values()
+        if entry['fields'] is None and entry['postId'] not in claimed
+    }
+    if unmatched and adopted:
+        for post_id, post in fetch_posts(blogger_service, blog_id, adopted).items():
+            adopted[post_id]['fields'] = field_hashes({
+                'title': post.get('title', ''),
+                'content': post.get('content', ''),
+                'labels': post.get('labels', [])
+            })
+
+    by_field = {'title': {}, 'content': {}}
+    for entry in entries.values():
+        if entry['fields'] and entry['postId'] not in claimed:
+            for field, index in by_field.items():
+                index.setdefault(entry['fields'][field], []).append(entry)
+
+    # Edited rows: matched by an unchanged title, then an unchanged content,
+    # then by position, each pass only over the rows still unmatched
+    for key in ('title', 'content', 'row'):
+        remaining = []
+        for record, post_body, digest, fields, result in unmatched:
+            if key == 'row':
+                entry = claim(by_row.get(record.row, []), record.row)
+            else:
+                entry = claim(by_field[key].get(fields[key], []), record.row)
+            if entry is None:
+                remaining.append((record, post_body, digest, fields, result))
+                continue
+            old_fields = entry['fields'] or {}
+            changed = [field for field in SYNC_FIELDS if fields[field] != old_fields.get(field)]
+            if 'labels' in changed and not post_body.get('labels'):
+                # A patch is not guaranteed to clear labels, so the whole
+                # post is replaced instead
+                method, body = 'update', dict(post_body, labels=[])
+            else:
+                method, body = 'patch', {field: post_body.get(field, []) for field in changed}
+            result.update({
+                'action': 'update',
+                'fields': changed,
+                'postId': entry['postId'],
+                'url': entry['url']
+            })
+            plan.patches.append((entry, record.row, method, body, digest, fields, result))
+            if entry['status'] != 'live':
+                plan.restores.append((entry, result))
+        unmatched = remaining
+
+    # The rest are new
+    future_rows = set(snapshot.publish_schedule().pending_rows(now))
+    new_digests = {}
+    for record, post_body, digest, fields, result in unmatched:
+        if record.row in future_rows:
+            result.update({'action': 'skip', 'message': 'Future publish date'})
+            continue
+
+        # Identical new rows are only published once
+        if digest in new_digests:
+            result.update({'action': 'skip', 'message': f'Duplicate of row {new_digests[digest]}'})
+            continue
+        new_digests[digest] = record.row
+
+        result['action'] = 'insert'
+        plan.inserts.append((record.row, post_body, digest, fields, result))
+
+    # Live posts whose row is gone
+    for entry in entries.values():
+        if entry['postId'] in claimed or entry['status'] != 'live':
+            continue
+        result = {
+            'row': entry['row'],
+            'postId': entry['postId'],
+            'url': entry['url'],
+            'message': 'No matching row in sheet'
+        }
+        plan.results.append(result)
+        if revert_deleted:
+            result['action'] = 'revert'
+            plan.reverts.append((entry, result))
+        else:
+            result['action'] = 'orphaned'
+
+    return plan
+
+
+def apply_sync(user_id, blogger_service, plan):
+    """Make the writes of a sync plan and store the new sync state.
+
+    Inserts go out in batch HTTP requests and patches, reverts and
+    re-publishes run concurrently, all within the user's and blog's write
+    quotas. Fills in the status of every result that needed a write.
+    """
+    sheet_id, blog_id = plan.sheet_id, plan.blog_id
+    posts = blogger_service.posts()
+    changed = {}
+
+    def fail(result, error):
+        result.update({'status': 'error', 'message': str(error)})
+
+    # Create the posts of new rows in batch HTTP requests
+    outcomes = insert_posts_batched(
+        user_id, blogger_service, blog_id,
+        [(row, post_body) for row, post_body, _, _, _ in plan.inserts]
+    )
+    for row, post_body, digest, fields, result in plan.inserts:
+        post, error = outcomes.get(row, (None, 'No response received'))
+        if error is not None:
+            fail(result, error)
+            continue
+        publish_ledger.record(sheet_id, blog_id, digest, post, row=row)
+        changed[post['id']] = {
+            'postId': post['id'], 'row': row, 'digest': digest, 'fields': fields,
+            'status': 'live', 'url': post.get('url', '')
+        }
+        result.update({'status': 'success', 'postId': post['id'], 'url': post.get('url', '')})
+
+    # Patch only the changed fields of edited rows (or update posts whose
+    # labels were removed), and flip the status of posts whose row came back
+    # or went away
+    requests = []
+    for entry, row, method, body, _, _, _ in plan.patches:
+        requests.append((('patch', entry['postId']), functools.partial(
+            getattr(posts, method), blogId=blog_id, postId=entry['postId'], body=body,
+            fetchBody=False, fields=SYNC_RESPONSE_FIELDS
+        )))
+    for entry, _ in plan.restores:
+        requests.append((('restore', entry['postId']), functools.partial(
+            posts.publish, blogId=blog_id, postId=entry['postId'], fields=SYNC_RESPONSE_FIELDS
+        )))
+    for entry, _ in plan.reverts:
+        requests.append((('revert', entry['postId']), functools.partial(
+            posts.revert, blogId=blog_id, postId=entry['postId'], fields=SYNC_RESPONSE_FIELDS
+        )))
+    outcomes = publish_executor.execute(user_id, blog_id, requests)
+
+    for entry, row, _, _, digest, fields, result in plan.patches:
+        post, error = outcomes[('patch', entry['postId'])]
+        if error is not None:
+            fail(result, error)
+            continue
+        url = post.get('url', entry['url'])
+        publish_ledger.record(sheet_id, blog_id, digest, {'id': entry['postId'], 'url': url}, row=row)
+        changed[entry['postId']] = dict(entry, row=row, digest=digest, fields=fields, url=url)
+        result.update({'status': 'success', 'url': url})
+
+    for entry, result in plan.restores:
+        post, error = outcomes[('restore', entry['postId'])]
+        if error is not None:
+            fail(result, error)
+            continue
+        changed[entry['postId']] = dict(changed.get(entry['postId'], entry), status='live')
+        result.setdefault('status', 'success')
+
+    for entry, result in plan.reverts:
+        post, error = outcomes[('revert', entry['postId'])]
+        if error is not None:
+            fail(result, error)
+            continue
+        changed[entry['postId']] = dict(entry, row=None, status='draft')
+        result['status'] = 'success'
+
+    # Unchanged posts only need their row and field hashes recorded
+    for entry, row, fields in plan.relinked:
+        changed[entry['postId']] = dict(changed.get(entry['postId'], entry), row=row, fields=fields)
+
+    sync_state.save(sheet_id, blog_id, list(changed.values()))
@@ -0,0 +1,273 @@
+import functools
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+
+# Upper bound on concurrent inserts per user; the live limit adapts below it
+PUBLISH_WORKERS_PER_USER = int(os.getenv('PUBLISH_WORKERS_PER_USER', '4'))
+
+# Sustained Blogger write rates, sized below the default API quotas
+BLOGGER_USER_RATE_PER_MINUTE = float(os.getenv('BLOGGER_USER_RATE_PER_MINUTE', '60'))
+BLOGGER_BLOG_RATE_PER_MINUTE = float(os.getenv('BLOGGER_BLOG_RATE_PER_MINUTE', '30'))
+
+# Retry policy for throttled and transient failures
+PUBLISH_MAX_RETRIES = int(os.getenv('PUBLISH_MAX_RETRIES', '5'))
+PUBLISH_BACKOFF_BASE = float(os.getenv('PUBLISH_BACKOFF_BASE', '1'))
+PUBLISH_BACKOFF_MAX = float(os.getenv('PUBLISH_BACKOFF_MAX', '60'))
+
+SERVER_ERROR_STATUSES = {500, 502, 503, 504}
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded')
+
+
+def is_throttled(error):
+    """Whether an API error means the write was rejected for exceeding a quota."""
+    if not isinstance(error, HttpError):
+        return False
+    status = int(error.resp.status)
+    if status == 429:
+        return True
+    # Blogger reports some rate limits as 403s
+    content = error.content.decode('utf-8', 'replace') if isinstance(error.content, bytes) else str(error.content)
+    return status == 403 and any(reason in content for reason in RATE_LIMIT_REASONS)
+
+
+def is_server_error(error):
+    """Whether an API error is a transient server failure.
+
+    The write may or may not have been applied, so only idempotent writes
+    can simply be sent again.
+    """
+    return isinstance(error, HttpError) and int(error.resp.status) in SERVER_ERROR_STATUSES
+
+
+def is_retryable(error):
+    """Whether an idempotent write failed with throttling or a transient server failure."""
+    return is_throttled(error) or is_server_error(error)
+
+
+def backoff_delay(attempt, base=PUBLISH_BACKOFF_BASE, cap=PUBLISH_BACKOFF_MAX):
+    """Full-jitter exponential backoff delay for a retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a fixed rate."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """Add the tokens accrued since the last update. Caller holds the lock."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Take one token and return how long to wait before it is usable."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def available(self):
+        """Return the tokens usable right now, without taking any."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+    def drain(self):
+        """Empty the bucket after the API signalled throttling."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 0.0)
+
+
+class AdaptiveLimit:
+    """Concurrency limit that halves on throttling and grows back on success."""
+
+    def __init__(self, max_limit):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.active = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a slot is free under the current limit."""
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+
+    def release(self, throttled=False):
+        """Free a slot and adapt the limit to the outcome."""
+        with self._cond:
+            self.active -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+class PublishExecutor:
+    """Runs Blogger inserts concurrently within per-user and per-blog quotas."""
+
+    def __init__(self, workers_per_user=PUBLISH_WORKERS_PER_USER,
+                 user_rate=BLOGGER_USER_RATE_PER_MINUTE, blog_rate=BLOGGER_BLOG_RATE_PER_MINUTE):
+        self.workers_per_user = workers_per_user
+        self.user_rate = user_rate
+        self.blog_rate = blog_rate
+        self._lock = threading.Lock()
+        self._user_buckets = {}
+        self._blog_buckets = {}
+        self._limits = {}
+        self.attempts = 0
+        self.retries = 0
+        self.throttled = 0
+
+    def _bucket(self, buckets, key, rate):
+        """Get or create the token bucket for a key."""
+        with self._lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = TokenBucket(rate)
+            return bucket
+
+    def _limit(self, user_id):
+        """Get or create the adaptive concurrency limit of a user."""
+        with self._lock:
+            limit = self._limits.get(user_id)
+            if limit is None:
+                limit = self._limits[user_id] = AdaptiveLimit(self.workers_per_user)
+            return limit
+
+    def throttle(self, user_id, blog_id, count=1):
+        """Block until `count` writes fit in the user's and blog's quotas."""
+        user_bucket = self._bucket(self._user_buckets, str(user_id), self.user_rate)
+        blog_bucket = self._bucket(self._blog_buckets, blog_id, self.blog_rate)
+        for _ in range(count):
+            delay = max(user_bucket.reserve(), blog_bucket.reserve())
+            if delay > 0:
+                time.sleep(delay)
+
+    def estimate_seconds(self, user_id, blog_id, count):
+        """Estimate how long `count` writes take at the current quota levels.
+
+        Writes covered by the tokens left in both buckets go out right
+        away; the rest are paced at the slower of the two rates. With no
+        blog id only the user's quota is considered.
+        """
+        if count <= 0:
+            return 0.0
+        buckets = [self._bucket(self._user_buckets, str(user_id), self.user_rate)]
+        if blog_id is not None:
+            buckets.append(self._bucket(self._blog_buckets, blog_id, self.blog_rate))
+        available = max(0.0, min(bucket.available() for bucket in buckets))
+        rate = min(bucket.rate for bucket in buckets)
+        return max(0.0, count - available) / rate
+
+    def backoff(self, user_id, blog_id):
+        """Slow down a user and blog after the API throttled a write."""
+        with self._lock:
+            self.throttled += 1
+        self._bucket(self._user_buckets, str(user_id), self.user_rate).drain()
+        self._bucket(self._blog_buckets, blog_id, self.blog_rate).drain()
+
+    def _call(self, user_id, blog_id, make_request, idempotent=True):
+        """Execute one Blogger write, retrying throttled and transient failures.
+
+        make_request builds a fresh API request for every attempt. Writes
+        that are not idempotent are only retried when throttled; a 5xx is
+        raised to the caller, which has to check whether the write landed.
+        """
+        retryable = is_retryable if idempotent else is_throttled
+        limit = self._limit(str(user_id))
+        attempt = 0
+        while True:
+            self.throttle(user_id, blog_id)
+            limit.acquire()
+            throttled = False
+            try:
+                with self._lock:
+                    self.attempts += 1
+                return make_request().execute()
+            except Exception as e:
+                if not retryable(e) or attempt >= PUBLISH_MAX_RETRIES:
+                    raise
+                throttled = True
+            finally:
+                limit.release(throttled=throttled)
+
+            self.backoff(user_id, blog_id)
+            with self._lock:
+                self.retries += 1
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    def execute(self, user_id, blog_id, requests, idempotent=True):
+        """Run Blogger writes concurrently.
+
+        requests is a list of (key, request factory) pairs. Returns a dict
+        mapping each key to a (response, error) pair, where exactly one is
+        set.
+        """
+        outcomes = {}
+        if not requests:
+            return outcomes
+
+        workers = min(self.workers_per_user, len(requests))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='publish') as pool:
+            futures = [
+                (key, pool.submit(self._call, user_id, blog_id, make_request, idempotent))
+                for key, make_request in requests
+            ]
+            for key, future in futures:
+                try:
+                    outcomes[key] = (future.result(), None)
+                except Exception as e:
+                    outcomes[key] = (None, e)
+        return outcomes
+
+    def publish(self, user_id, blogger_service, blog_id, items):
+        """Insert posts concurrently.
+
+        items is a list of (row number, post body) pairs. Returns a dict
+        mapping each row number to a (post, error) pair, where exactly one is
+        set. Inserts are not idempotent, so only throttled ones are retried.
+        """
+        return self.execute(user_id, blog_id, [
+            (row, functools.partial(
+                blogger_service.posts().insert, blogId=blog_id, body=post_body
+            ))
+            for row, post_body in items
+        ], idempotent=False)
+
+    def stats(self):
+        """Return executor counters and the current per-user limits."""
+        with self._lock:
+            return {
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'usersBackedOff': sum(
+                    1 for limit in self._limits.values() if limit.limit < limit.max_limit
+                )
+            }
+
+
+# Process-wide publish executor
+publish_executor = PublishExecutor()
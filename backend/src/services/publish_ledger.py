@@ -0,0 +1,127 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+from src.services.database import get_connection, ensure_schema
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS publish_ledger (
+    sheet_id TEXT NOT NULL,
+    row_hash TEXT NOT NULL,
+    blog_id TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    url TEXT,
+    row INTEGER,
+    published_at TEXT NOT NULL,
+    PRIMARY KEY (sheet_id, blog_id, row_hash)
+);
+'''
+
+
+def row_hash(post_body):
+    """Compute the content hash of a post built from a sheet row."""
+    payload = json.dumps(
+        [post_body.get('title', ''), post_body.get('content', ''), post_body.get('labels', [])],
+        ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PublishLedger:
+    """Persistent record of the posts already published from sheet rows.
+
+    Entries for a (sheet, blog) pair are loaded into memory the first time the
+    pair is used, so checking a row before inserting is a dict lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # (sheet_id, blog_id) -> {row_hash: entry}
+
+    def _load(self, sheet_id, blog_id):
+        """Return the in-memory entries of a (sheet, blog) pair."""
+        key = (sheet_id, blog_id)
+        entries = self._entries.get(key)
+        if entries is not None:
+            return entries
+
+        ensure_schema('publish_ledger', SCHEMA)
+        rows = get_connection().execute(
+            'SELECT row_hash, post_id, url, row FROM publish_ledger '
+            'WHERE sheet_id = ? AND blog_id = ?',
+            (sheet_id, blog_id)
+        ).fetchall()
+        entries = {
+            r['row_hash']: {'postId': r['post_id'], 'url': r['url'], 'row': r['row']}
+            for r in rows
+        }
+        with self._lock:
+            return self._entries.setdefault(key, entries)
+
+    def lookup(self, sheet_id, blog_id, digest):
+        """Return the ledger entry for a row hash, or None if not published.
+
+        Misses are checked against the database, since another process
+        (e.g. a scheduler worker) may have published the row since the
+        entries were loaded.
+        """
+        entries = self._load(sheet_id, blog_id)
+        entry = entries.get(digest)
+        if entry is not None:
+            return entry
+
+        row = get_connection().execute(
+            'SELECT post_id, url, row FROM publish_ledger '
+            'WHERE sheet_id = ? AND blog_id = ? AND row_hash = ?',
+            (sheet_id, blog_id, digest)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = {'postId': row['post_id'], 'url': row['url'], 'row': row['row']}
+        with self._lock:
+            entries[digest] = entry
+        return entry
+
+    def published(self, sheet_id, blog_id):
+        """Read every ledger entry of a (sheet, blog) pair in one query.
+
+        Returns the entries by row hash and the latest entry of each sheet
+        row by row number; a row whose content changed since it was
+        published is in the second but no longer matches by hash.
+        """
+        ensure_schema('publish_ledger', SCHEMA)
+        rows = get_connection().execute(
+            'SELECT row_hash, post_id, url, row FROM publish_ledger '
+            'WHERE sheet_id = ? AND blog_id = ? ORDER BY published_at',
+            (sheet_id, blog_id)
+        ).fetchall()
+        by_hash = {}
+        by_row = {}
+        for r in rows:
+            entry = {'postId': r['post_id'], 'url': r['url'], 'row': r['row']}
+            by_hash[r['row_hash']] = entry
+            if r['row'] is not None:
+                by_row[r['row']] = entry
+        return by_hash, by_row
+
+    def record(self, sheet_id, blog_id, digest, post, row=None):
+        """Record a post created from a sheet row."""
+        entry = {'postId': post['id'], 'url': post.get('url', ''), 'row': row}
+        ensure_schema('publish_ledger', SCHEMA)
+        connection = get_connection()
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO publish_ledger '
+                '(sheet_id, row_hash, blog_id, post_id, url, row, published_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (sheet_id, digest, blog_id, entry['postId'], entry['url'], row,
+                 datetime.now(timezone.utc).isoformat())
+            )
+        entries = self._load(sheet_id, blog_id)
+        with self._lock:
+            entries[digest] = entry
+        return entry
+
+
+# Process-wide publish ledger
+publish_ledger = PublishLedger()
@@ -0,0 +1,190 @@
+import math
+import time
+from src.services.batch_publisher import BLOGGER_BATCH_SIZE
+from src.services.publish_executor import publish_executor
+from src.services.publish_ledger import publish_ledger, row_hash
+from src.services.publish_schedule import publish_epoch
+from src.services.publishing import PublishError
+from src.services.row_mapper import get_row_mapper
+
+# What a plan is compared against: the publish ledger, or the posts on the blog
+PLAN_SOURCES = ('ledger', 'blog')
+
+# Runs a plan can be made for: publish_from_sheet, or the scheduler's check_posts
+PLAN_MODES = ('publish', 'schedule')
+
+# Page size and fields used to read a blog's posts for a plan
+PLAN_POSTS_PAGE_SIZE = 500
+PLAN_POST_FIELDS = 'nextPageToken,items(id,title,url,content,labels)'
+
+
+def iter_blog_posts(blogger_service, blog_id):
+    """Yield every post of a blog with its title, content and labels."""
+    options = {'maxResults': PLAN_POSTS_PAGE_SIZE, 'fields': PLAN_POST_FIELDS}
+    while True:
+        page = blogger_service.posts().list(blogId=blog_id, **options).execute()
+        yield from page.get('items', [])
+        if not page.get('nextPageToken'):
+            return
+        options['pageToken'] = page['nextPageToken']
+
+
+def blog_post_index(blogger_service, blog_id):
+    """Read every post of a blog into a title -> [(row hash, post)] index.
+
+    Only reads are made.
+    """
+    index = {}
+    for post in iter_blog_posts(blogger_service, blog_id):
+        digest = row_hash({
+            'title': post.get('title', ''),
+            'content': post.get('content', ''),
+            'labels': post.get('labels', [])
+        })
+        index.setdefault(post.get('title', ''), []).append((digest, post))
+    return index
+
+
+def plan_publish(user_id, blogger_service, sheet_id, blog_id, snapshot,
+                 mode='publish', source='ledger', now=None):
+    """Work out what a publish run would do to a blog, without writing to it.
+
+    Each titled row is classified in one pass as an insert, an update (its
+    post exists but the row changed since, so the run would publish it
+    again as a new post), a skip or, for the scheduler,
+    invalid (unparseable publish date). Rows are matched against the publish
+    ledger, or against the blog's posts by title and content hash. The
+    number of write requests and the time they take at the current quota
+    levels are estimated. Raises PublishError when the sheet can't be used.
+    """
+    values = snapshot.values
+    if not values:
+        raise PublishError('No data found in sheet')
+
+    # Get headers and their compiled row mapper
+    mapper = get_row_mapper(values[0])
+
+    # Check required columns; the scheduler only publishes dated rows
+    required = ['Title', 'Content', 'Publish Date'] if mode == 'schedule' else ['Title', 'Content']
+    missing_columns = mapper.missing(required)
+    if missing_columns:
+        raise PublishError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    # What the rows are compared against
+    if source == 'blog':
+        posts_by_title = blog_post_index(blogger_service, blog_id)
+    else:
+        published_hashes, published_rows = publish_ledger.published(sheet_id, blog_id)
+
+    now = time.time() if now is None else now
+    rows = []
+    counts = {'insert': 0, 'update': 0, 'skip': 0, 'invalid': 0}
+    invalid_dates = 0
+    planned_digests = {}
+
+    # Rows without a title are skipped by the mapper
+    for record in mapper.map_values(values):
+        entry = {'row': record.row, 'title': record.title}
+        rows.append(entry)
+
+        # Check the publish date the way the run would
+        epoch = publish_epoch(record.publish_date_text) if record.has_date else None
+        if record.has_date and epoch is None:
+            invalid_dates += 1
+            if mode == 'schedule':
+                entry.update({'action': 'invalid', 'message': 'Invalid publish date'})
+                counts['invalid'] += 1
+                continue
+            # publish_from_sheet publishes rows with unparseable dates
+            entry['message'] = 'Invalid publish date; published now'
+        elif epoch is not None and epoch > now:
+            entry.update({
+                'action': 'skip',
+                'message': 'Future publish date',
+                'publishDate': record.publish_date_text
+            })
+            counts['skip'] += 1
+            continue
+        elif mode == 'schedule' and not record.has_date:
+            entry.update({'action': 'skip', 'message': 'No publish date'})
+            counts['skip'] += 1
+            continue
+
+        digest = row_hash(record.post_body())
+
+        # Match the row against what was already published
+        action = 'insert'
+        if source == 'blog':
+            matches = posts_by_title.get(record.title, [])
+            same = next((post for post_digest, post in matches if post_digest == digest), None)
+            if same is not None:
+                entry.update({
+                    'action': 'skip',
+                    'message': 'Already on blog',
+                    'postId': same['id'],
+                    'url': same.get('url', '')
+                })
+                counts['skip'] += 1
+                continue
+            if matches:
+                action = 'update'
+                entry.update({'postId': matches[0][1]['id'], 'url': matches[0][1].get('url', '')})
+        else:
+            published = published_hashes.get(digest)
+            if published:
+                entry.update({
+                    'action': 'skip',
+                    'message': 'Already published',
+                    'postId': published['postId'],
+                    'url': published['url']
+                })
+                counts['skip'] += 1
+                continue
+            previous = published_rows.get(record.row)
+            if previous is not None:
+                action = 'update'
+                entry.update({'postId': previous['postId'], 'url': previous['url']})
+
+        # Identical rows are only published once
+        if digest in planned_digests:
+            entry.pop('postId', None)
+            entry.pop('url', None)
+            entry.update({
+                'action': 'skip',
+                'message': f'Duplicate of row {planned_digests[digest]}'
+            })
+            counts['skip'] += 1
+            continue
+        planned_digests[digest] = record.row
+
+        entry['action'] = action
+        counts[action] += 1
+
+    # Neither run edits posts, so a changed row is published as a new post.
+    # The scheduler sends one insert per request; publish_from_sheet batches them
+    inserts, updates = counts['insert'], counts['update']
+    writes = inserts + updates
+    insert_requests = writes if mode == 'schedule' else math.ceil(writes / BLOGGER_BATCH_SIZE)
+
+    return {
+        'sheetId': sheet_id,
+        'blogId': blog_id,
+        'mode': mode,
+        'source': source,
+        'summary': {
+            'rows': len(rows),
+            'inserts': inserts,
+            'updates': updates,
+            'skips': counts['skip'],
+            'invalid': counts['invalid'],
+            'invalidDates': invalid_dates
+        },
+        'estimate': {
+            'writes': writes,
+            'insertRequests': insert_requests,
+            'seconds': round(publish_executor.estimate_seconds(user_id, blog_id, writes), 1),
+            'userRatePerMinute': publish_executor.user_rate,
+            'blogRatePerMinute': publish_executor.blog_rate
+        },
+        'rows': rows
+    }
@@ -0,0 +1,109 @@
+import bisect
+import functools
+import os
+import time
+from array import array
+from zoneinfo import ZoneInfo
+from src.services.row_mapper import get_row_mapper, parse_publish_date
+
+# Time zone of publish dates written without an offset; server local time if unset
+PUBLISH_TIMEZONE = os.getenv('PUBLISH_TIMEZONE')
+
+# Number of distinct publish date strings whose parsed value is remembered
+PUBLISH_DATE_CACHE_SIZE = int(os.getenv('PUBLISH_DATE_CACHE_SIZE', '65536'))
+
+_default_timezone = ZoneInfo(PUBLISH_TIMEZONE) if PUBLISH_TIMEZONE else None
+
+
+@functools.lru_cache(maxsize=PUBLISH_DATE_CACHE_SIZE)
+def publish_epoch(value):
+    """Convert a sheet publish date to epoch seconds, or None if invalid.
+
+    Dates with an offset are exact; dates without one are read in
+    PUBLISH_TIMEZONE, or in server local time when it is not set.
+    """
+    try:
+        publish_date = parse_publish_date(value)
+    except ValueError:
+        return None
+    if publish_date.tzinfo is None and _default_timezone is not None:
+        publish_date = publish_date.replace(tzinfo=_default_timezone)
+    return publish_date.timestamp()
+
+
+class PublishSchedule:
+    """The Publish Date column of a sheet, parsed once into epoch seconds.
+
+    Titled rows with a valid date are kept sorted by publish time in flat
+    arrays, so splitting them into due and pending rows is a binary search
+    instead of a pass over the sheet. Rows with an unparseable date are
+    kept apart; rows without a title or date are left out.
+    """
+
+    def __init__(self, epochs, row_numbers, invalid_rows):
+        self.epochs = epochs            # array('d'), ascending
+        self.row_numbers = row_numbers  # array('l'), row of each epoch
+        self.invalid_rows = invalid_rows
+
+    @classmethod
+    def from_values(cls, values):
+        """Parse the publish dates of a values grid whose first row is the header."""
+        entries = []
+        invalid_rows = set()
+        if values:
+            mapper = get_row_mapper(values[0])
+            title_idx = mapper.title_idx
+            date_idx = mapper.publish_date_idx
+            if title_idx is not None and date_idx is not None:
+                width = max(title_idx, date_idx) + 1
+                for i, row in enumerate(values[1:], start=2):
+                    if len(row) < width or not row[title_idx] or not row[date_idx]:
+                        continue
+                    epoch = publish_epoch(row[date_idx])
+                    if epoch is None:
+                        invalid_rows.add(i)
+                    else:
+                        entries.append((epoch, i))
+        entries.sort()
+        return cls(
+            array('d', [epoch for epoch, _ in entries]),
+            array('l', [i for _, i in entries]),
+            frozenset(invalid_rows)
+        )
+
+    def _split(self, now):
+        """Index of the first row publishing after now."""
+        return bisect.bisect_right(self.epochs, time.time() if now is None else now)
+
+    def due_rows(self, now=None):
+        """Row numbers whose publish time has passed, earliest first."""
+        return self.row_numbers[:self._split(now)]
+
+    def pending_rows(self, now=None):
+        """Row numbers scheduled after now, earliest first."""
+        return self.row_numbers[self._split(now):]
+
+    def pending_window(self, now=None, offset=0, limit=None):
+        """Return up to limit pending rows starting at offset, and the total.
+
+        Rows are ordered by publish time.
+        """
+        start = self._split(now)
+        total = len(self.row_numbers) - start
+        first = start + offset
+        last = len(self.row_numbers) if limit is None else min(first + limit, len(self.row_numbers))
+        return self.row_numbers[first:last], total
+
+    def next_due(self, now=None):
+        """Epoch time of the earliest row scheduled after now, or None."""
+        index = self._split(now)
+        return self.epochs[index] if index < len(self.epochs) else None
+
+    def classify(self, now=None):
+        """Return the (due, pending, invalid) sets of row numbers."""
+        index = self._split(now)
+        return (
+            set(self.row_numbers[:index]),
+            set(self.row_numbers[index:]),
+            set(self.invalid_rows)
+        )
@@ -0,0 +1,311 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+from src.routes.auth import get_credentials
+from src.services.google_clients import get_blogger_service
+from src.services.sheet_cache import get_sheet_snapshot
+from src.services.publish_ledger import publish_ledger, row_hash
+from src.services.response_cache import response_cache
+from src.services.row_mapper import get_row_mapper
+from src.services.publish_schedule import PublishSchedule
+from src.services.due_index import due_indexes
+from src.services.batch_publisher import insert_posts, insert_posts_batched
+
+# Number of sheets read, and blogs published to, at the same time by a
+# multi-sheet publish
+SHEET_FANOUT_WORKERS = int(os.getenv('SHEET_FANOUT_WORKERS', '16'))
+
+
+class PublishError(Exception):
+    """Raised when a sheet cannot be processed for publishing."""
+    pass
+
+
+def publish_due_posts(user_id, sheet_id, blog_id):
+    """Publish every row of a sheet whose publish date has passed.
+
+    Returns the per-row results and the epoch time of the next future post
+    (or None when nothing else is scheduled).
+    """
+    # Get user credentials
+    credentials = get_credentials(user_id)
+    if not credentials:
+        raise PublishError('No valid credentials found')
+
+    # Get the Blogger API service
+    blogger_service = get_blogger_service(user_id, credentials)
+
+    # Get sheet data (re-read only when the sheet changed)
+    snapshot = get_sheet_snapshot(user_id, credentials, sheet_id)
+    values = snapshot.values
+    if not values:
+        raise PublishError('No data found in sheet')
+
+    # Get headers and their compiled row mapper
+    headers = values[0]
+    mapper = get_row_mapper(headers)
+
+    # Check required columns
+    missing_columns = mapper.missing(['Title', 'Content', 'Publish Date'])
+    if missing_columns:
+        raise PublishError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    # Pop the rows that came due since the last tick from the calendar's
+    # due-time index; rows edited since are re-indexed first
+    index = due_indexes.get(user_id, sheet_id, blog_id)
+    index.sync(snapshot)
+    now = time.time()
+    due_rows = index.pop_due(now)
+    next_due = index.next_due()
+
+    try:
+        return _publish_rows(user_id, blogger_service, sheet_id, blog_id,
+                             values, mapper, index, due_rows), next_due
+    except Exception:
+        # Retry the popped rows next tick; any already published are found
+        # in the ledger then
+        index.requeue(due_rows)
+        raise
+
+
+def _publish_rows(user_id, blogger_service, sheet_id, blog_id, values, mapper, index, due_rows):
+    """Publish the rows popped from a calendar's due index.
+
+    Returns the per-row results; rows that failed are put back in the index.
+    """
+    published_posts = []
+    pending = []
+    pending_digests = set()
+    retry_rows = []
+
+    for i in due_rows:
+        post = mapper.map_row(i, values[i - 1])
+
+        # Prepare post data
+        post_body = post.post_body()
+
+        # Skip rows that were already published
+        digest = row_hash(post_body)
+        if publish_ledger.lookup(sheet_id, blog_id, digest):
+            continue
+
+        # Queue the post; it is created concurrently below. Identical rows
+        # are looked up again next tick, once the first one is in the ledger
+        if digest in pending_digests:
+            retry_rows.append(i)
+            continue
+        pending_digests.add(digest)
+        pending.append((i, post.title, post_body, digest))
+
+    # Create the posts within the user's and blog's write quotas
+    outcomes = insert_posts(
+        user_id, blogger_service, blog_id,
+        [(i, post_body) for i, _, post_body, _ in pending]
+    )
+
+    # Blog responses cached for the dashboard are stale once posts exist
+    if pending:
+        response_cache.invalidate(user_id, 'blogs', f'blog:{blog_id}')
+
+    for i, title, post_body, digest in pending:
+        post, error = outcomes[i]
+        if error is not None:
+            retry_rows.append(i)
+            published_posts.append({
+                'row': i,
+                'title': title,
+                'status': 'error',
+                'message': str(error)
+            })
+            continue
+
+        publish_ledger.record(sheet_id, blog_id, digest, post, row=i)
+        published_posts.append({
+            'row': i,
+            'title': title,
+            'status': 'success',
+            'postId': post['id'],
+            'url': post.get('url', '')
+        })
+
+    # Failed rows are retried on the next tick, which the regular poll
+    # interval bounds since next_due only covers future rows
+    index.requeue(retry_rows)
+
+    return published_posts
+
+
+def plan_sheet_publish(sheet_id, blog_id, snapshot, mapper):
+    """Decide which rows of a sheet publish_from_sheet creates posts for.
+
+    Rows with a future publish date, rows already in the ledger and repeats
+    of an earlier row get a 'skipped' result. Returns the per-row results in
+    sheet order and the rows to publish as (row, post body, digest, result)
+    tuples, whose result dict is filled in once the post is created.
+    """
+    results = []
+    pending = []
+    pending_digests = {}
+    future_rows = set(snapshot.publish_schedule().pending_rows())
+
+    # Rows without a title are skipped by the mapper
+    for record in mapper.map_values(snapshot.values):
+        i = record.row
+
+        # Skip rows with future publish dates; rows with unparseable
+        # dates are published
+        if i in future_rows:
+            results.append({
+                'row': i,
+                'title': record.title,
+                'status': 'skipped',
+                'message': 'Future publish date'
+            })
+            continue
+
+        # Prepare post data
+        post_body = record.post_body()
+
+        # Skip rows that were already published
+        digest = row_hash(post_body)
+        published = publish_ledger.lookup(sheet_id, blog_id, digest)
+        if published:
+            results.append({
+                'row': i,
+                'title': record.title,
+                'status': 'skipped',
+                'message': 'Already published',
+                'postId': published['postId'],
+                'url': published['url']
+            })
+            continue
+
+        # Identical rows in the same sheet are only published once
+        if digest in pending_digests:
+            results.append({
+                'row': i,
+                'title': record.title,
+                'status': 'skipped',
+                'message': f'Duplicate of row {pending_digests[digest]}'
+            })
+            continue
+        pending_digests[digest] = i
+
+        # Queue the post; its result is filled in once it is created
+        result = {'row': i, 'title': record.title}
+        results.append(result)
+        pending.append((i, post_body, digest, result))
+
+    return results, pending
+
+
+def read_snapshots(user_id, credentials, sheet_ids, max_workers=SHEET_FANOUT_WORKERS):
+    """Read several sheets concurrently through the snapshot cache.
+
+    Returns a dict mapping each sheet id to a (snapshot, error) pair, where
+    exactly one is set.
+    """
+    def read(sheet_id):
+        try:
+            return get_sheet_snapshot(user_id, credentials, sheet_id), None
+        except HttpError as error:
+            return None, error
+
+    sheet_ids = list(dict.fromkeys(sheet_ids))
+    if not sheet_ids:
+        return {}
+    workers = min(max_workers, len(sheet_ids))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sheet-read') as pool:
+        return dict(zip(sheet_ids, pool.map(read, sheet_ids)))
+
+
+def publish_planned(user_id, blogger_service, plans, max_workers=SHEET_FANOUT_WORKERS):
+    """Create the pending posts of several (sheet, blog) publish plans.
+
+    plans is a list of (sheet id, blog id, pending) tuples, with pending as
+    returned by plan_sheet_publish. The posts of all sheets going to the
+    same blog are merged into one batched insert run, and blogs are
+    published concurrently; each run is paced by the user's and its blog's
+    write quotas. Fills in the result dict of every pending row and returns
+    the ids of the blogs that received posts.
+    """
+    # Merge the pending rows per blog; rows of different sheets share row
+    # numbers, so each gets a key unique within its blog
+    merged = {}
+    for sheet_id, blog_id, pending in plans:
+        items = merged.setdefault(blog_id, [])
+        for i, post_body, digest, result in pending:
+            items.append((len(items), sheet_id, i, post_body, digest, result))
+
+    def publish(blog_id):
+        items = merged[blog_id]
+        outcomes = insert_posts_batched(
+            user_id, blogger_service, blog_id,
+            [(key, post_body) for key, _, _, post_body, _, _ in items]
+        )
+        for key, sheet_id, i, post_body, digest, result in items:
+            post, error = outcomes.get(key, (None, 'No response received'))
+            if error is not None:
+                result.update({
+                    'status': 'error',
+                    'message': str(error)
+                })
+                continue
+
+            publish_ledger.record(sheet_id, blog_id, digest, post, row=i)
+            result.update({
+                'status': 'success',
+                'postId': post['id'],
+                'url': post.get('url', '')
+            })
+
+    blog_ids = [blog_id for blog_id, items in merged.items() if items]
+    if blog_ids:
+        workers = min(max_workers, len(blog_ids))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='blog-publish') as pool:
+            # list() re-raises the first unexpected error
+            list(pool.map(publish, blog_ids))
+    return blog_ids
+
+
+def find_pending_posts(values, schedule=None, offset=0, limit=None):
+    """Find the rows of a sheet whose publish date is in the future.
+
+    Posts are ordered by publish date. schedule is the parsed publish dates
+    of values, e.g. from a cached sheet snapshot; it is built from values
+    when not given. Returns a window of at most limit posts starting at
+    offset, and the total number of pending posts.
+    """
+    # Get headers and their compiled row mapper
+    mapper = get_row_mapper(values[0])
+
+    # Check required columns
+    missing_columns = mapper.missing(['Title', 'Content', 'Publish Date'])
+    if missing_columns:
+        raise PublishError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    if schedule is None:
+        schedule = PublishSchedule.from_values(values)
+
+    # Range query on the schedule: only the requested window is mapped
+    rows, total = schedule.pending_window(offset=offset, limit=limit)
+    pending_posts = []
+
+    for i in rows:
+        post = mapper.map_row(i, values[i - 1])
+        pending_post = {
+            'row': post.row,
+            'title': post.title,
+            'content': post.content,
+            'publishDate': post.publish_date_text,
+            'formattedDate': post.publish_date.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+        # Add labels if available
+        if post.labels_text:
+            pending_post['labels'] = post.labels_text
+
+        pending_posts.append(pending_post)
+
+    return pending_posts, total
@@ -0,0 +1,131 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, make_response, request
+from flask_login import current_user
+
+# Default lifetime of cached responses in seconds
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '300'))
+
+# Maximum number of cached responses across all users
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '10000'))
+
+
+class CachedResponse:
+    """A serialized response body with its ETag and invalidation tags."""
+
+    __slots__ = ('body', 'mimetype', 'etag', 'expires_at', 'tags')
+
+    def __init__(self, body, mimetype, ttl, tags):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.expires_at = time.monotonic() + ttl
+        self.tags = frozenset(tags)
+
+
+class ResponseCache:
+    """Per-user TTL cache of read-only endpoint responses."""
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key):
+        """Return a live cached response, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, entry):
+        """Store a response."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id, *tags):
+        """Drop a user's cached responses carrying any of the given tags."""
+        user_id = str(user_id)
+        tags = set(tags)
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if key[0] == user_id and entry.tags & tags
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def record_not_modified(self):
+        """Count a revalidation answered with 304."""
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self):
+        """Return cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'notModified': self.not_modified,
+                'hitRatio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Process-wide response cache
+response_cache = ResponseCache()
+
+
+def cached_response(ttl=RESPONSE_CACHE_TTL, tags=None):
+    """Cache a view's successful responses per user and serve them with ETags.
+
+    tags is a function of the view's keyword arguments returning the tags
+    used to invalidate the entry. Clients that send a matching If-None-Match
+    get an empty 304 instead of the body.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (str(current_user.id), request.full_path)
+            entry = response_cache.get(key)
+
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                # Only successful responses are cached
+                if response.status_code != 200:
+                    return response
+                entry = CachedResponse(
+                    response.get_data(), response.mimetype, ttl,
+                    tags(**kwargs) if tags else ()
+                )
+                response_cache.set(key, entry)
+
+            if request.if_none_match.contains(entry.etag):
+                response_cache.record_not_modified()
+                response = Response(status=304)
+            else:
+                response = Response(entry.body, mimetype=entry.mimetype)
+
+            # Private to the user, and always revalidated before reuse
+            response.set_etag(entry.etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+import functools
+from datetime import datetime
+
+# Maximum number of distinct header rows with a compiled mapper kept
+ROW_MAPPER_CACHE_SIZE = 256
+
+
+def parse_publish_date(value):
+    """Parse a sheet publish date into a datetime."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def split_labels(value):
+    """Split a comma separated Labels cell into a tuple of labels."""
+    return tuple([label.strip() for label in value.split(',')])
+
+
+class PostRecord:
+    """A sheet row mapped to the fields of a blog post.
+
+    publish_date is None when the row has no date or the date is invalid;
+    has_date tells the two apart.
+    """
+
+    __slots__ = ('row', 'title', 'content', 'labels', 'labels_text',
+                 'publish_date', 'publish_date_text')
+
+    def __init__(self, row, title, content, labels_text, publish_date_text):
+        self.row = row
+        self.title = title
+        self.content = content
+        self.labels_text = labels_text
+        self.labels = split_labels(labels_text) if labels_text else ()
+        self.publish_date_text = publish_date_text
+        self.publish_date = None
+        if publish_date_text:
+            try:
+                self.publish_date = parse_publish_date(publish_date_text)
+            except ValueError:
+                pass
+
+    @property
+    def has_date(self):
+        """Whether the row has a non-empty publish date cell."""
+        return bool(self.publish_date_text)
+
+    def post_body(self):
+        """Build the Blogger post body of the row."""
+        post_body = {
+            'title': self.title,
+            'content': self.content
+        }
+
+        # Add labels if available
+        if self.labels:
+            post_body['labels'] = list(self.labels)
+
+        return post_body
+
+
+class RowMapper:
+    """Column positions of a header row, compiled into a row-to-record mapper.
+
+    Built once per distinct header row (see get_row_mapper) so the routes
+    don't each look up column indices and guard every cell access.
+    """
+
+    def __init__(self, headers):
+        self.headers = tuple(headers)
+        self.title_idx = self._index('Title')
+        self.content_idx = self._index('Content')
+        self.labels_idx = self._index('Labels')
+        self.publish_date_idx = self._index('Publish Date')
+
+        # Positions of the mapped columns; absent columns read as ''
+        self._positions = (self.title_idx, self.content_idx,
+                           self.labels_idx, self.publish_date_idx)
+        present = [idx for idx in self._positions if idx is not None]
+        # Rows at least this long need no per-cell length checks
+        self._width = max(present) + 1 if present else 0
+
+    def _index(self, column):
+        return self.headers.index(column) if column in self.headers else None
+
+    def missing(self, columns):
+        """Return the given columns that are not in the header row."""
+        return [column for column in columns if column not in self.headers]
+
+    def _cell(self, row, idx):
+        if idx is None or idx >= len(row):
+            return ''
+        return row[idx]
+
+    def map_row(self, row_number, row):
+        """Map one row of values to a PostRecord."""
+        cell = self._cell
+        title_idx, content_idx, labels_idx, publish_date_idx = self._positions
+        return PostRecord(
+            row_number,
+            cell(row, title_idx),
+            cell(row, content_idx),
+            cell(row, labels_idx),
+            cell(row, publish_date_idx)
+        )
+
+    def map_rows(self, rows):
+        """Map (row number, row values) pairs to PostRecords of titled rows.
+
+        Rows without a title are skipped. This is the hot loop of every
+        sheet-driven route, so records are filled in place rather than
+        through PostRecord.__init__ and rows covering all mapped columns
+        skip the per-cell length checks.
+        """
+        title_idx, content_idx, labels_idx, publish_date_idx = self._positions
+        if title_idx is None:
+            return
+        width = self._width
+        cell = self._cell
+        new_record = PostRecord.__new__
+
+        for row_number, row in rows:
+            if len(row) <= title_idx:
+                continue
+            title = row[title_idx]
+            if not title:
+                continue
+
+            if len(row) >= width:
+                content = row[content_idx] if content_idx is not None else ''
+                labels_text = row[labels_idx] if labels_idx is not None else ''
+                date_text = row[publish_date_idx] if publish_date_idx is not None else ''
+            else:
+                content = cell(row, content_idx)
+                labels_text = cell(row, labels_idx)
+                date_text = cell(row, publish_date_idx)
+
+            record = new_record(PostRecord)
+            record.row = row_number
+            record.title = title
+            record.content = content
+            record.labels_text = labels_text
+            record.labels = split_labels(labels_text) if labels_text else ()
+            record.publish_date_text = date_text
+            record.publish_date = None
+            if date_text:
+                try:
+                    record.publish_date = parse_publish_date(date_text)
+                except ValueError:
+                    pass
+            yield record
+
+    def map_values(self, values):
+        """Map the data rows of a values grid whose first row is the header."""
+        return self.map_rows(enumerate(values[1:], start=2))
+
+
+@functools.lru_cache(maxsize=ROW_MAPPER_CACHE_SIZE)
+def _compiled_mapper(headers):
+    return RowMapper(headers)
+
+
+def get_row_mapper(headers):
+    """Get the compiled mapper of a header row, building it on first use."""
+    return _compiled_mapper(tuple(headers))
@@ -0,0 +1,250 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from src.services.publishing import publish_due_posts
+from src.services.due_index import due_indexes
+from src.services.job_queue import job_queue
+from src.services.shard_coordinator import shard_coordinator
+
+logger = logging.getLogger(__name__)
+
+# Number of threads publishing due posts in the background
+SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', '4'))
+
+# Registered sheets are re-read at least this often to pick up new rows
+SCHEDULER_POLL_SECONDS = int(os.getenv('SCHEDULER_POLL_SECONDS', '300'))
+
+# 'local' publishes every calendar in this process; 'sharded' leaves the
+# background checks to scheduler worker processes (python -m src.scheduler_worker)
+SCHEDULER_MODE = os.getenv('SCHEDULER_MODE', 'local')
+
+
+def _isoformat(epoch):
+    """Format an epoch timestamp for API responses."""
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class SchedulerEngine:
+    """Background publisher for registered (user, sheet, blog) calendars.
+
+    Due times are kept in a min-heap; a single dispatcher thread sleeps until
+    the earliest one and hands the calendar to a bounded worker pool.
+
+    Registrations are persisted through the shard coordinator. The engine
+    only schedules the calendars of the shards it owns: all of them when
+    owned_shards is None, or the shards leased by a scheduler worker.
+    """
+
+    def __init__(self, max_workers=SCHEDULER_WORKERS, poll_seconds=SCHEDULER_POLL_SECONDS,
+                 coordinator=shard_coordinator, owned_shards=None):
+        self.poll_seconds = poll_seconds
+        self.coordinator = coordinator
+        self.owned_shards = owned_shards
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='publisher'
+        )
+        self._cond = threading.Condition()
+        self._heap = []  # (due_at, seq, key)
+        self._seq = itertools.count()
+        self._registrations = {}  # key -> scheduled due_at
+        # Locks of the calendars being checked; dropped once no check holds one
+        self._key_locks = weakref.WeakValueDictionary()
+        self._thread = None
+        self._stopped = False
+
+    def start(self):
+        """Start the dispatcher thread if it is not running yet.
+
+        On first start the persisted registrations of the owned shards are
+        scheduled, so calendars survive a restart.
+        """
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._dispatch, name='scheduler-dispatcher', daemon=True
+            )
+            self._thread.start()
+        if self.owned_shards is None:
+            self.sync_registrations(self.coordinator.shard_registrations())
+
+    def stop(self):
+        """Stop dispatching checks and wait for the running ones to finish."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._executor.shutdown(wait=True)
+
+    def owns(self, key):
+        """Whether this engine schedules the background checks of a calendar."""
+        return self.owned_shards is None or self.coordinator.shard_for(key[0]) in self.owned_shards
+
+    def register(self, user_id, sheet_id, blog_id, check_now=True):
+        """Track a calendar so its due posts are published automatically."""
+        key = (str(user_id), sheet_id, blog_id)
+        self.coordinator.save_registration(*key)
+        with self._cond:
+            if key not in self._registrations and self.owns(key):
+                if check_now:
+                    self._schedule(key, time.time())
+                else:
+                    # A job for this calendar is about to run and will reschedule it
+                    self._registrations[key] = None
+        self.start()
+        return key
+
+    def unregister(self, user_id, sheet_id, blog_id):
+        """Stop tracking a calendar. Returns False if it was not registered."""
+        key = (str(user_id), sheet_id, blog_id)
+        if not self.coordinator.delete_registration(*key):
+            return False
+        self._drop(key)
+        due_indexes.delete(*key)
+        return True
+
+    def _drop(self, key):
+        """Stop scheduling a calendar in this process."""
+        with self._cond:
+            # Stale heap entries are discarded by the dispatcher
+            self._registrations.pop(key, None)
+        due_indexes.forget(*key)
+
+    def set_owned_shards(self, shards):
+        """Take over the given shards, dropping calendars of shards given up."""
+        with self._cond:
+            self.owned_shards = set(shards)
+        self.sync_registrations(self.coordinator.shard_registrations(self.owned_shards))
+
+    def sync_registrations(self, keys):
+        """Schedule the given owned calendars and drop all others.
+
+        Called with the persisted registrations of the owned shards, so
+        calendars registered or removed through another process are picked up.
+        """
+        keys = set(keys)
+        with self._cond:
+            stale = [key for key in self._registrations if key not in keys]
+            for key in keys:
+                if key not in self._registrations:
+                    self._schedule(key, time.time())
+        for key in stale:
+            self._drop(key)
+
+    def registrations(self, user_id):
+        """List the calendars registered by a user.
+
+        nextCheck is only known for calendars scheduled by this process.
+        """
+        keys = self.coordinator.user_registrations(user_id)
+        with self._cond:
+            return [{
+                'sheetId': key[1],
+                'blogId': key[2],
+                'nextCheck': _isoformat(self._registrations.get(key))
+            } for key in keys]
+
+    def enqueue(self, user_id, sheet_id, blog_id):
+        """Register a calendar and check it right away.
+
+        Returns the id of a job in the durable job queue, so its status can
+        be polled from any process.
+        """
+        key = self.register(user_id, sheet_id, blog_id, check_now=False)
+        job_id = job_queue.create_check(*key)
+        self._executor.submit(self._run_job, key, job_id)
+        return job_id
+
+    def _schedule(self, key, due_at):
+        """Push the next check of a calendar onto the heap. Caller holds the lock."""
+        self._registrations[key] = due_at
+        heapq.heappush(self._heap, (due_at, next(self._seq), key))
+        self._cond.notify()
+
+    def _dispatch(self):
+        """Sleep until the earliest due calendar and hand it to the pool."""
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                due_at, _, key = self._heap[0]
+                delay = due_at - time.time()
+                if delay > 0:
+                    # Woken early if a sooner entry is pushed
+                    self._cond.wait(delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                # Skip entries superseded by a reschedule or unregister
+                if self._registrations.get(key) != due_at:
+                    continue
+                self._registrations[key] = None
+
+                # Submitted under the lock so stop() never races a submit
+                self._executor.submit(self._run_job, key)
+
+    def _run_job(self, key, job_id=None):
+        """Publish the due posts of one calendar and schedule its next check.
+
+        job_id is the job of a check requested through enqueue; periodic
+        checks have none.
+        """
+        user_id, sheet_id, blog_id = key
+        next_due = None
+        with self._cond:
+            key_lock = self._key_locks.get(key)
+            if key_lock is None:
+                key_lock = self._key_locks[key] = threading.Lock()
+
+        # Never process the same calendar twice at once, in this process or
+        # in another one
+        with key_lock, self.coordinator.calendar_lock(*key) as locked:
+            if job_id is not None:
+                job_queue.start_check(job_id)
+            started = time.monotonic()
+            published = errors = 0
+            try:
+                published_posts = []
+                if locked:
+                    published_posts, next_due = publish_due_posts(user_id, sheet_id, blog_id)
+                # Otherwise another process is publishing the calendar right now
+                if job_id is not None:
+                    job_queue.finish_check(job_id, published_posts)
+                published = sum(1 for post in published_posts if post['status'] == 'success')
+                errors = len(published_posts) - published
+            except Exception as e:
+                logger.exception('Scheduled publish failed for sheet %s', sheet_id)
+                errors = 1
+                if job_id is not None:
+                    job_queue.finish_check(job_id, [], error=str(e))
+
+            if locked:
+                self.coordinator.record_tick(
+                    self.coordinator.shard_for(user_id), published, errors,
+                    time.monotonic() - started
+                )
+
+        with self._cond:
+            if key in self._registrations:
+                # Wake for the next post, but re-read the sheet periodically
+                poll_at = time.time() + self.poll_seconds
+                current = self._registrations[key]
+                due_at = min(next_due, poll_at) if next_due is not None else poll_at
+                if current is None or due_at < current:
+                    self._schedule(key, due_at)
+
+
+# Process-wide scheduler engine; in sharded mode it owns no shards unless
+# this process is a scheduler worker
+scheduler_engine = SchedulerEngine(owned_shards=None if SCHEDULER_MODE == 'local' else set())
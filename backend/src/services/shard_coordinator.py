@@ -0,0 +1,326 @@
+import contextlib
+import hashlib
+import os
+import socket
+import time
+from src.services.database import get_connection, ensure_schema, keep_alive
+
+# Number of shards the (user, sheet, blog) calendars are partitioned into
+SCHEDULER_SHARDS = int(os.getenv('SCHEDULER_SHARDS', '64'))
+
+# Seconds a worker holds a shard without renewing its lease
+SCHEDULER_LEASE_SECONDS = float(os.getenv('SCHEDULER_LEASE_SECONDS', '30'))
+
+# Seconds a calendar stays locked by a check whose process died
+SCHEDULER_CALENDAR_LOCK_SECONDS = float(os.getenv('SCHEDULER_CALENDAR_LOCK_SECONDS', '300'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scheduler_registrations (
+    user_id TEXT NOT NULL,
+    sheet_id TEXT NOT NULL,
+    blog_id TEXT NOT NULL,
+    shard INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (user_id, sheet_id, blog_id)
+);
+CREATE INDEX IF NOT EXISTS idx_scheduler_registrations_shard
+    ON scheduler_registrations (shard);
+CREATE TABLE IF NOT EXISTS scheduler_workers (
+    worker_id TEXT PRIMARY KEY,
+    heartbeat_at REAL NOT NULL,
+    started_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scheduler_shards (
+    shard INTEGER PRIMARY KEY,
+    owner TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0,
+    ticks INTEGER NOT NULL DEFAULT 0,
+    published INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    busy_seconds REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS scheduler_calendar_locks (
+    user_id TEXT NOT NULL,
+    sheet_id TEXT NOT NULL,
+    blog_id TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (user_id, sheet_id, blog_id)
+);
+'''
+
+
+def _hash(value):
+    """Stable 64-bit hash, identical in every process."""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def shard_for_user(user_id, shards=SCHEDULER_SHARDS):
+    """Shard of a user's calendars; all of a user's calendars share one."""
+    return _hash(str(user_id)) % shards
+
+
+def shard_owner(shard, workers):
+    """Worker a shard is assigned to among the live workers.
+
+    Rendezvous (highest random weight) hashing: when a worker joins or dies
+    only the shards it wins or held move, the rest stay where they are.
+    """
+    if not workers:
+        return None
+    return max(workers, key=lambda worker_id: _hash(f'{shard}:{worker_id}'))
+
+
+class ShardCoordinator:
+    """Shard leases, worker heartbeats and scheduler registrations in SQLite.
+
+    Every scheduler worker heartbeats into the shared database, works out
+    which shards it should own among the live workers, and holds them
+    through leases that lapse if it stops renewing them. Shards of a dead
+    worker are therefore taken over by the others once its lease runs out.
+    """
+
+    def __init__(self, worker_id=None, shards=SCHEDULER_SHARDS, lease_seconds=SCHEDULER_LEASE_SECONDS):
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.shards = shards
+        self.lease_seconds = lease_seconds
+        self.started_at = time.time()
+
+    def _connection(self):
+        ensure_schema('scheduler', SCHEMA)
+        return get_connection()
+
+    def shard_for(self, user_id):
+        """Shard of a user's calendars."""
+        return shard_for_user(user_id, self.shards)
+
+    # Registrations
+
+    def save_registration(self, user_id, sheet_id, blog_id):
+        """Persist a calendar registration. Returns False if it already existed."""
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO scheduler_registrations '
+                '(user_id, sheet_id, blog_id, shard, created_at) VALUES (?, ?, ?, ?, ?)',
+                (str(user_id), sheet_id, blog_id, self.shard_for(user_id), time.time())
+            )
+        return cursor.rowcount == 1
+
+    def delete_registration(self, user_id, sheet_id, blog_id):
+        """Remove a calendar registration. Returns False if it did not exist."""
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute(
+                'DELETE FROM scheduler_registrations '
+                'WHERE user_id = ? AND sheet_id = ? AND blog_id = ?',
+                (str(user_id), sheet_id, blog_id)
+            )
+        return cursor.rowcount == 1
+
+    def user_registrations(self, user_id):
+        """Return the (user, sheet, blog) keys registered by a user."""
+        rows = self._connection().execute(
+            'SELECT user_id, sheet_id, blog_id FROM scheduler_registrations WHERE user_id = ?',
+            (str(user_id),)
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def shard_registrations(self, shards=None):
+        """Return the keys registered in the given shards (None for all)."""
+        connection = self._connection()
+        if shards is None:
+            rows = connection.execute(
+                'SELECT user_id, sheet_id, blog_id FROM scheduler_registrations'
+            ).fetchall()
+        elif not shards:
+            return []
+        else:
+            shards = sorted(shards)
+            rows = connection.execute(
+                'SELECT user_id, sheet_id, blog_id FROM scheduler_registrations '
+                f"WHERE shard IN ({', '.join('?' * len(shards))})",
+                shards
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    # Workers and shard leases
+
+    def heartbeat(self):
+        """Record that this worker is alive and return the live worker ids."""
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                'INSERT INTO scheduler_workers (worker_id, heartbeat_at, started_at) '
+                'VALUES (?, ?, ?) '
+                'ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at',
+                (self.worker_id, now, self.started_at)
+            )
+            # Forget workers that have been silent for a long time
+            connection.execute(
+                'DELETE FROM scheduler_workers WHERE heartbeat_at < ?',
+                (now - 10 * self.lease_seconds,)
+            )
+        rows = connection.execute(
+            'SELECT worker_id FROM scheduler_workers WHERE heartbeat_at >= ?',
+            (now - self.lease_seconds,)
+        ).fetchall()
+        return [row['worker_id'] for row in rows]
+
+    def rebalance(self):
+        """Heartbeat, then acquire, renew and release shard leases.
+
+        Returns the set of shards this worker holds a lease on. A shard is
+        only taken once its previous owner released it or let the lease lapse.
+        """
+        workers = self.heartbeat()
+        now = time.time()
+        wanted = {shard for shard in range(self.shards) if shard_owner(shard, workers) == self.worker_id}
+
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                'INSERT OR IGNORE INTO scheduler_shards (shard) VALUES (?)',
+                [(shard,) for shard in range(self.shards)]
+            )
+            # Hand back shards that now belong to another worker
+            held = connection.execute(
+                'SELECT shard FROM scheduler_shards WHERE owner = ?', (self.worker_id,)
+            ).fetchall()
+            connection.executemany(
+                'UPDATE scheduler_shards SET owner = NULL, lease_expires = 0 '
+                'WHERE shard = ? AND owner = ?',
+                [(row['shard'], self.worker_id) for row in held if row['shard'] not in wanted]
+            )
+            connection.executemany(
+                'UPDATE scheduler_shards SET owner = ?, lease_expires = ? '
+                'WHERE shard = ? AND (owner IS NULL OR owner = ? OR lease_expires < ?)',
+                [(self.worker_id, now + self.lease_seconds, shard, self.worker_id, now)
+                 for shard in sorted(wanted)]
+            )
+        rows = connection.execute(
+            'SELECT shard FROM scheduler_shards WHERE owner = ? AND lease_expires >= ?',
+            (self.worker_id, now)
+        ).fetchall()
+        return {row['shard'] for row in rows}
+
+    def leave(self):
+        """Release this worker's shards and remove it from the live workers."""
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                'UPDATE scheduler_shards SET owner = NULL, lease_expires = 0 WHERE owner = ?',
+                (self.worker_id,)
+            )
+            connection.execute(
+                'DELETE FROM scheduler_workers WHERE worker_id = ?', (self.worker_id,)
+            )
+
+    # Calendar locks
+
+    @contextlib.contextmanager
+    def calendar_lock(self, user_id, sheet_id, blog_id, ttl=SCHEDULER_CALENDAR_LOCK_SECONDS):
+        """Hold a calendar across processes while it is checked.
+
+        Yields False without waiting if another process is checking it, e.g.
+        a request-driven check racing the shard owner's tick. Locks left by a
+        worker that stopped heartbeating are taken over right away, others
+        once they expire. A held lock is renewed every third of its ttl, so a
+        check slowed down by rate limits keeps it for as long as it runs.
+        """
+        key = (str(user_id), sheet_id, blog_id)
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                'DELETE FROM scheduler_calendar_locks '
+                'WHERE user_id = ? AND sheet_id = ? AND blog_id = ? AND (expires_at < ? OR owner IN '
+                '(SELECT worker_id FROM scheduler_workers WHERE heartbeat_at < ?))',
+                (*key, now, now - self.lease_seconds)
+            )
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO scheduler_calendar_locks '
+                '(user_id, sheet_id, blog_id, owner, expires_at) VALUES (?, ?, ?, ?, ?)',
+                (*key, self.worker_id, now + ttl)
+            )
+        acquired = cursor.rowcount == 1
+
+        def renew():
+            renewal = get_connection()
+            with renewal:
+                cursor = renewal.execute(
+                    'UPDATE scheduler_calendar_locks SET expires_at = ? '
+                    'WHERE user_id = ? AND sheet_id = ? AND blog_id = ? AND owner = ?',
+                    (time.time() + ttl, *key, self.worker_id)
+                )
+            return cursor.rowcount == 1
+
+        try:
+            if acquired:
+                with keep_alive(renew, ttl / 3, name='calendar lock'):
+                    yield True
+            else:
+                yield False
+        finally:
+            if acquired:
+                with connection:
+                    connection.execute(
+                        'DELETE FROM scheduler_calendar_locks '
+                        'WHERE user_id = ? AND sheet_id = ? AND blog_id = ? AND owner = ?',
+                        (*key, self.worker_id)
+                    )
+
+    # Metrics
+
+    def record_tick(self, shard, published, errors, seconds):
+        """Add one calendar check to a shard's throughput counters."""
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                'INSERT OR IGNORE INTO scheduler_shards (shard) VALUES (?)', (shard,)
+            )
+            connection.execute(
+                'UPDATE scheduler_shards SET ticks = ticks + 1, published = published + ?, '
+                'errors = errors + ?, busy_seconds = busy_seconds + ? WHERE shard = ?',
+                (published, errors, seconds, shard)
+            )
+
+    def stats(self):
+        """Return the live workers and the owner and counters of every shard."""
+        now = time.time()
+        connection = self._connection()
+        workers = connection.execute(
+            'SELECT worker_id, heartbeat_at, started_at FROM scheduler_workers '
+            'WHERE heartbeat_at >= ? ORDER BY worker_id',
+            (now - self.lease_seconds,)
+        ).fetchall()
+        shards = connection.execute(
+            'SELECT s.shard, s.owner, s.lease_expires, s.ticks, s.published, s.errors, '
+            's.busy_seconds, COUNT(r.user_id) AS calendars '
+            'FROM scheduler_shards s LEFT JOIN scheduler_registrations r ON r.shard = s.shard '
+            'GROUP BY s.shard ORDER BY s.shard'
+        ).fetchall()
+        return {
+            'workers': [{
+                'workerId': row['worker_id'],
+                'uptimeSeconds': round(now - row['started_at'], 1),
+                'lastHeartbeat': round(now - row['heartbeat_at'], 1),
+                'shards': sum(1 for shard in shards
+                              if shard['owner'] == row['worker_id'] and shard['lease_expires'] >= now)
+            } for row in workers],
+            'shards': [{
+                'shard': row['shard'],
+                'owner': row['owner'] if row['lease_expires'] >= now else None,
+                'calendars': row['calendars'],
+                'ticks': row['ticks'],
+                'published': row['published'],
+                'errors': row['errors'],
+                'busySeconds': round(row['busy_seconds'], 3),
+                'postsPerSecond': round(row['published'] / row['busy_seconds'], 2) if row['busy_seconds'] else 0.0
+            } for row in shards]
+        }
+
+
+# Coordinator of this process
+shard_coordinator = ShardCoordinator()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from googleapiclient.errors import HttpError
+from src.services.google_clients import get_sheets_service, get_drive_service
+from src.services.sheet_reader import iter_sheet_rows
+from src.services.publish_schedule import PublishSchedule
+from src.services.sheet_query import SheetIndex
+
+# Maximum number of sheet snapshots kept in memory
+SHEET_CACHE_SIZE = int(os.getenv('SHEET_CACHE_SIZE', '128'))
+
+# None reads the whole first tab, sized from the spreadsheet metadata
+DEFAULT_RANGE = None
+
+
+def hash_row(row):
+    """Compute a stable hash of the raw values of a sheet row."""
+    payload = json.dumps(row, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SheetSnapshot:
+    """Values of a sheet range at a given Drive revision.
+
+    Row numbers are 1-indexed sheet rows, so the first data row is 2.
+    """
+
+    def __init__(self, sheet_id, range_name, values, modified_time=None, version=None, previous=None,
+                 row_hashes=None):
+        self.sheet_id = sheet_id
+        self.range_name = range_name
+        self.values = values
+        self.modified_time = modified_time
+        self.version = version
+        self.headers = values[0] if values else []
+        if row_hashes is None:
+            row_hashes = [hash_row(row) for row in values[1:]]
+        self.row_hashes = row_hashes
+        self._publish_schedule = None
+        self._query_index = None
+
+        # Rows added or changed since the previous snapshot
+        if previous is None or previous.headers != self.headers:
+            self.changed_rows = list(range(2, len(values) + 1))
+        else:
+            old_hashes = previous.row_hashes
+            self.changed_rows = [
+                i for i, digest in enumerate(self.row_hashes, start=2)
+                if i - 2 >= len(old_hashes) or old_hashes[i - 2] != digest
+            ]
+
+    def rows(self):
+        """Yield (row number, row values, row hash) for every data row."""
+        for i, row in enumerate(self.values[1:], start=2):
+            yield i, row, self.row_hashes[i - 2]
+
+    def publish_schedule(self):
+        """Publish dates of the snapshot, parsed on first use."""
+        if self._publish_schedule is None:
+            self._publish_schedule = PublishSchedule.from_values(self.values)
+        return self._publish_schedule
+
+    def query_index(self):
+        """Label and publish date indexes of the snapshot, built on first use."""
+        if self._query_index is None:
+            self._query_index = SheetIndex(self.values)
+        return self._query_index
+
+    def is_current(self, modified_time, version):
+        """Whether the snapshot matches the given Drive revision."""
+        if modified_time is None and version is None:
+            return False
+        return self.modified_time == modified_time and self.version == version
+
+
+def read_snapshot_rows(sheets_service, sheet_id, previous=None):
+    """Read a whole first tab block by block into (values, data row hashes).
+
+    Rows are hashed as each block arrives and the raw API responses are
+    dropped block by block. Rows unchanged since the previous snapshot reuse
+    its row lists, so a re-read only allocates the rows that changed. The
+    values themselves are still held in full: a snapshot is the whole tab.
+    """
+    old_rows = {}
+    if previous is not None and previous.range_name is None:
+        old_rows = dict(zip(previous.row_hashes, previous.values[1:]))
+
+    values = []
+    row_hashes = []
+    for row_number, row in iter_sheet_rows(sheets_service, sheet_id):
+        # Rows missing from the stream are kept as empty rows so that list
+        # positions keep matching sheet row numbers
+        while len(values) < row_number - 1:
+            if values:
+                row_hashes.append(hash_row([]))
+            values.append([])
+        if values:
+            digest = hash_row(row)
+            row = old_rows.get(digest, row)
+            row_hashes.append(digest)
+        values.append(row)
+
+    # Drop empty rows left over at the end of the grid
+    while values and not values[-1]:
+        values.pop()
+    del row_hashes[max(len(values) - 1, 0):]
+    return values, row_hashes
+
+
+class SheetCache:
+    """LRU cache of sheet snapshots validated against Drive file metadata.
+
+    A Drive files.get for modifiedTime/version is far cheaper than reading
+    the values, so the values are only re-read when the sheet has changed.
+    Each snapshot holds its whole tab in memory, so memory use grows with
+    sheet size times SHEET_CACHE_SIZE; only the streamed formats of
+    /sheets/<id>/data read a sheet in bounded memory.
+    """
+
+    def __init__(self, max_size=SHEET_CACHE_SIZE):
+        self.max_size = max_size
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, credentials, sheet_id, range_name=DEFAULT_RANGE):
+        """Return an up-to-date snapshot of a sheet range."""
+        key = (str(user_id), sheet_id, range_name)
+        with self._lock:
+            cached = self._snapshots.get(key)
+
+        modified_time, version = self._revision(user_id, credentials, sheet_id)
+        if cached is not None and cached.is_current(modified_time, version):
+            with self._lock:
+                self._snapshots.move_to_end(key)
+                self.hits += 1
+            return cached
+
+        # Get sheet data
+        sheets_service = get_sheets_service(user_id, credentials)
+        row_hashes = None
+        if range_name is None:
+            values, row_hashes = read_snapshot_rows(sheets_service, sheet_id, previous=cached)
+        else:
+            result = sheets_service.spreadsheets().values().get(
+                spreadsheetId=sheet_id,
+                range=range_name
+            ).execute()
+            values = result.get('values', [])
+
+        snapshot = SheetSnapshot(
+            sheet_id, range_name, values,
+            modified_time=modified_time, version=version, previous=cached,
+            row_hashes=row_hashes
+        )
+        with self._lock:
+            self.misses += 1
+            self._snapshots[key] = snapshot
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.max_size:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, sheet_id):
+        """Drop every cached snapshot of a sheet."""
+        with self._lock:
+            for key in [key for key in self._snapshots if key[1] == sheet_id]:
+                del self._snapshots[key]
+
+    def _revision(self, user_id, credentials, sheet_id):
+        """Return the Drive (modifiedTime, version) of a sheet."""
+        try:
+            drive_service = get_drive_service(user_id, credentials)
+            metadata = drive_service.files().get(
+                fileId=sheet_id,
+                fields='modifiedTime,version'
+            ).execute()
+        except HttpError:
+            # Without Drive metadata the values are always re-read
+            return None, None
+        return metadata.get('modifiedTime'), metadata.get('version')
+
+
+# Process-wide sheet snapshot cache
+sheet_cache = SheetCache()
+
+
+def get_sheet_snapshot(user_id, credentials, sheet_id, range_name=DEFAULT_RANGE):
+    """Get a snapshot of a sheet, re-reading values only when it changed."""
+    return sheet_cache.get(user_id, credentials, sheet_id, range_name)
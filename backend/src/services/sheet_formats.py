@@ -0,0 +1,98 @@
+import json
+import os
+from googleapiclient.errors import HttpError
+
+# Response formats of the sheet data endpoint: one object per row in a single
+# JSON document (the default), headers once with rows as arrays, or one JSON
+# object per line
+SHEET_DATA_FORMATS = ('objects', 'columnar', 'ndjson')
+
+# Serialized rows are written in chunks of about this many bytes
+SHEET_STREAM_CHUNK_BYTES = int(os.getenv('SHEET_STREAM_CHUNK_BYTES', '65536'))
+
+# Compact separators, and no \u escapes for non-ASCII text
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+def data_rows(headers, rows, first_row=2):
+    """Pad the (row number, values) pairs after the header to full width.
+
+    Yields one list per sheet row from first_row on, with blank rows that sit
+    between data rows filled in, so positions keep matching row numbers.
+    """
+    width = len(headers)
+    blank = [''] * width
+    next_row = first_row
+    for row_number, row in rows:
+        # Keep blank rows that sit between data rows
+        for _ in range(row_number - next_row):
+            yield blank
+        next_row = row_number + 1
+
+        # Pad row with empty strings if it's shorter than headers
+        if len(row) < width:
+            row = row + blank[len(row):]
+        yield row
+
+
+def _chunked(pieces, chunk_bytes):
+    """Join serialized pieces into chunks of about chunk_bytes bytes."""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def _columnar_pieces(headers, rows):
+    yield '{"headers":' + _encode(headers) + ',"rows":['
+    separator = ''
+    try:
+        for row in rows:
+            yield separator + _encode(row)
+            separator = ','
+    except HttpError as error:
+        # Headers are already sent, so close the document with the error
+        yield '],"error":' + _encode(f'An error occurred: {error}') + '}'
+        return
+    yield ']}'
+
+
+def _ndjson_pieces(headers, rows):
+    try:
+        for row in rows:
+            yield _encode(dict(zip(headers, row))) + '\n'
+    except HttpError as error:
+        # Headers are already sent, so report the error in-band
+        yield _encode({'error': f'An error occurred: {error}'}) + '\n'
+
+
+def stream_sheet_data(headers, rows, data_format, chunk_bytes=SHEET_STREAM_CHUNK_BYTES):
+    """Serialize sheet rows incrementally as byte chunks.
+
+    rows are padded rows as produced by data_rows. 'columnar' writes
+    {"headers": [...], "rows": [[...], ...]}; 'ndjson' writes one object
+    keyed by the headers per line. Only one chunk is held in memory at a
+    time, and the first one is ready as soon as the first rows are. An API
+    error while reading later rows ends the stream with an "error" entry.
+    """
+    if data_format == 'columnar':
+        pieces = _columnar_pieces(headers, rows)
+    elif data_format == 'ndjson':
+        pieces = _ndjson_pieces(headers, rows)
+    else:
+        raise ValueError(f'Cannot stream the {data_format} format')
+    return _chunked(pieces, chunk_bytes)
+
+
+# Content types of the streamed formats
+SHEET_DATA_MIMETYPES = {
+    'columnar': 'application/json',
+    'ndjson': 'application/x-ndjson'
+}
@@ -0,0 +1,196 @@
+import bisect
+import time
+from array import array
+from src.services.row_mapper import get_row_mapper
+from src.services.publish_schedule import publish_epoch
+
+# Row statuses that can be filtered on, derived from the Publish Date column
+ROW_STATUSES = ('due', 'scheduled', 'invalid', 'undated')
+
+# Request arguments that make a sheet data request a query
+QUERY_ARGS = ('columns', 'label', 'dateFrom', 'dateTo', 'status', 'offset', 'limit')
+
+
+class QueryError(ValueError):
+    """Raised for an invalid sheet query."""
+    pass
+
+
+class SheetIndex:
+    """Per-column indexes of a sheet snapshot for filtering its rows.
+
+    Built once per snapshot: an inverted index from each distinct label to
+    the set of its rows, and the rows with a valid publish date sorted by
+    date, so a filter is a lookup or a binary search instead of a pass over
+    the sheet. Statuses only cover titled rows, as PublishSchedule does.
+    """
+
+    def __init__(self, values):
+        self.headers = list(values[0]) if values else []
+        self.row_count = max(len(values) - 1, 0)
+        self.columns = {}
+        for position, name in enumerate(self.headers):
+            self.columns.setdefault(name, position)
+
+        mapper = get_row_mapper(self.headers)
+        labels = {}
+        dated = []
+        invalid = []
+        undated = []
+        untitled = []
+        labels_idx = mapper.labels_idx
+        title_idx = mapper.title_idx
+        date_idx = mapper.publish_date_idx
+        for i, row in enumerate(values[1:], start=2):
+            if labels_idx is not None and len(row) > labels_idx and row[labels_idx]:
+                for label in row[labels_idx].split(','):
+                    label = label.strip().lower()
+                    if label:
+                        labels.setdefault(label, []).append(i)
+            if date_idx is None:
+                continue
+            if title_idx is None or len(row) <= title_idx or not row[title_idx]:
+                untitled.append(i)
+            text = row[date_idx] if len(row) > date_idx else ''
+            if not text:
+                if title_idx is not None and len(row) > title_idx and row[title_idx]:
+                    undated.append(i)
+                continue
+            epoch = publish_epoch(text)
+            if epoch is None:
+                invalid.append(i)
+            else:
+                dated.append((epoch, i))
+
+        dated.sort()
+        self.has_dates = date_idx is not None
+        self.has_status = title_idx is not None and date_idx is not None
+        self.labels = {label: frozenset(rows) for label, rows in labels.items()}
+        self.epochs = array('d', [epoch for epoch, _ in dated])
+        self.dated_rows = array('l', [i for _, i in dated])
+        self.invalid_rows = array('l', invalid)
+        self.undated_rows = array('l', undated)
+        self.untitled_rows = frozenset(untitled)
+
+    def label_rows(self, text):
+        """Rows with a label containing text, ignoring case."""
+        text = text.strip().lower()
+        matching = [rows for label, rows in self.labels.items() if text in label]
+        if len(matching) == 1:
+            return matching[0]
+        return frozenset().union(*matching)
+
+    def date_rows(self, start=None, end=None):
+        """Rows whose publish date is within [start, end] (epoch seconds)."""
+        first = 0 if start is None else bisect.bisect_left(self.epochs, start)
+        last = len(self.epochs) if end is None else bisect.bisect_right(self.epochs, end)
+        return set(self.dated_rows[first:last])
+
+    def status_rows(self, status, now=None):
+        """Titled rows with a given status: due, scheduled, invalid or undated.
+
+        Rows without a title are never published, so they have no status.
+        """
+        if status == 'invalid':
+            return set(self.invalid_rows) - self.untitled_rows
+        if status == 'undated':
+            return set(self.undated_rows)
+        split = bisect.bisect_right(self.epochs, time.time() if now is None else now)
+        if status == 'due':
+            return set(self.dated_rows[:split]) - self.untitled_rows
+        return set(self.dated_rows[split:]) - self.untitled_rows
+
+    def column_positions(self, names):
+        """Positions of the named columns. Raises QueryError for unknown ones."""
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise QueryError(f"Unknown columns: {', '.join(unknown)}")
+        return [self.columns[name] for name in names]
+
+
+def is_query(args):
+    """Whether request arguments ask for a sheet query."""
+    return any(args.get(name) for name in QUERY_ARGS)
+
+
+def parse_query(args):
+    """Read a sheet query from request query arguments.
+
+    Returns None when no query argument is given. Raises QueryError for
+    invalid arguments.
+    """
+    if not is_query(args):
+        return None
+
+    query = {
+        'columns': [name.strip() for name in args['columns'].split(',')] if args.get('columns') else None,
+        'label': args.get('label') or None,
+        'date_from': None,
+        'date_to': None,
+        'status': args.get('status') or None
+    }
+    for arg, key in (('dateFrom', 'date_from'), ('dateTo', 'date_to')):
+        if args.get(arg):
+            query[key] = publish_epoch(args[arg])
+            if query[key] is None:
+                raise QueryError(f'{arg} must be an ISO 8601 date')
+    if query['status'] is not None and query['status'] not in ROW_STATUSES:
+        raise QueryError(f"status must be one of: {', '.join(ROW_STATUSES)}")
+
+    try:
+        query['offset'] = int(args.get('offset', 0))
+        query['limit'] = int(args['limit']) if args.get('limit') else None
+    except ValueError:
+        raise QueryError('offset and limit must be integers')
+    if query['offset'] < 0:
+        raise QueryError('offset must not be negative')
+    if query['limit'] is not None and query['limit'] < 1:
+        raise QueryError('limit must be positive')
+    return query
+
+
+def run_query(index, values, query, now=None):
+    """Filter, page and project the rows of a snapshot.
+
+    Filters are combined with AND; matching rows are returned in sheet
+    order. Returns (headers, rows, total) where rows are the projected,
+    padded row values of the requested page and total counts every match.
+    """
+    if query['columns']:
+        positions = index.column_positions(query['columns'])
+        headers = list(query['columns'])
+    else:
+        positions = None
+        headers = index.headers
+
+    # Intersect the index lookups, smallest first
+    candidates = []
+    if query['label'] is not None:
+        candidates.append(index.label_rows(query['label']))
+    if query['date_from'] is not None or query['date_to'] is not None:
+        candidates.append(index.date_rows(query['date_from'], query['date_to']))
+    if query['status'] is not None:
+        if not index.has_status:
+            raise QueryError("status needs 'Title' and 'Publish Date' columns")
+        candidates.append(index.status_rows(query['status'], now))
+
+    if candidates:
+        candidates.sort(key=len)
+        matches = candidates[0].intersection(*candidates[1:])
+        matches = sorted(matches)
+    else:
+        # Every data row; paged without materializing the row numbers
+        matches = range(2, index.row_count + 2)
+
+    offset, limit = query['offset'], query['limit']
+    page = matches[offset:] if limit is None else matches[offset:offset + limit]
+
+    width = len(index.headers)
+    rows = []
+    for i in page:
+        row = values[i - 1]
+        if positions is not None:
+            rows.append([row[p] if p < len(row) else '' for p in positions])
+        else:
+            rows.append(row + [''] * (width - len(row)) if len(row) < width else row)
+    return headers, rows, len(matches)
@@ -0,0 +1,91 @@
+import os
+
+# Number of rows requested per values().get call when streaming a sheet
+SHEET_READ_BLOCK_ROWS = int(os.getenv('SHEET_READ_BLOCK_ROWS', '5000'))
+
+
+def column_letter(index):
+    """Convert a 1-based column index to A1 column letters (1 -> A, 27 -> AA)."""
+    letters = ''
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def quote_sheet_title(title):
+    """Quote a sheet title for use in an A1 range."""
+    return "'" + title.replace("'", "''") + "'"
+
+
+def get_grid(sheets_service, sheet_id, sheet_title=None):
+    """Get the title and grid size of a sheet tab.
+
+    Returns (title, row count, column count) of the named tab, or of the
+    first tab when no title is given.
+    """
+    spreadsheet = sheets_service.spreadsheets().get(
+        spreadsheetId=sheet_id,
+        fields='sheets.properties(title,gridProperties(rowCount,columnCount))'
+    ).execute()
+
+    sheets = spreadsheet.get('sheets', [])
+    if not sheets:
+        return sheet_title, 0, 0
+
+    properties = sheets[0]['properties']
+    if sheet_title is not None:
+        for sheet in sheets:
+            if sheet['properties']['title'] == sheet_title:
+                properties = sheet['properties']
+                break
+        else:
+            raise ValueError(f"Sheet '{sheet_title}' not found")
+
+    grid = properties.get('gridProperties', {})
+    return properties['title'], grid.get('rowCount', 0), grid.get('columnCount', 0)
+
+
+def iter_sheet_rows(sheets_service, sheet_id, sheet_title=None, block_rows=SHEET_READ_BLOCK_ROWS):
+    """Stream the rows of a sheet tab as (row number, values) pairs.
+
+    The real grid size is read from the spreadsheet metadata and the rows are
+    fetched in blocks, so every row and column is covered while only one block
+    is held in memory. Row numbers are 1-indexed; row 1 is the header row.
+    Trailing empty rows of a block are omitted by the API, so row numbers may
+    skip.
+    """
+    title, row_count, column_count = get_grid(sheets_service, sheet_id, sheet_title)
+    if not row_count or not column_count:
+        return
+
+    prefix = quote_sheet_title(title) + '!'
+    last_column = column_letter(column_count)
+
+    for start in range(1, row_count + 1, block_rows):
+        end = min(start + block_rows - 1, row_count)
+        result = sheets_service.spreadsheets().values().get(
+            spreadsheetId=sheet_id,
+            range=f'{prefix}A{start}:{last_column}{end}'
+        ).execute()
+
+        for offset, row in enumerate(result.get('values', [])):
+            yield start + offset, row
+
+
+def read_sheet_values(sheets_service, sheet_id, sheet_title=None, block_rows=SHEET_READ_BLOCK_ROWS):
+    """Read a whole sheet tab into a values list, one block at a time.
+
+    Rows missing from the stream are filled in as empty lists so that list
+    positions keep matching sheet row numbers.
+    """
+    values = []
+    for row_number, row in iter_sheet_rows(sheets_service, sheet_id, sheet_title, block_rows):
+        while len(values) < row_number - 1:
+            values.append([])
+        values.append(row)
+
+    # Drop empty rows left over at the end of the grid
+    while values and not values[-1]:
+        values.pop()
+    return values
@@ -0,0 +1,46 @@
+def row_spans(row_numbers):
+    """Merge row numbers into sorted (first, last) spans of consecutive rows."""
+    spans = []
+    for row in sorted(set(row_numbers)):
+        if spans and row == spans[-1][1] + 1:
+            spans[-1][1] = row
+        else:
+            spans.append([row, row])
+    return [tuple(span) for span in spans]
+
+
+def read_rows(sheets_service, sheet_id, row_numbers):
+    """Read the header row and the given rows in a single batchGet.
+
+    Consecutive rows are requested as one range. Returns the headers and a
+    dict mapping each requested row number that has values to those values.
+    """
+    spans = row_spans(row_numbers)
+    ranges = ['1:1'] + [f'{first}:{last}' for first, last in spans]
+
+    result = sheets_service.spreadsheets().values().batchGet(
+        spreadsheetId=sheet_id,
+        ranges=ranges,
+        majorDimension='ROWS'
+    ).execute()
+
+    value_ranges = result.get('valueRanges', [])
+    header_values = value_ranges[0].get('values', []) if value_ranges else []
+    headers = header_values[0] if header_values else []
+
+    rows = {}
+    for (first, _), value_range in zip(spans, value_ranges[1:]):
+        for offset, row in enumerate(value_range.get('values', [])):
+            if row:
+                rows[first + offset] = row
+    return headers, rows
+
+
+def read_headers(sheets_service, sheet_id):
+    """Read the header row of a sheet, however many columns it has."""
+    result = sheets_service.spreadsheets().values().get(
+        spreadsheetId=sheet_id,
+        range='1:1'
+    ).execute()
+    values = result.get('values', [])
+    return values[0] if values else []
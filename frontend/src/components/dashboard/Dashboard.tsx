@@ -16,6 +16,7 @@ import {
 } from 'lucide-react';
 import axios from 'axios';
 import Navbar from '../layout/Navbar';
+import { publishedResults, waitForJob } from '../../lib/jobs';
 
 // Define the API base URL
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
@@ -159,11 +160,14 @@ const Dashboard: React.FC = () => {
       });
       
       if (response.data.success) {
+        // Wait for the background scheduler to finish the check
+        const job = await waitForJob(response.data.jobId);
+        const successPosts = publishedResults(job);
         // Update published posts
-        setPublishedPosts([...publishedPosts, ...response.data.publishedPosts]);
+        setPublishedPosts([...publishedPosts, ...successPosts]);
         // Refresh pending posts
         fetchPendingPosts();
-        setSuccessMessage(`${response.data.publishedPosts.length} posts published!`);
+        setSuccessMessage(`${successPosts.length} posts published!`);
         setTimeout(() => setSuccessMessage(null), 5000);
       }
       setIsLoading(false);
@@ -185,8 +189,11 @@ const Dashboard: React.FC = () => {
       });
       
       if (response.data.success) {
+        // Large publishes are queued as a background job
+        const successPosts = response.data.jobId
+          ? publishedResults(await waitForJob(response.data.jobId))
+          : response.data.results.filter((result: any) => result.status === 'success');
         // Update published posts
-        const successPosts = response.data.results.filter((result: any) => result.status === 'success');
         setPublishedPosts([...publishedPosts, ...successPosts]);
         setSuccessMessage(`${successPosts.length} posts published!`);
         setTimeout(() => setSuccessMessage(null), 5000);
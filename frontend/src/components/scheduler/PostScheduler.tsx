@@ -8,6 +8,7 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '../ui/tabs';
 import { LucideAlertCircle, LucideCheckCircle2, LucideCalendar } from 'lucide-react';
 import axios from 'axios';
 import Navbar from '../layout/Navbar';
+import { publishedResults, waitForJob } from '../../lib/jobs';
 
 // Define the API base URL
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
@@ -103,9 +104,11 @@ const PostScheduler: React.FC = () => {
       });
       
       if (response.data.success) {
+        // Wait for the background scheduler to finish the check
+        const job = await waitForJob(response.data.jobId);
         // Refresh pending posts
         fetchPendingPosts();
-        setSuccessMessage(`${response.data.publishedPosts.length} posts published!`);
+        setSuccessMessage(`${publishedResults(job).length} posts published!`);
         setTimeout(() => setSuccessMessage(null), 5000);
       }
       setIsLoading(false);
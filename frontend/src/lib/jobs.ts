@@ -0,0 +1,26 @@
+import axios from 'axios';
+
+// Define the API base URL
+const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Poll a background job (publish or scheduler check) until it completes or fails
+export async function waitForJob(jobId: string, intervalMs = 1000) {
+  for (;;) {
+    const response = await axios.get(`${API_URL}/jobs/${jobId}`);
+    const job = response.data;
+    if (job.status === 'completed') {
+      return job;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Job failed');
+    }
+    await sleep(intervalMs);
+  }
+}
+
+// Rows of a finished job that were published
+export function publishedResults(job: any) {
+  return job.results.filter((result: any) => result.status === 'success');
+}